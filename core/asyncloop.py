@@ -0,0 +1,66 @@
+import asyncio, threading
+
+class AsyncLoop:
+	"""
+	 Asyncio event loop running on one dedicated thread, meant for waiting on network requests, timers and sockets without a thread for each of them
+	 The loop is started when the first coroutine is added and keeps running until 'stop' is called, coroutines can be added from any thread
+	 Callbacks that need to update the interface must not be called from this loop directly, they should go through 'schedule_task' of a window
+	"""
+	def __init__(self, name="AsyncLoopThread"):
+		self._name = name
+		self._loop = None
+		self._thread = None
+		self._lock = threading.Lock()
+
+	@property
+	def running(self): return self._loop is not None
+
+	def _start(self):
+		with self._lock:
+			if self._loop is None:
+				print("VERBOSE", "Starting asyncio loop thread")
+				self._loop = asyncio.new_event_loop()
+				self._thread = threading.Thread(target=self._run, args=(self._loop,), name=self._name, daemon=True)
+				self._thread.start()
+			return self._loop
+
+	@staticmethod
+	def _run(loop):
+		asyncio.set_event_loop(loop)
+		try:
+			loop.run_forever()
+			loop.run_until_complete(loop.shutdown_asyncgens())
+		finally: loop.close()
+
+	def submit(self, coroutine):
+		""" Run a coroutine on the loop, returns a 'concurrent.futures.Future' that can be used to wait for the result or cancel the coroutine from any thread """
+		return asyncio.run_coroutine_threadsafe(coroutine, self._start())
+
+	def call_soon(self, callback, *args):
+		""" Call a function on the loop thread as soon as possible, use this to interact with running coroutines from other threads """
+		self._start().call_soon_threadsafe(callback, *args)
+
+	@staticmethod
+	async def _cancel_all():
+		tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+		for task in tasks: task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+
+	def stop(self, timeout=5):
+		"""
+		 Cancel all coroutines still running and stop the loop, waits until every coroutine handled the cancellation or 'timeout' seconds passed
+		 Has no effect if the loop isn't running, adding a coroutine after this call starts a new loop
+		"""
+		with self._lock:
+			loop, thread = self._loop, self._thread
+			self._loop = self._thread = None
+		if loop is None: return
+
+		print("VERBOSE", "Cancelling coroutines and stopping asyncio loop thread")
+		try: asyncio.run_coroutine_threadsafe(self._cancel_all(), loop).result(timeout)
+		except Exception as e: print("WARNING", "Not all coroutines finished after cancelling them:", e)
+		loop.call_soon_threadsafe(loop.stop)
+		thread.join(timeout)
+
+# loop shared by all modules, stopped by the interpreter after all modules are destroyed
+shared_loop = AsyncLoop()
@@ -0,0 +1,51 @@
+import heapq, itertools, threading
+
+class EventQueue:
+	"""
+	 Thread-safe queue for passing events within this process, nothing gets copied or sent through a pipe
+	 Items with a lower priority value are handled first, items with the same priority are handled in the order they were added
+	 An item added with a 'key' replaces the item with the same key that is still waiting, so only the latest value for that key is handled
+	"""
+	def __init__(self):
+		self._heap = []
+		self._pending = {}
+		self._counter = itertools.count()
+		self._condition = threading.Condition()
+		self._closed = False
+
+	def __len__(self):
+		with self._condition: return len(self._heap)
+
+	@property
+	def closed(self): return self._closed
+
+	def put(self, item, priority=0, key=None):
+		"""
+		 Add an item to the queue, this never blocks
+		 Returns False if the item was ignored because the queue is closed
+		"""
+		with self._condition:
+			if self._closed: return False
+			if key is not None:
+				entry = self._pending.get(key)
+				if entry is not None:
+					entry[2] = item
+					return True
+
+			entry = [priority, next(self._counter), item, key]
+			if key is not None: self._pending[key] = entry
+			heapq.heappush(self._heap, entry)
+			self._condition.notify()
+			return True
+
+	def get(self, timeout=None):
+		""" Remove and return the next item, waits until an item is available; raises TimeoutError if none was added within 'timeout' seconds """
+		with self._condition:
+			if not self._condition.wait_for(lambda: self._heap, timeout): raise TimeoutError("No item available")
+			_, _, item, key = heapq.heappop(self._heap)
+			if key is not None: del self._pending[key]
+			return item
+
+	def close(self):
+		""" Ignore any items added from now on, items that are already waiting can still be taken """
+		with self._condition: self._closed = True
@@ -1,4 +1,5 @@
-import json, os
+import os
+from core import serialization
 from ui.qt import pyelement
 
 class History:
@@ -6,9 +7,11 @@ class History:
 	 Collection that keeps a list of items in the order they were added
 	 They are retrieved one by one using get, adding a new item automatically resets the index to the end
 	 Amount of items stored can be limited by adding a limit argument
+	 When a file is given the history is saved to it using given serializer, history files written in a different format are still read
 	"""
-	def __init__(self, limit=0, file=None):
+	def __init__(self, limit=0, file=None, serializer=serialization.binary_serializer):
 		self._limit = max(0, limit)
+		self._serializer = serializer
 		self._history = []
 		self._index = 0
 		self._index_updated = self._history_updated = None
@@ -22,10 +25,12 @@ class History:
 
 	def _load_file(self):
 		try:
-			with open(self._file, "r") as file: data = json.load(file)
-			self._history.extend(data["history"])
+			data = serialization.read_file(self._file)
+			# json stores tuples as lists, these wouldn't match the items added after loading
+			self._history.extend(tuple(item) if isinstance(item, list) else item for item in data["history"])
 			self._index, self._limit = data["index"], data["limit"]
 		except FileNotFoundError: self._save_file = False
+		except (ValueError, KeyError) as e: print("ERROR", f"Reading history file '{self._file}':", e)
 
 	def _delete_file(self):
 		if self._file is not None:
@@ -40,7 +45,8 @@ class History:
 				"index": self._index,
 				"limit": self._limit
 			}
-			with open(self._file, "w") as file: json.dump(data, file)
+			try: serialization.dump_file(self._file, data, self._serializer)
+			except OSError as e: print("ERROR", f"Writing history file '{self._file}':", e)
 		else: self._delete_file()
 
 	@property
@@ -1,18 +1,24 @@
-import importlib, sys
+import importlib, sys, threading, time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 
-from multiprocessing import Queue
 from PyQt5 import QtCore
 
 import pymodules
 from core import messagetypes, modules
+from core.asyncloop import shared_loop
+from core.eventqueue import EventQueue
+from core.tracing import startup_trace
 
 class _ModuleData:
-	def __init__(self, name, properties):
+	def __init__(self, name, properties, package=None):
 		self._module_id = name
 		self._module_properties = properties
+		self._package = package or {}
 		self._events = {}
 		self._cmds = {}
 		self._module = None
+		self._import_time = self._init_time = None
 
 	@property
 	def name(self):
@@ -30,10 +36,39 @@ class _ModuleData:
 	def module(self):
 		""" The module object that is controlled """
 		return self._module
+	@property
+	def keywords(self):
+		""" The top level command keywords declared in package.json, None if the module didn't declare them """
+		return self._package.get("commands")
+	@property
+	def requires(self):
+		""" The names of the modules declared in package.json that must be loaded before this module """
+		return self._package.get("requires", [])
+	@property
+	def load_time(self):
+		""" Time in seconds it took to import and initialize this module, None if it wasn't loaded yet """
+		return self._import_time + self._init_time if self._init_time is not None else None
 
-	def initialize_module(self, client, interpreter):
-		print("VERBOSE", "Importing module...")
-		mod = importlib.import_module("." + self.name, "modules")
+	def defer_module(self, keywords, loader):
+		"""
+		 Register placeholder commands for the given top level keywords instead of importing the module,
+		 the first time one of these is used 'loader' is called with this module data and the full command, it must load the module and process the command
+		"""
+		print("VERBOSE", f"Deferring import of module '{self.name}' until one of its commands is used")
+		# every module shares the Module instance for its package, so the real module picks up this instance once imported
+		self._module = modules.Module("modules." + self.name)
+		self._module.commands = {keyword: self._placeholder(keyword, loader) for keyword in keywords}
+
+	def _placeholder(self, keyword, loader):
+		def _load_command(arg, argc): return loader(self, [keyword] + arg)
+		return _load_command
+
+	def import_module(self):
+		""" Import the module without initializing it, this doesn't touch the interface so it can be done on any thread """
+		if self._import_time is not None: return
+		start = time.perf_counter()
+		print("VERBOSE", f"Importing module '{self.name}'...")
+		with startup_trace.span(f"import {self.name}", "import"): mod = importlib.import_module("." + self.name, "modules")
 		try:
 			module = None
 			print("VERBOSE", "Locating Module instance within module...")
@@ -44,14 +79,22 @@ class _ModuleData:
 
 			if module is None: raise TypeError("module must contain an instance of core.modules.Module")
 			self._module = module
-
-			print("VERBOSE", f"Initializing module '{self.name}'...")
-			self._module.call_initialize(client, interpreter)
+			self._import_time = time.perf_counter() - start
 		except AttributeError:
 			print("ERROR", f"Module '{self.name}' does not define a module attribute and cannot be loaded")
 			raise
 
+	def initialize_module(self, client, interpreter):
+		""" Import the module if this wasn't done yet and initialize it, must be called on the main thread """
+		self.import_module()
+		start = time.perf_counter()
+		print("VERBOSE", f"Initializing module '{self.name}'...")
+		with startup_trace.span(f"@Initialize {self.name}", "initialize"): self._module.call_initialize(client, interpreter)
+		self._init_time = time.perf_counter() - start
+		print("VERBOSE", f"Module '{self.name}' loaded in {self.load_time * 1000:.1f}ms")
+
 	def destroy_module(self):
+		if not self._module.is_loaded: return
 		print("VERBOSE", f"Destroying module '{self.name}'...")
 		try: self._module.call_destroy()
 		except Exception as e: print("ERROR", f"Destroying module '{self.name}':", e)
@@ -73,30 +116,55 @@ class Interpreter(QtCore.QThread):
 				- each command callback receives two arguments, the remaining keywords (in a list split on spaces) and the size of this list
 				- use "" for default commands, they are called if no further sublevel fit the given command. Adding a default command on the top level of the dict is not allowed
 				- After processing a command the module must return an instance of 'messagetypes', if nothing is returned the interpreter assumes the command was ignored and will continue processing the command further
+				- commands marked with '@Blocking' run on a worker thread, blocking commands of the same module run in the order they were received; other commands are not delayed by them
+		'commands' in package.json: optional list of the top level command keywords of the module,
+			when given the module is only imported and initialized the first time one of these commands is used, or suggestions for its arguments are requested
+		'requires' in package.json: optional list of other modules this module uses, these are always loaded first
+			Note: modules are imported on a thread pool, so importing a module must not create any interface elements; do this in '@Initialize' instead
+		'core.asyncloop.shared_loop': asyncio loop modules can use for network requests, timers and sockets, everything still running on it is cancelled after all modules are destroyed
 	"""
 	empty_response = messagetypes.Reply("No answer :(")
 
 	CONSOLE = 1
 	MEMORY = 2
 
+	# events with a lower priority value are processed first
+	PRIORITY_COMMAND = 0
+	PRIORITY_EVENT = 1
+	PRIORITY_DESTROY = 2
+	worker_count = 4
+	loader_count = 4
+	initialize_task = "interpreter_initialize_module"
+
 	def __init__(self, client):
 		QtCore.QThread.__init__(self)
 		self.setObjectName("InterpreterThread")
 
 		self._client = client
-		self._queue = Queue()
+		self._queue = EventQueue()
+		self._workers = ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix="InterpreterWorker")
+		self._lanes = {}
+		self._lanes_lock = threading.Lock()
 		self._args = 0
 		self._active = True
+		self._stopping = False
+		# deferred modules are loaded one at a time, their initialization is scheduled on the main thread
+		self._deferred_lock = threading.RLock()
+		self._client.add_task(task_id=self.initialize_task, func=self._initialize_deferred)
 
 		self._events = {}
 		self.register_event("autocomplete", self._try_autocomplete)
 		self.register_event("parse_command", self._parse_command)
 		self.register_event("destroy", self._destroy)
+		self.register_event("commands_changed", self._compile_commands)
 
 		self._set_sys_arg()
 		self._loaded_modules = []
 		self._modules = []
+		self._startup_time = 0, 0
+		self._commands = modules.CommandTrie()
 		self._load_modules()
+		self._compile_commands()
 
 	def _set_sys_arg(self):
 		if "console" in sys.argv: self._args &= self.CONSOLE
@@ -111,37 +179,90 @@ class Interpreter(QtCore.QThread):
 			except ImportError: print("ERROR", "Cannot do memory tracking without installing Pympler")
 			except Exception as e: print("ERROR", "Loading memory tracker:", e)
 
+	@startup_trace.traced("load modules")
 	def _load_modules(self):
 		modules = {mod_id: mod_options for mod_id, mod_options in pymodules.module_cfg.get("modules").items() if mod_options["enabled"]}
 
 		if modules:
-			mdl = sorted(modules.items(), key=lambda it: it[1]["priority"])
-			for module_id, module_options in mdl:
-				try:
-					r = self._load_module(module_id, module_options)
-					if isinstance(r, messagetypes.Error): self._client.on_notification(*r.get_contents())
-				except Exception as e: print("ERROR", f"Loading module '{module_id}', it will not be available", e)
-
-	def _load_module(self, module, options):
-		if module in self._loaded_modules: raise RuntimeError(f"Another module with name '{module}' was already registered!")
+			start = time.perf_counter()
+			mdl = [_ModuleData(module_id, options, pymodules.read_package(module_id)) for module_id, options in sorted(modules.items(), key=lambda it: it[1]["priority"])]
+			mdl = self._sort_requirements(mdl)
+
+			# importing doesn't touch the interface, modules are imported on a thread pool while earlier ones are initialized on this thread
+			with ThreadPoolExecutor(max_workers=self.loader_count, thread_name_prefix="ModuleLoader") as loader:
+				imports = {}
+				for md in mdl:
+					if not md.keywords: imports[md.name] = loader.submit(self._import_module, md, [imports[name] for name in md.requires if name in imports])
+
+				for md in mdl:
+					try:
+						r = self._load_module(md, imports.get(md.name))
+						if isinstance(r, messagetypes.Error): self._client.on_notification(*r.get_contents())
+					except Exception as e: print("ERROR", f"Loading module '{md.name}', it will not be available", e)
+			self._startup_time = time.perf_counter() - start, sum(md.load_time for md in self._modules if md.load_time is not None)
+
+	def _sort_requirements(self, mdl):
+		"""
+		 Order the modules so every module comes after the modules it requires, modules stay in priority order otherwise
+		 Modules that require a module that isn't enabled or that require each other are left out
+		"""
+		ordered, names, remaining = [], set(), list(mdl)
+		while remaining:
+			md = next((md for md in remaining if all(name in names for name in md.requires)), None)
+			if md is None:
+				for md in remaining:
+					missing = ", ".join(name for name in md.requires if name not in names)
+					self._client.on_notification(*messagetypes.Error(RuntimeError(f"Missing required modules: {missing}"), f"'{md.name}' requires modules that are not enabled, module will not be available").get_contents())
+				break
+
+			remaining.remove(md)
+			names.add(md.name)
+			ordered.append(md)
+		return ordered
+
+	@staticmethod
+	def _import_module(md, requirements):
+		# a module can only use the modules it requires once these are imported, if they failed the module fails when it is loaded
+		wait(requirements)
+		md.import_module()
+
+	def _load_module(self, md, imported=None):
+		if md.name in self._loaded_modules: raise RuntimeError(f"Another module with name '{md.name}' was already registered!")
+		missing = [name for name in md.requires if name not in self._loaded_modules]
+		if missing: return messagetypes.Error(RuntimeError(f"Missing required modules: {', '.join(missing)}"), f"Required modules for '{md.name}' failed to load: module will not be available")
 
 		try:
-			print("VERBOSE", f"Loading '{module}'...")
-			md = _ModuleData(module, options)
-			try: md.initialize_module(self._client, self)
-			except Exception as e: return messagetypes.Error(e, f"Failed to initialize '{module}': module will not be available")
+			print("VERBOSE", f"Loading '{md.name}'...")
+			if md.keywords: md.defer_module(md.keywords, self._run_deferred)
+			else:
+				try:
+					if imported is not None: imported.result()
+					md.initialize_module(self._client, self)
+				except Exception as e: return messagetypes.Error(e, f"Failed to initialize '{md.name}': module will not be available")
 
+			# modules are loaded with their requirements first, commands are still handled in priority order
 			self._modules.append(md)
-			self._loaded_modules.append(module)
+			self._modules.sort(key=lambda md: md.priority)
+			self._loaded_modules.append(md.name)
 			print("VERBOSE", "Module successfully loaded")
 			return messagetypes.Reply("Module successfully loaded")
-		except Exception as e: return messagetypes.Error(e, f"Failed to import '{module}': module will not be available")
+		except Exception as e: return messagetypes.Error(e, f"Failed to import '{md.name}': module will not be available")
 
 	@property
 	def modules(self):
 		""" A dictionary containing all loaded modules """
 		return {mod.name: mod.module for mod in self._modules}
 
+	@property
+	def startup_time(self):
+		""" Tuple containing the time in seconds it took to load the modules at startup, and the time loading these one after the other would have taken """
+		return self._startup_time
+
+	@property
+	def module_timings(self):
+		""" A list of (name, load time) tuples for all modules in priority order, the load time is None for modules that weren't needed yet """
+		return [(md.name, md.load_time) for md in self._modules]
+
 	@property
 	def arguments(self):
 		""" All debug arguments the interpreter was started with """
@@ -166,35 +287,41 @@ class Interpreter(QtCore.QThread):
 
 
 	def request_autocomplete(self, line):
-		self._queue.put_nowait(("autocomplete", line))
+		""" Request suggestions for given input line, when a previous request is still waiting it is replaced since only the latest input matters """
+		self._queue.put(("autocomplete", line), self.PRIORITY_COMMAND, key="autocomplete")
 
-	def put_command(self, cmd, callback=None):
+	def put_command(self, cmd, callback=None, key=None):
 		"""
 		 Add command to be interpreted, this will be processed as soon as all previous commands have finished processing
 		 [optional] takes a 'callback' keyword that accepts a function, this will be called (in the interpreter thread) before the regular processing,
 		 this callback is treated with the same rules as regular command processing callbacks; if it doesn't return anything will continue processing in all modules
-		 This operation uses a multiprocessing.queue and therefore is thread-safe and uses the 'put' operation without wait and therefore will not block
+		 [optional] takes a 'key', if a command with the same key is still waiting to be processed it is replaced by this command
+		 Commands are processed before any other waiting events, this operation is thread-safe and will not block
 		"""
 		if callback and not callable(callback): raise TypeError("Callback must be callable when specified!")
-		self._queue.put_nowait(("parse_command", cmd, callback))
+		self._queue.put(("parse_command", cmd, callback), self.PRIORITY_COMMAND, key=("parse_command", key) if key is not None else None)
 
-	def put_event(self, event_id, *args):
+	def put_event(self, event_id, *args, key=None):
 		"""
 		 Call all listeners (that are still alive) on specified event id with all given extra keywords
 		 * Has no effect if the event id is empty or non-existent
 		 * Any event listeners that can't handle given arguments are not called
-		 This operation uses a multiprocessing.queue and therefore is thread-safe and uses the 'put' operation without wait and therefore will not block
+		 * When a 'key' is given, an event with the same id and key that is still waiting is replaced by this event
+		 Events are processed after waiting commands, this operation is thread-safe and will not block
 		"""
-		self._queue.put_nowait((event_id, *args))
+		self._queue.put((event_id, *args), self.PRIORITY_EVENT, key=(event_id, key) if key is not None else None)
 
 	def stop(self):
 		"""
 		 Terminate the interpreter, any commands already queued will still be handled but commands added after this call are ignored
 		 Once the interpreter has finished the 'on_destroy' method is called that cleans up all loaded modules before it is destroyed
-		 This operation uses a multiprocessing.queue and therefore is thread-safe and uses the 'put' operation without wait and therefore will not block
+		 This operation is thread-safe, it waits until the interpreter has finished
 		"""
 		print("VERBOSE", "Received end event, terminating interpreter...")
-		self._queue.put_nowait(("destroy",))
+		# commands waiting for a deferred module to initialize on this thread give up, otherwise these would wait on each other
+		self._stopping = True
+		self._queue.put(("destroy",), self.PRIORITY_DESTROY)
+		self._queue.close()
 		self.wait()
 
 
@@ -242,38 +369,132 @@ class Interpreter(QtCore.QThread):
 	def _parse_command(self, command, cb=None):
 		try:
 			command = command.rstrip(" ").split(" ")
-			op = None
 			self.print_additional_debug()
-			if cb is not None: op = cb(command)
-
-			if op is None:
-				try: res = self._process_command(command)
-				except Exception as e: res = messagetypes.Error(e, "Error processing command")
-
-				if res is not None and not isinstance(res, messagetypes.Empty):
-					op = messagetypes.Error(TypeError(f"Expected a 'messagetype' object, not a '{type(res).__name__}'"), "Invalid response from command")
-				else: op = res
+			match = self._commands.find(command)
 
-			print("VERBOSE", "Got command result:", op)
-			if not isinstance(op, messagetypes.Empty): op = self.empty_response
-			self.print_additional_debug()
-			self._client.on_reply(*op.get_contents())
+			lane = self._find_blocking_module(cb.callback if isinstance(cb, messagetypes.Question) else cb) if cb is not None else None
+			if lane is None and match is not None and self._modules[match[0]].module.is_blocking(match[1].callback): lane = match[0]
+			if lane is not None: return self._run_in_lane(lane, command, cb, match)
+			self._reply(command, self._execute_command(command, cb, match))
 		except Exception as e:
 			print("ERROR", f"Error processing command '{' '.join(command)}'")
 			self._client.on_reply(*messagetypes.Error(e, "Error processing command").get_contents())
 
-	def _process_command(self, command):
+	def _execute_command(self, command, cb, match):
+		op = None
+		if cb is not None: op = cb(command)
+
+		if op is None:
+			try: res = self._process_command(command, match)
+			except Exception as e: res = messagetypes.Error(e, "Error processing command")
+
+			if res is not None and not isinstance(res, messagetypes.Empty):
+				op = messagetypes.Error(TypeError(f"Expected a 'messagetype' object, not a '{type(res).__name__}'"), "Invalid response from command")
+			else: op = res
+		return op
+
+	def _reply(self, command, op):
+		print("VERBOSE", "Got command result:", op)
+		if not isinstance(op, messagetypes.Empty): op = self.empty_response
+		self.print_additional_debug()
+		self._client.on_reply(*op.get_contents())
+
+	def _compile_commands(self):
+		""" Combine the commands of all loaded modules in priority order, so resolving a command doesn't depend on the amount of modules """
+		self._commands = modules.CommandTrie([md.module for md in self._modules])
+
+	def _process_command(self, command, match=None):
 		print("VERBOSE", f"Processing command '{' '.join(command)}'...")
-		command.append("\x00")
-		for md in self._modules:
-			cb = md.process_command(command)
-			if cb is not None: return cb.callback(cb.args, len(cb.args))
+		if match is None: match = self._commands.find(command)
+		if match is not None: return match[1].callback(match[1].args, len(match[1].args))
+
+	# === DEFERRED MODULES ===
+	def load_deferred_modules(self):
+		""" Load all modules that were deferred, for when every module must be available (like showing the configuration of all modules) """
+		for md in list(self._modules):
+			err = self._load_deferred(md)
+			if err is not None: self._client.on_notification(*err.get_contents())
+
+	def _load_deferred(self, md):
+		"""
+		 Import and initialize a module that was deferred along with the modules it requires, returns an error message if this failed or None otherwise
+		 The module is imported on the current thread, initializing is done on the main thread and this waits until it is done
+		"""
+		with self._deferred_lock:
+			if md.module.is_loaded: return None
+			for name in md.requires:
+				required = next(required for required in self._modules if required.name == name)
+				err = self._load_deferred(required)
+				if err is not None: return err
+
+			print("INFO", f"Loading deferred module '{md.name}'...")
+			try:
+				md.import_module()
+				future = Future()
+				if threading.current_thread() is threading.main_thread(): self._initialize_deferred(md, future)
+				else: self._client.schedule_task(task_id=self.initialize_task, md=md, future=future)
+				while True:
+					try: future.result(timeout=0.1)
+					except FutureTimeoutError:
+						if self._stopping: raise RuntimeError("Interpreter is stopping")
+					else: break
+			except Exception as e: return messagetypes.Error(e, f"Failed to initialize '{md.name}'")
+			self._compile_commands()
+
+	def _initialize_deferred(self, md, future):
+		# called on the main thread, which is also the thread that stops the interpreter so it can't start stopping halfway
+		if self._stopping: return future.set_exception(RuntimeError("Interpreter is stopping"))
+		try: md.initialize_module(self._client, self)
+		except Exception as e: future.set_exception(e)
+		else: future.set_result(None)
+
+	def _run_deferred(self, md, command):
+		# a loaded module only ends up here if it doesn't define the command itself
+		if md.module.is_loaded: return None
+		err = self._load_deferred(md)
+		if err is not None: return err
+		return self._process_command(command)
+
+	# === WORKERS ===
+	def _find_blocking_module(self, cb):
+		for index, md in enumerate(self._modules):
+			if md.module.is_blocking(cb): return index
+		return None
+
+	def _run_in_lane(self, index, *command):
+		"""
+		 Process a blocking command on a worker thread, every module has its own lane: blocking commands for a module that already has one on a worker
+		 are added to its lane and processed in order after the earlier ones finished, commands that aren't blocking never wait on a lane
+		"""
+		with self._lanes_lock:
+			lane = self._lanes.get(index)
+			if lane is not None: return lane.append(command)
+			self._lanes[index] = deque()
+		self._workers.submit(self._process_lane, index, command)
+
+	def _process_lane(self, index, command):
+		while True:
+			try: self._reply(command[0], self._execute_command(*command))
+			except Exception as e:
+				print("ERROR", f"Error processing command '{' '.join(command[0])}' on worker")
+				self._client.on_reply(*messagetypes.Error(e, "Error processing command").get_contents())
+
+			with self._lanes_lock:
+				lane = self._lanes[index]
+				if not lane:
+					del self._lanes[index]
+					return
+				command = lane.popleft()
 
 	def _try_autocomplete(self, text):
 		print("VERBOSE", f"Trying to autocomplete '{text}'...")
 		text = text.split(" ")
 		suggestions = []
-		for md in self._modules:
+		# only modules with a command starting with the first keyword can give suggestions
+		for index in self._commands.find_modules(text[0]):
+			md = self._modules[index]
+			# the arguments of a command can only be suggested by the module itself
+			if len(text) > 1 and text[0] in md.module.commands: self._load_deferred(md)
 			option = md.process_autocomplete(text)
 			if option is not None: suggestions.append(option)
 
@@ -281,6 +502,10 @@ class Interpreter(QtCore.QThread):
 		self._client.schedule_task(task_id=self._client.autocomplete_task, suggestions=suggestions)
 
 	def _destroy(self):
+		print("VERBOSE", "Waiting for commands running on workers...")
+		self._workers.shutdown(wait=True)
 		print("VERBOSE", "Destroying modules...")
 		for md in self._modules: md.destroy_module()
+		# coroutines that modules didn't stop themselves are cancelled, so none of them outlive their module
+		shared_loop.stop()
 		self._active = False
\ No newline at end of file
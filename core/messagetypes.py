@@ -37,6 +37,8 @@ class Question(Empty):
 		self._kwargs = kwargs
 
 	def __call__(self, cmd): return self._callback(cmd, len(cmd), **self._kwargs)
+	@property
+	def callback(self): return self._callback
 	def get_prefix(self): return " ? "
 	def get_contents(self): return self.get_prefix() + self._message, ("reply",), self, " - ", self._text
 
@@ -44,6 +46,8 @@ class Select(Question):
 	""" Provide a list of options to let the user choose from, they can either use index or keyword to filter items
 		Each request reduces the list, when there is only one left (or zero if no matches) the callback is called with remaining value
 		When the list is empty the callback is called with a 'None' value """
+	max_options = 30
+
 	def __init__(self, message, callback, choices, **kwargs):
 		Question.__init__(self, message, callback, **kwargs)
 		self._choices = choices
@@ -70,7 +74,7 @@ class Select(Question):
 		return "\n".join(["  {}. {}".format(i, self._choices[i][0]) for i in range(len(self._choices))])
 
 	def get_contents(self):
-		if len(self._choices) > 30: return "< {} options is way too many! Refine your keyword a little".format(len(self._choices)), ("reply",)
+		if len(self._choices) > self.max_options: return "< {} options is way too many! Refine your keyword a little".format(len(self._choices)), ("reply",)
 
 		res = self._execute_callback()
 		if res is not None: return res.get_contents()
@@ -1,21 +1,32 @@
+import bisect, threading
 from collections import namedtuple
 CommandResult = namedtuple("CommandResult", ["callback", "args"])
 CommandSuggest = namedtuple("CommandSuggest", ["command", "options", "remainder"])
 
 from . import pyconfiguration
 
+def prefix_match(keys, prefix):
+	""" Returns all keys starting with given prefix, 'keys' must be a sorted list so the matching keys are found using a binary search """
+	start = end = bisect.bisect_left(keys, prefix)
+	while end < len(keys) and keys[end].startswith(prefix): end += 1
+	return keys[start:end]
+
 class Module:
 	_modules = {}
+	_modules_lock = threading.Lock()
 	def __new__(cls, key):
-		md = Module._modules.get(key)
-		if md is None:	Module._modules[key] = md = super().__new__(cls)
-		return md
+		with Module._modules_lock:
+			md = Module._modules.get(key)
+			if md is None:	Module._modules[key] = md = super().__new__(cls)
+			return md
 
 	def __init__(self, key):
 		if not hasattr(self, "_events"):
 			print("VERBOSE", f"Creating new module '{key}'")
 			self._events = {}
 			self._client = self._interpreter = self._cmds = None
+			self._sorted_keys = {}
+			self._blocking = set()
 			self._cfg = pyconfiguration.ConfigurationFile(f"{key}.cfg")
 
 	@property
@@ -41,6 +52,9 @@ class Module:
 		if not isinstance(commands, dict): raise TypeError("Commands must be a dictionary")
 		if "" in commands: raise ValueError("A default command is not allowed on the top level")
 		self._cmds = commands
+		self._sorted_keys = {}
+		# the interpreter combines the commands of all modules, it needs to know when they change
+		if self._interpreter is not None: self._interpreter.put_event("commands_changed", key="commands")
 
 	def Initialize(self, cb):
 		""" Initialize event for this module, called when the module is loaded """
@@ -50,6 +64,24 @@ class Module:
 		""" Destroy event for this module, called when the module is destroyed """
 		self._events["destroy"] = cb
 
+	def Autocomplete(self, cb):
+		""" Autocomplete event for this module, called when a command is complete but has arguments left that can be suggested
+			The callback receives the command keywords and the remaining arguments (as lists) and returns a list of suggested arguments or None """
+		self._events["autocomplete"] = cb
+
+	def Blocking(self, cb):
+		""" Mark a command (or question callback) as blocking, for commands that wait on the network, disk or other processes
+			Blocking commands run on a worker thread of the interpreter so other commands can continue,
+			blocking commands from the same module are still processed in the order they were received
+			Returns the callback, so this can be used as decorator on the command function """
+		if not callable(cb): raise TypeError("Blocking command must be callable")
+		self._blocking.add(cb)
+		return cb
+
+	def is_blocking(self, cb):
+		""" Returns True if given callback was marked as blocking in this module """
+		return cb in self._blocking
+
 	@property
 	def is_loaded(self):
 		""" Is True if the module has been loaded """
@@ -59,6 +91,7 @@ class Module:
 		print("VERBOSE", "Initialization event received")
 		self._client = client
 		self._interpreter = interpreter
+		self._cfg.watch()
 		cb = self._events.get("init")
 		if callable(cb): cb()
 
@@ -66,7 +99,8 @@ class Module:
 		print("VERBOSE", "Destroy event received")
 		cb = self._events.get("destroy")
 		if callable(cb): cb()
-		self._cfg.save()
+		self._cfg.unwatch()
+		self._cfg.flush()
 
 	def get_command_callback(self, command):
 		cmds = self.commands
@@ -92,7 +126,7 @@ class Module:
 				index -= 1
 				break
 
-			options = [key for key in cmds.keys() if key.startswith(arg)]
+			options = prefix_match(self._get_sorted_keys(cmds), arg)
 			if len(options) > 1:
 				if index < len(search) - 1 and arg in options:
 					options.clear()
@@ -107,7 +141,73 @@ class Module:
 				index -= 1
 				break
 
-		if command or options: return CommandSuggest(' '.join(command), options if options else None, ' '.join(search[index+1:]))
+		remainder = search[index+1:]
+		if command and remainder and not options:
+			arguments = self._get_argument_suggestions(command, remainder)
+			if arguments: return CommandSuggest(' '.join(command), arguments, "")
+
+		if command or options: return CommandSuggest(' '.join(command), options if options else None, ' '.join(remainder))
 		else: return None
 
-	def __str__(self): return f"Module[loaded={self.is_loaded}, commands=({','.join(self.commands.keys())})]"
\ No newline at end of file
+	def _get_sorted_keys(self, cmds):
+		""" The keys of every level in the commands are sorted once, so finding the options for a partial keyword is a binary search """
+		keys = self._sorted_keys.get(id(cmds))
+		if keys is None or keys[0] is not cmds:
+			keys = self._sorted_keys[id(cmds)] = cmds, sorted(cmds.keys())
+		return keys[1]
+
+	def _get_argument_suggestions(self, command, arguments):
+		cb = self._events.get("autocomplete")
+		if callable(cb):
+			try: return cb(command, arguments)
+			except Exception as e: print("ERROR", "Getting argument suggestions:", e)
+
+	def __str__(self): return f"Module[loaded={self.is_loaded}, commands=({','.join(self.commands.keys())})]"
+
+
+class CommandTrie:
+	"""
+	 All commands from a list of modules combined into a single tree, so a command can be resolved in one walk
+	 The result is the same as asking every module in order for its callback (see 'Module.get_command_callback'):
+	 every node keeps what each module does at that point in the command, the first module that handles the command wins
+	"""
+	def __init__(self, modules=()):
+		self._root = {}
+		for index, module in enumerate(modules):
+			if module.commands: self._insert(self._root, index, module.commands)
+		self._root_keys = sorted(self._root.keys())
+
+	def find_modules(self, prefix):
+		""" Returns the indices of all modules that have a top level command starting with given prefix, in order """
+		return sorted({entry[0] for key in prefix_match(self._root_keys, prefix) for entry in self._root[key][1]})
+
+	def _insert(self, children, index, commands):
+		for key, cmd in commands.items():
+			node = children.get(key)
+			if node is None: children[key] = node = ({}, [])
+
+			if callable(cmd): node[1].append((index, cmd, None, None))
+			elif isinstance(cmd, dict):
+				node[1].append((index, None, cmd.get(""), frozenset(cmd.keys())))
+				self._insert(node[0], index, cmd)
+
+	def resolve(self, command):
+		""" Returns a 'CommandResult' for the module that handles given command (list of keywords), or None if no module does """
+		res = self.find(command)
+		return res[1] if res is not None else None
+
+	def find(self, command):
+		""" Returns a tuple containing the index of the module that handles given command and its 'CommandResult', or None if no module does """
+		best = None
+		children = self._root
+		for depth, arg in enumerate(command):
+			node = children.get(arg)
+			if node is None: break
+
+			children, entries = node
+			next_arg = command[depth+1] if depth + 1 < len(command) else None
+			for index, cb, default, keys in entries:
+				if best is not None and index >= best[0]: continue
+				if cb is not None: best = index, CommandResult(cb, command[depth+1:])
+				elif next_arg not in keys and default is not None: best = index, CommandResult(default, command[depth+1:])
+		return best
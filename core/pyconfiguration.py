@@ -1,4 +1,6 @@
-import os, threading
+import atexit, functools, json, os, threading, time
+
+from . import serialization
 if not os.path.isdir(".cfg"): os.mkdir(".cfg")
 
 separator = "::"
@@ -6,34 +8,250 @@ def create_entry(value, read_only=False):
 	if isinstance(value, dict): return Configuration(value, read_only)
 	else: return ConfigurationItem(value, read_only)
 
+@functools.lru_cache(maxsize=1024)
+def split_key(key):
+	""" Split a key into the first key and the remaining key path (None if there is none), the same keys are used all the time so these are cached """
+	first, sep, remainder = key.partition(separator)
+	return first, remainder if sep else None
+
+def _copy(value):
+	# values from a snapshot are shared, dictionaries are copied so changing them doesn't change the snapshot
+	return {k: _copy(v) for k, v in value.items()} if isinstance(value, dict) else value
+
+def _equal(a, b):
+	# tuples are written as lists, compare them the way they are stored
+	return a == b or json.dumps(a) == json.dumps(b)
+
+def _matches(listen_key, changed_key):
+	""" True if a change to 'changed_key' changes the value of 'listen_key': it is the same key, one is nested in the other or either is empty """
+	return not listen_key or not changed_key or listen_key == changed_key or changed_key.startswith(listen_key + separator) or listen_key.startswith(changed_key + separator)
+
+def _notify(changes):
+	""" Call the listeners affected by given (item, key) changes, every listener is called once with the current value of the key it listens to """
+	calls = {}
+	for item, key in changes:
+		node = item
+		while node is not None and not node._listeners: node = node._parent
+		if node is None: continue
+
+		path, node = [] if key is None else [key], item
+		while node is not None:
+			if node._listeners:
+				changed_key = separator.join(path)
+				for listen_key, callbacks in list(node._listeners.items()):
+					if _matches(listen_key, changed_key): calls.setdefault((id(node), listen_key), (node, listen_key, callbacks))
+
+			parent = node._parent
+			key = next((k for k, v in parent._value.items() if v is node), None) if parent is not None else None
+			if key is None: break
+			path.insert(0, key)
+			node = parent
+
+	for node, key, callbacks in calls.values():
+		value = node.get(key) if key else node.value
+		for cb in list(callbacks):
+			try: cb(key, value)
+			except Exception as e: print("ERROR", "Calling configuration listener:", e)
+
+def _apply(cfg, values):
+	""" Set all values from given dictionary that are different from the values in given configuration, returns the amount of values changed """
+	changed = 0
+	for key, value in values.items():
+		current = cfg._value.get(key)
+		if isinstance(value, dict) and isinstance(current, Configuration): changed += _apply(current, value)
+		elif current is None or not _equal(current.value, value):
+			try:
+				cfg[key] = value
+				changed += 1
+			except ValueError as e: print("WARNING", f"Cannot change '{key}':", e)
+	return changed
+
+_create_lock = threading.Lock()
+_transactions = threading.local()
+
+class _Transaction:
+	__slots__ = "_item", "_root", "_depth", "_outer"
+
+	def __init__(self, item):
+		self._item, self._root = item, item._root
+
+	def __enter__(self):
+		root = self._root
+		root._lock.acquire()
+		self._depth = getattr(_transactions, "depth", 0)
+		self._outer = root._pending is None
+		if self._outer: root._pending = []
+		_transactions.depth = self._depth + 1
+		return self._item
+
+	def __exit__(self, *exc):
+		root, changes = self._root, None
+		_transactions.depth = self._depth
+		if self._outer:
+			changes, root._pending = root._pending, None
+			for item, _ in changes: item._publish()
+		root._lock.release()
+		if changes: _notify(changes)
+
+class _ConfigurationWriter:
+	"""
+	 Writes changed configuration files on a background thread, a file is written 'delay' seconds after it was first saved
+	 so all changes saved in the meantime end up in a single write
+	"""
+	def __init__(self):
+		self._pending = {}
+		self._condition = threading.Condition()
+		self._thread = None
+
+	def schedule(self, cfg, delay):
+		""" Write given configuration file within 'delay' seconds, a write that was already scheduled earlier is kept """
+		deadline = time.monotonic() + delay
+		with self._condition:
+			if deadline < self._pending.get(cfg, deadline + 1):
+				self._pending[cfg] = deadline
+				self._condition.notify()
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._run, name="ConfigurationWriter", daemon=True)
+				self._thread.start()
+
+	def cancel(self, cfg):
+		with self._condition: self._pending.pop(cfg, None)
+
+	def _next(self):
+		with self._condition:
+			while True:
+				now = time.monotonic()
+				due = [cfg for cfg, deadline in self._pending.items() if deadline <= now]
+				if due:
+					for cfg in due: del self._pending[cfg]
+					return due
+				self._condition.wait(min(self._pending.values()) - now if self._pending else None)
+
+	def _run(self):
+		while True:
+			for cfg in self._next():
+				try: cfg._write()
+				except Exception as e: print("ERROR", f"Writing configuration file '{cfg.filename}':", e)
+
+	def flush_all(self):
+		with self._condition:
+			pending = list(self._pending)
+			self._pending.clear()
+		for cfg in pending: cfg._write()
+
+_writer = _ConfigurationWriter()
+
+class _ConfigurationWatcher:
+	""" Checks the modification time of the watched configuration files every 'interval' seconds, files changed by something else are reloaded """
+	def __init__(self, interval=2):
+		self.interval = interval
+		self._files = set()
+		self._condition = threading.Condition()
+		self._thread = None
+
+	def add(self, cfg):
+		with self._condition:
+			self._files.add(cfg)
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._run, name="ConfigurationWatcher", daemon=True)
+				self._thread.start()
+
+	def remove(self, cfg):
+		with self._condition: self._files.discard(cfg)
+
+	def _run(self):
+		while True:
+			with self._condition:
+				self._condition.wait(self.interval)
+				files = list(self._files)
+			for cfg in files:
+				try: cfg._check_file()
+				except Exception as e: print("ERROR", f"Checking configuration file '{cfg.filename}':", e)
+
+_watcher = _ConfigurationWatcher()
+
+def flush_all():
+	""" Write all configuration files with changes that are still waiting to be written, on the current thread """
+	_writer.flush_all()
+# changes made shortly before the program exits are still waiting for the background thread, which doesn't get to run anymore
+atexit.register(flush_all)
+
 class ConfigurationItem:
 	def __init__(self, value=None, read_only=False):
 		self._value, self._default_value = value, None
 		self._read_only = read_only is True
 		self._dirty = False
-		self._lock = threading.RLock()
+		self._parent = None
+		self._tree_lock = None
+		self._snapshot = None
+		self._pending = None
+		self._listeners = None
+
+	@property
+	def _root(self):
+		item = self
+		while item._parent is not None: item = item._parent
+		return item
+
+	@property
+	def _lock(self):
+		""" All items in a configuration share the lock of the configuration at the top, it is only created when something needs it """
+		root = self._root
+		if root._tree_lock is None:
+			with _create_lock:
+				if root._tree_lock is None: root._tree_lock = threading.RLock()
+		return root._tree_lock
 
 	@property
-	def dirty(self):
-		with self._lock: return self._dirty
+	def dirty(self): return self._dirty
 	@property
-	def is_set(self):
-		with self._lock: return self.value is not None
+	def is_set(self): return self._value is not None
 	@property
 	def read_only(self): return self._read_only
 
 	@property
-	def value(self):
-		with self._lock: return self._value
+	def value(self): return self._value
 	@value.setter
 	def value(self, value):
-		with self._lock:
+		with self.transaction():
 			if self._read_only: raise ValueError("Cannot set read only configuration value")
 			self._value = value
 			self.mark_dirty()
 
 	def mark_dirty(self):
-		with self._lock: self._dirty = True
+		""" Mark this item as changed, this must also be called after changing a value in place (like adding an item to a list) """
+		self._mark_dirty(None)
+
+	def _mark_dirty(self, key):
+		# 'key' is the key of the value that changed in this item, or None when this item changed itself
+		with self._lock:
+			item = self
+			while item is not None:
+				item._dirty = True
+				item = item._parent
+
+			root, changes = self._root, None
+			if root._pending is not None: root._pending.append((self, key))
+			else:
+				self._publish()
+				changes = [(self, key)]
+		if changes: _notify(changes)
+
+	def _publish(self):
+		# configurations containing this item drop their snapshot, it is created again with the new value when it is read
+		item = self
+		while item is not None:
+			item._snapshot = None
+			item = item._parent
+
+	def transaction(self):
+		"""
+		 Combine multiple changes, other threads keep reading the values from before the transaction until all changes are done
+		 The thread making the changes reads the current values, transactions can be nested and only the outer one publishes the changes
+		 Listeners are called once the outer transaction is done
+		 Returns a context manager: 'with configuration.transaction(): ...'
+		"""
+		return _Transaction(self)
 
 	def _clear_dirty(self):
 		self._dirty = False
@@ -56,86 +274,111 @@ class ConfigurationItem:
 	@default_value.setter
 	def default_value(self, val): self._default_value = val
 
-	def __len__(self):
-		with self._lock: return len(self.value) if self.is_set else 0
-	def __str__(self):
-		with self._lock: return f"ConfigurationItem(dirty={self.dirty}, read_only={self.read_only}, value={self.value})"
+	def __len__(self): return len(self.value) if self.is_set else 0
+	def __str__(self): return f"ConfigurationItem(dirty={self.dirty}, read_only={self.read_only}, value={self.value})"
 
 
 class Configuration(ConfigurationItem):
+	"""
+	 Nested configuration values, every value can be read using its key path: 'key', or 'key::subkey' for nested values
+	 Values are read from an immutable snapshot of the whole configuration, a single dictionary from every key path to its value:
+	 reading is a dictionary lookup without locking, changes replace the snapshot which is created again when it is first read
+	"""
 	def __init__(self, value=None, read_only=False):
 		ConfigurationItem.__init__(self, {}, read_only)
 		if value:
 			if isinstance(value, dict): self.update(value)
 			else: raise ValueError("Configuration value must be a dict")
 
-	@property
-	def dirty(self):
-		if self._dirty: return True
-		for val in self.values():
-			if val.dirty: return True
-		return False
-
 	def _clear_dirty(self):
 		self._dirty = False
-		for val in self.values(): val._clear_dirty()
+		for val in self._value.values(): val._clear_dirty()
+
+	def _flatten(self, snapshot, prefix):
+		value = {}
+		for key, item in self._value.items():
+			path = prefix + key
+			snapshot[path] = value[key] = item._flatten(snapshot, path + separator) if isinstance(item, Configuration) else item._value
+		return value
+
+	def _read(self):
+		""" Returns the current snapshot, or None when the current thread is making changes in a transaction and must read the current values instead """
+		if getattr(_transactions, "depth", 0): return None
+		snapshot = self._snapshot
+		if snapshot is None:
+			with self._lock:
+				snapshot = self._snapshot
+				if snapshot is None:
+					snapshot = {}
+					snapshot[None] = self._flatten(snapshot, "")
+					self._snapshot = snapshot
+		return snapshot
 
 	def __getitem__(self, item):
+		if not isinstance(item, str): raise ValueError("Keys must be string")
+		snapshot = self._read()
+		if snapshot is not None:
+			try: return _copy(snapshot[item])
+			# missing keys are looked up again, to raise the same error
+			except KeyError: pass
+
 		with self._lock:
-			if isinstance(item, str):
-				item = item.split(separator, maxsplit=1)
-				if len(item) == 1: return self._value[item[0]].value
-				else: return self._value[item[0]][item[1]]
-			else: raise ValueError("Keys must be string")
+			key, remainder = split_key(item)
+			if remainder is None: return self._value[key].value
+			else: return self._value[key][remainder]
 
 	def __setitem__(self, key, value):
 		if self.read_only: raise ValueError("Cannot set read only configuration value")
-
-		with self._lock:
-			if isinstance(key, str):
-				key = key.split(separator, maxsplit=1)
-				if len(key) == 1:
-					key = key[0]
-					current = self._value.get(key)
-					new = create_entry(value)
-					if current is not None and type(current) is Configuration and len(current) and type(new) is ConfigurationItem:
-						raise ValueError(f"Cannot set a whole configuration to a single value for key '{key}'")
-					else: self._value[key] = new
-				else:
-					res = self.get(key[0])
-					if res is None: self[key[0]] = {}
-					self._value[key[0]][key[1]] = value
-				self.mark_dirty()
-			else: raise ValueError("Keys must be string")
+		if not isinstance(key, str): raise ValueError("Keys must be string")
+		with self.transaction(): self._set(key, value)
+
+	def _set(self, key, value):
+		key, remainder = split_key(key)
+		if remainder is None:
+			current = self._value.get(key)
+			new = create_entry(value)
+			if current is not None and type(current) is Configuration and len(current) and type(new) is ConfigurationItem:
+				raise ValueError(f"Cannot set a whole configuration to a single value for key '{key}'")
+
+			new._parent = self
+			self._value[key] = new
+			self._mark_dirty(key)
+		else:
+			current = self._value.get(key)
+			if current is None or current._value is None:
+				self._set(key, {})
+				current = self._value[key]
+			if isinstance(current, Configuration): current._set(remainder, value)
+			else: current[remainder] = value
 
 	def __delitem__(self, key):
 		if self.read_only: raise ValueError("Cannot delete read only configuration value")
 
-		with self._lock:
+		with self.transaction():
 			if isinstance(key, str):
-				key = key.split(separator, maxsplit=1)
-				if len(key) == 1:
-					key = key[0]
+				key, remainder = split_key(key)
+				if remainder is None:
 					del self._value[key]
-				else: del self._value[key[0]][key[1]]
-				self.mark_dirty()
+					self._mark_dirty(key)
+				else: del self._value[key][remainder]
 			else: raise ValueError("Keys must be string")
 
 	def __contains__(self, item):
-		with self._lock:
-			if isinstance(item, str):
-				item = item.split(separator, maxsplit=1)
+		if not isinstance(item, str): raise ValueError("Keys must be string")
+		snapshot = self._read()
+		if snapshot is not None: return item in snapshot
 
-				if len(item) > 1:
-					try: return self._value[item[0]].__contains__(item[1])
-					except KeyError: return False
-				else: return self._value.__contains__(item[0])
-			else: raise ValueError("Keys must be string")
+		with self._lock:
+			key, remainder = split_key(item)
+			if remainder is not None:
+				try: return self._value[key].__contains__(remainder)
+				except KeyError: return False
+			else: return self._value.__contains__(key)
 
 	def update(self, other):
 		""" Updates the keys from given dictionary or object
 			(it must have an 'items' method that works similar as the dictionary method) """
-		with self._lock:
+		with self.transaction():
 			for k, v in other.items(): self[k] = v
 
 	def keys(self):
@@ -152,9 +395,8 @@ class Configuration(ConfigurationItem):
 
 	def get(self, key, default=None):
 		""" Safe alternative for getting a key, returns 'default' when the key wasn't found instead of raising an error """
-		with self._lock:
-			try: return self[key]
-			except KeyError: return default
+		try: return self[key]
+		except KeyError: return default
 
 	def get_or_create(self, key, create_value=None):
 		""" Same as get, but when a key wasn't found the 'create_value' (if given) is set to that value """
@@ -168,9 +410,9 @@ class Configuration(ConfigurationItem):
 			return res
 
 	def _get_item(self, key):
-		key = key.split(separator, maxsplit=1)
-		if len(key) == 1: return self._value[key[0]]
-		else: return self._value[key[0]]._get_item(key[1])
+		key, remainder = split_key(key)
+		if remainder is None: return self._value[key]
+		else: return self._value[key]._get_item(remainder)
 
 	def get_or_create_configuration(self, key, create_value=None):
 		""" Same as 'get_or_create' but returns a configuration object instead of a value """
@@ -186,11 +428,13 @@ class Configuration(ConfigurationItem):
 
 	def set_defaults(self, value):
 		""" Sets all non-existent key-value pairs from given dictionary, when a key already exists the currently set value is kept """
-		with self._lock:
+		with self.transaction():
 			for key, value in value.items(): self.get_or_create(key, value)
 
 	@property
 	def value(self):
+		snapshot = self._read()
+		if snapshot is not None: return _copy(snapshot[None])
 		with self._lock: return {k: v.value for k, v in self.items()}
 
 	@property
@@ -204,9 +448,10 @@ class Configuration(ConfigurationItem):
 		self._default_value = val
 
 		if val is not None:
-			for entry in self.values():
-				for key, value in val.items():
-					if key not in entry: entry[key] = value
+			with self.transaction():
+				for entry in self.values():
+					for key, value in val.items():
+						if key not in entry: entry[key] = value
 
 
 	def rename(self, from_key, to_key):
@@ -215,63 +460,178 @@ class Configuration(ConfigurationItem):
 		 Raises a KeyError if the target key already exists
 		"""
 		if to_key in self: raise KeyError(f"'{to_key}' already exists")
-		with self._lock:
+		with self.transaction():
 			self._value[to_key] = self._value[from_key]
 			del self._value[from_key]
-			self.mark_dirty()
+			self._mark_dirty(from_key)
+			self._mark_dirty(to_key)
+
+	def on_change(self, key, cb):
+		"""
+		 Register a callback that is called with given key and its new value every time that value changes, including changes to values nested in it
+		 The value is None when the key was removed, an empty key listens to every change in this configuration
+		 Callbacks are called on the thread that made the change, once the change is visible to all threads
+		"""
+		if not callable(cb): raise TypeError("Configuration listener must be callable")
+		with self._lock:
+			if self._listeners is None: self._listeners = {}
+			callbacks = self._listeners.setdefault(key, [])
+			if cb not in callbacks: callbacks.append(cb)
+
+	def remove_on_change(self, key, cb):
+		with self._lock:
+			try: self._listeners[key].remove(cb)
+			except (KeyError, TypeError, ValueError): pass
 
-	def __len__(self):
-		with self._lock: return len(self.value)
+	def __len__(self): return len(self._value)
 	def __str__(self):
 		with self._lock: return f"Configuration(dirty={self.dirty}, read_only={self.read_only}, value=[{', '.join([f'{k}: {str(v)}' for k, v in self.items()])}]"
 
 
 class ConfigurationFile(Configuration):
-	""" Same as a Configuration, but adds the ability read from/write to file """
+	"""
+	 Same as a Configuration, but adds the ability read from/write to file
+	 Changes are only written when saved, on a background thread 'save_delay' seconds after the first 'save' so saving often still writes once;
+	 values that are only set temporarily (like a new entry being edited in the options window) aren't written as long as they're removed before saving
+	 Files are replaced by writing to a temporary file first so the configuration is never lost when writing fails halfway,
+	 in json files only the top level sections that changed since the last write are converted to json again
+	 The file is written using given serializer (json if not specified), files written in a different format are still read and converted on the next write
+	 With any other serializer a json copy is written next to the file, it is read instead when the file itself can't be read (for example after a Python upgrade)
+	 When watched, changes made to the file by something else (like editing it by hand) are loaded automatically
+	"""
 	cfg_version = "2"
+	save_delay = 2
+	indent = 5
 
-	def __init__(self, filepath, cfg_values=None, readonly=False):
+	def __init__(self, filepath, cfg_values=None, readonly=False, serializer=None):
 		self._file = ".cfg/" + filepath
 		if not self._file.endswith(".cfg"): self._file += ".cfg"
+		self._serializer = serializer if serializer is not None else serialization.json_serializer
+		self._backup_file = self._file + ".json" if self._serializer is not serialization.json_serializer else None
+		self._sections = {}
+		self._mtime = None
+		self._write_lock = threading.RLock()
 		Configuration.__init__(self, value=cfg_values, read_only=readonly)
 		self._initialvalues = self._value
 		self.load()
 
 	def load(self):
 		""" (Re)load configuration from disk """
-		with self._lock:
+		with self.transaction():
 			if self._initialvalues: self._value = self._initialvalues
+			self._mtime = self._file_mtime()
 			fl = self._read_file()
 			if fl: self.update(fl)
+			self._sections.clear()
 			self._clear_dirty()
 
 	@property
 	def filename(self): return self._file.split("/")[-1]
+	@property
+	def serializer(self): return self._serializer
 
 	def _read_file(self):
 		with self._lock:
 			print("VERBOSE", f"Reading configuration file data from '{self.filename}'")
-			import json
+			try: cfg_data = self._read_data(self._file)
+			except ValueError as e:
+				if self._backup_file is None: return print("ERROR", f"Parsing configuration file '{self._file}':", e)
+				print("WARNING", f"Parsing configuration file '{self._file}' failed, reading backup '{self._backup_file}' instead:", e)
+				try: cfg_data = self._read_data(self._backup_file)
+				except (ValueError, FileNotFoundError) as e: return print("ERROR", f"Parsing configuration backup '{self._backup_file}':", e)
+			except FileNotFoundError: return print("VERBOSE", f"Configuration file '{self._file}' not found")
+
+			cfg_version = cfg_data.get("_version", "undefined")
+			if cfg_version != self.cfg_version:
+				print("WARNING", f"Configuration version mismatch: from {cfg_version} to {self.cfg_version}. Continuing to load but things might not work as expected")
+			return cfg_data
+
+	@staticmethod
+	def _read_data(file):
+		cfg_data = serialization.read_file(file)
+		if not isinstance(cfg_data, dict): raise ValueError("Configuration file doesn't contain a dictionary")
+		return cfg_data
+
+	def _file_mtime(self):
+		try: return os.stat(self._file).st_mtime_ns
+		except OSError: return None
+
+	def reload(self):
+		"""
+		 Read the file again and set all values that are different from the current values, listeners are only called for these values
+		 Keys that were removed from the file are kept, modules expect the values they created to exist
+		"""
+		with self._write_lock:
+			self._mtime = self._file_mtime()
+			data = self._read_file()
+			if not data: return
+
+			with self.transaction():
+				dirty = self.dirty
+				changed = _apply(self, data)
+				# values that came from the file don't need to be written again, unless there were other changes waiting to be written
+				if not dirty:
+					self._clear_dirty()
+					_writer.cancel(self)
+				self._sections.clear()
+		print("INFO", f"Reloaded configuration '{self.filename}', {changed} values changed")
+
+	def _check_file(self):
+		with self._write_lock:
+			mtime = self._file_mtime()
+			if mtime is None or mtime == self._mtime: return
+		print("VERBOSE", f"Configuration file '{self.filename}' was modified, reloading")
+		self.reload()
+
+	def watch(self):
+		""" Reload the file automatically when it is modified by something else, the modification time is checked every few seconds """
+		_watcher.add(self)
+
+	def unwatch(self):
+		_watcher.remove(self)
+
+	def _serialize(self):
+		"""
+		 Returns the contents of the file and of its json backup (None when the file is json itself)
+		 The json is the same as dumping the whole configuration, but sections that didn't change are taken from the previous write
+		"""
+		with self._lock:
+			if self.get("_version") != self.cfg_version: self["_version"] = self.cfg_version
+			data = self._serializer.dumps(self.value) if self._backup_file is not None else None
+
+			sections = {}
+			for key, item in self._value.items():
+				section = self._sections.get(key)
+				if section is None or section[0] is not item or item.dirty: section = item, json.dumps(item.value, indent=self.indent)
+				sections[key] = section
+			self._sections = sections
+			self._clear_dirty()
+
+		indent = " " * self.indent
+		json_data = ("{\n" + ",\n".join(f"{indent}{json.dumps(key)}: " + section.replace("\n", "\n" + indent) for key, (_, section) in sections.items()) + "\n}").encode() if sections else b"{}"
+		return (data, json_data) if data is not None else (json_data, None)
+
+	def _write(self):
+		with self._write_lock:
+			if not self.dirty: return
+			print("VERBOSE", f"Configuration '{self.filename}' changed, writing to file...")
+			data, backup = self._serialize()
 			try:
-				with open(self._file, "r") as file:
-					cfg_data = json.load(file)
-					cfg_version = cfg_data.get("_version", "undefined")
-					if cfg_version != self.cfg_version:
-						print("WARNING", f"Configuration version mismatch: from {cfg_version} to {self.cfg_version}. Continuing to load but things might not work as expected")
-					return cfg_data
-			except json.JSONDecodeError as e: print("ERROR", f"Parsing configuration file '{self._file}':", e)
-			except FileNotFoundError: print("VERBOSE", f"Configuration file '{self._file}' not found")
+				if backup is not None: serialization.write_file(self._backup_file, backup)
+				serialization.write_file(self._file, data)
+				self._mtime = self._file_mtime()
+			except OSError as e:
+				# try again with the next change or flush
+				print("ERROR", f"Writing configuration file '{self._file}':", e)
+				self._dirty = True
 
 	def save(self):
-		with self._lock:
-			if self.read_only: raise PermissionError("Cannot write a read only configuration")
-
-			print("VERBOSE", f"Trying to save file '{self._file}'")
-			if self.dirty:
-				print("VERBOSE", "Configuration dirty, writing to file...")
-				with open(self._file, "w") as file:
-					self["_version"] = self.cfg_version
-					import json
-					json.dump(self.value, file, indent=5)
-					file.flush()
-					self._clear_dirty()
\ No newline at end of file
+		""" Write changes to file on the background thread within 'save_delay' seconds, use 'flush' if the file must be written before continuing """
+		if self.read_only: raise PermissionError("Cannot write a read only configuration")
+		_writer.schedule(self, self.save_delay)
+
+	def flush(self):
+		""" Write changes to file on the current thread, returns once the file is written """
+		if self.read_only: raise PermissionError("Cannot write a read only configuration")
+		_writer.cancel(self)
+		self._write()
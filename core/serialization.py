@@ -0,0 +1,83 @@
+import abc, json, marshal, os
+
+class Serializer(abc.ABC):
+	"""
+	 Converts data to bytes and back, used for configuration, history and cache files
+	 Every format can recognize its own data, so a file can be read without knowing which format was used to write it:
+	 changing the format of a file only takes effect the next time it is written, the old file can still be read
+	"""
+	name = None
+
+	@abc.abstractmethod
+	def dumps(self, data):
+		""" Convert data to bytes """
+
+	@abc.abstractmethod
+	def loads(self, data):
+		""" Convert bytes written by 'dumps' back to data, raises ValueError if the data can't be read """
+
+	@abc.abstractmethod
+	def matches(self, data):
+		""" Returns True if given bytes were written by this serializer """
+
+class JsonSerializer(Serializer):
+	""" Readable text format, it has no header so any data not recognized by another format is read as json """
+	name = "json"
+
+	def __init__(self, indent=None):
+		self.indent = indent
+
+	def dumps(self, data): return json.dumps(data, indent=self.indent).encode()
+	def loads(self, data): return json.loads(data)
+	def matches(self, data): return True
+
+class BinarySerializer(Serializer):
+	"""
+	 Compact binary format using marshal, much faster to read and write than json
+	 Only supports the built-in types (dict, list, tuple, set, str, bytes, int, float, bool and None), unlike json tuples are kept as tuples
+	 The marshal format can change between Python versions, so the header contains the marshal version the data was written with:
+	 data written by a different version can't be read and raises ValueError, files that must survive a Python upgrade should have a json backup
+	"""
+	name = "binary"
+	header = b"PYB"
+
+	def dumps(self, data): return self.header + bytes([marshal.version]) + marshal.dumps(data, marshal.version)
+
+	def loads(self, data):
+		version = data[len(self.header)] if len(data) > len(self.header) else None
+		if version != marshal.version: raise ValueError(f"Data was written with marshal version {version}, this Python uses version {marshal.version}")
+		return marshal.loads(memoryview(data)[len(self.header) + 1:])
+
+	def matches(self, data): return data[:len(self.header)] == self.header
+
+json_serializer = JsonSerializer()
+binary_serializer = BinarySerializer()
+# checked in this order when reading, json must be last since it accepts everything
+serializers = {serializer.name: serializer for serializer in (binary_serializer, json_serializer)}
+
+def get_serializer(data):
+	""" Returns the serializer that wrote given data """
+	for serializer in serializers.values():
+		if serializer.matches(data): return serializer
+
+def loads(data):
+	""" Read data written by any of the serializers, raises ValueError if the data is invalid """
+	try: return get_serializer(data).loads(data)
+	except (EOFError, TypeError) as e: raise ValueError(f"Invalid data: {e}") from e
+
+def read_file(file):
+	""" Read a file written by any of the serializers, raises FileNotFoundError if the file doesn't exist and ValueError if its content is invalid """
+	with open(file, "rb") as f: return loads(f.read())
+
+def write_file(file, data):
+	""" Replace the content of given file with given bytes, data is written to a temporary file first so the file is never left half written """
+	temp_file = file + ".tmp"
+	with open(temp_file, "wb") as f:
+		f.write(data)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(temp_file, file)
+
+def dump_file(file, data, serializer=binary_serializer):
+	""" Write data to given file using given serializer """
+	write_file(file, serializer.dumps(data))
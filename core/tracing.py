@@ -0,0 +1,65 @@
+import contextlib, functools, json, os, threading, time
+
+trace_folder = ".log"
+trace_file = os.path.join(trace_folder, "startup_trace.json")
+
+class StartupTrace:
+	"""
+	 Records how long each step of starting the program takes: the launcher phases, importing every module and every '@Initialize'
+	 Steps can be nested and recorded from any thread, the trace is written in the Chrome trace event format so it can be opened in chrome://tracing
+	"""
+	def __init__(self):
+		self._start = time.perf_counter()
+		self._events = []
+		self._threads = {}
+		self._lock = threading.Lock()
+
+	def _timestamp(self, t): return round((t - self._start) * 1000000)
+
+	def _add(self, event):
+		thread = threading.current_thread()
+		event.update(pid=os.getpid(), tid=thread.ident)
+		with self._lock:
+			self._threads[thread.ident] = thread.name
+			self._events.append(event)
+
+	@contextlib.contextmanager
+	def span(self, name, category="startup", **args):
+		""" Record the time it takes to execute the body of this context, any keywords are included as arguments of this step """
+		start = time.perf_counter()
+		try: yield
+		finally:
+			end = time.perf_counter()
+			self._add({"name": name, "cat": category, "ph": "X", "ts": self._timestamp(start), "dur": self._timestamp(end) - self._timestamp(start), "args": args})
+
+	def traced(self, name, category="startup"):
+		""" Decorator that records every call to the decorated function as a step with given name """
+		def decorator(func):
+			@functools.wraps(func)
+			def wrapper(*args, **kwargs):
+				with self.span(name, category): return func(*args, **kwargs)
+			return wrapper
+		return decorator
+
+	def mark(self, name, category="startup", **args):
+		""" Record a single point in time """
+		self._add({"name": name, "cat": category, "ph": "i", "s": "p", "ts": self._timestamp(time.perf_counter()), "args": args})
+
+	def elapsed(self):
+		""" Time in seconds since the trace started """
+		return time.perf_counter() - self._start
+
+	def save(self, file=trace_file):
+		""" Write all recorded steps to given file, replacing its contents """
+		with self._lock:
+			events = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident, "args": {"name": name}} for ident, name in self._threads.items()]
+			events.extend(self._events)
+
+		try:
+			if not os.path.isdir(trace_folder): os.mkdir(trace_folder)
+			with open(file, "w") as f: json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+			print("VERBOSE", f"Startup trace with {len(events)} events written to '{file}'")
+		except Exception as e: print("ERROR", "Writing startup trace:", e)
+
+# started when this is first imported, which is one of the first things the launcher does
+startup_trace = StartupTrace()
@@ -51,6 +51,13 @@ def command_module_configure(arg, argc):
 		module.client.close_with_reason("module_configure")
 		return messagetypes.Reply("Module configuration loading...")
 
+def command_module_timing(arg, argc):
+	if argc == 0:
+		timings = module.interpreter.module_timings
+		lines = [f"{name}: {load_time * 1000:.0f}ms" if load_time is not None else f"{name}: not loaded yet" for name, load_time in timings]
+		startup, sequential = module.interpreter.startup_time
+		return messagetypes.Reply("Module load times:\n" + "\n".join(lines) + f"\nStartup took {startup * 1000:.0f}ms, {(sequential - startup) * 1000:.0f}ms less than loading one module at a time")
+
 def command_restart(arg, argc):
 	if argc == 0:
 		module.client.close_with_reason("restart")
@@ -58,6 +65,8 @@ def command_restart(arg, argc):
 
 def command_options(arg, argc):
 	if argc == 0:
+		# modules that weren't used yet only have their default configuration once they are initialized
+		module.interpreter.load_deferred_modules()
 		module.client.add_window(window_class=pyoptions.PyOptionsWindow, modules=module.interpreter.modules)
 		return messagetypes.Reply("Opening options window")
 
@@ -92,6 +101,7 @@ def command_timer(arg, argc):
 
 version_command = ["git", "log", "-1", "--pretty=%H//%ci"]
 version_output = None
+@module.Blocking
 def command_version(arg, argc):
 	if argc == 0:
 		global version_output
@@ -130,7 +140,10 @@ module.commands = {
 		"clean": command_log_clear,
 		"clear": lambda arg,argc: command_log_clear(arg, argc, all=True)
 	},
-	"modules": command_module_configure,
+	"modules": {
+		"": command_module_configure,
+		"timing": command_module_timing
+	},
 	"options": command_options,
 	"restart": command_restart,
 	"timer": command_timer,
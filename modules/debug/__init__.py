@@ -11,6 +11,47 @@ def command_debug_garbage_collection(arg, argc):
 		gc.collect()
 		return messagetypes.Reply("Garbage collection done")
 
+def command_benchmark_events(arg, argc):
+	if argc <= 1:
+		try: count = int(arg[0]) if argc > 0 else 100000
+		except ValueError: return messagetypes.Reply("Invalid number of events")
+
+		from . import benchmarks
+		return messagetypes.Reply(benchmarks.benchmark_events(count))
+
+def command_benchmark_configuration(arg, argc):
+	if argc <= 1:
+		try: count = int(arg[0]) if argc > 0 else 100000
+		except ValueError: return messagetypes.Reply("Invalid number of reads")
+
+		from . import benchmarks
+		return messagetypes.Reply(benchmarks.benchmark_configuration(count))
+
+def command_benchmark_library(arg, argc):
+	if argc <= 1:
+		if "player" not in module.interpreter.modules: return messagetypes.Reply("The player module must be enabled for this benchmark")
+		try: count = int(arg[0]) if argc > 0 else 100000
+		except ValueError: return messagetypes.Reply("Invalid number of files")
+
+		from . import benchmarks
+		return messagetypes.Reply(benchmarks.benchmark_library(count))
+
+def command_benchmark_commands(arg, argc):
+	if argc <= 1:
+		try: count = int(arg[0]) if argc > 0 else 100000
+		except ValueError: return messagetypes.Reply("Invalid number of commands")
+
+		from . import benchmarks
+		return messagetypes.Reply(benchmarks.benchmark_commands(list(module.interpreter.modules.values()), count))
+
+def command_benchmark_serialization(arg, argc):
+	if argc <= 1:
+		try: count = int(arg[0]) if argc > 0 else 1000
+		except ValueError: return messagetypes.Reply("Invalid number of modules")
+
+		from . import benchmarks
+		return messagetypes.Reply(benchmarks.benchmark_serialization(count))
+
 def command_window_check(arg, argc):
 	if argc == 1:
 		try:
@@ -26,6 +67,13 @@ def command_window_close(arg, argc):
 
 module.commands = {
 	"debug":{
+		"benchmark": {
+			"commands": command_benchmark_commands,
+			"configuration": command_benchmark_configuration,
+			"events": command_benchmark_events,
+			"library": command_benchmark_library,
+			"serialization": command_benchmark_serialization
+		},
 		"garbage": {
 			"": command_debug_auto_collection,
 			"collect": command_debug_garbage_collection
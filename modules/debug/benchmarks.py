@@ -0,0 +1,226 @@
+import os, shutil, tempfile, time
+
+def _timed(func, *args, repeat=1, **kwargs):
+	""" Returns the average time (in seconds) a single call took, together with the result of the last call """
+	res, start = None, time.perf_counter()
+	for _ in range(repeat): res = func(*args, **kwargs)
+	return (time.perf_counter() - start) / repeat, res
+
+def _ms(seconds): return f"{seconds * 1000:.2f}ms"
+def _us(seconds): return f"{seconds * 1000000:.0f}µs"
+
+def benchmark_library(count=100000, changes=100):
+	""" Compare updating a song library from a list of changes with rescanning the complete directory """
+	from modules.player import songlibrary
+	folder = tempfile.mkdtemp(prefix="pyplayer_benchmark_")
+	library = None
+	try:
+		print("INFO", f"Creating {count} files in '{folder}'...")
+		for i in range(count): open(os.path.join(folder, f"Artist {i % 1000} - Song {i}.mp3"), "w").close()
+
+		def _full_scan():
+			with os.scandir(folder) as directory: return [songlibrary.normalize(entry.name) for entry in directory if entry.is_file()]
+		scan_time, _ = _timed(_full_scan)
+
+		library = songlibrary.SongLibrary(folder)
+		build_time, _ = _timed(library.refresh)
+
+		new_files = [f"Benchmark - New {i}.mp3" for i in range(changes)]
+		for file in new_files: open(os.path.join(folder, file), "w").close()
+		rescan_time, _ = _timed(library.refresh)
+		for file in new_files: os.remove(os.path.join(folder, file))
+		library.refresh()
+
+		delta_time = 0
+		for file in new_files: open(os.path.join(folder, file), "w").close()
+		t, _ = _timed(library.apply_delta, songlibrary.LibraryDelta(added=new_files))
+		delta_time += t
+
+		renamed = [(file, "Renamed " + file) for file in new_files]
+		for old, new in renamed: os.rename(os.path.join(folder, old), os.path.join(folder, new))
+		t, _ = _timed(library.apply_delta, songlibrary.LibraryDelta(renamed=renamed))
+		delta_time += t
+
+		for _, file in renamed: os.remove(os.path.join(folder, file))
+		t, _ = _timed(library.apply_delta, songlibrary.LibraryDelta(removed=[file for _, file in renamed]))
+		delta_time += t
+
+		return "\n".join([f"Library benchmark with {count} files and {changes} changes:",
+			f" - full scan (scandir + normalize): {_ms(scan_time)}",
+			f" - initial library build: {_ms(build_time)}",
+			f" - library rescan after {changes} files were added: {_ms(rescan_time)}",
+			f" - applying {changes} additions, renames and removals as deltas: {_ms(delta_time)}"])
+	finally:
+		if library is not None:
+			try: os.remove(library.cache_file)
+			except FileNotFoundError: pass
+		shutil.rmtree(folder, ignore_errors=True)
+
+def _command_paths(commands, path=()):
+	for key, cmd in commands.items():
+		if isinstance(cmd, dict): yield from _command_paths(cmd, path + (key,) if key else path)
+		else: yield list(path + (key,) if key else path)
+
+def benchmark_commands(modules, count=100000):
+	""" Compare resolving commands by asking every module in order with resolving them from the combined command tree """
+	from core.modules import CommandTrie
+	commands = [path + ["some", "arguments"] for md in modules if md.commands for path in _command_paths(md.commands)]
+	commands.append(["unknown", "command"])
+	commands = [commands[i % len(commands)] for i in range(count)]
+
+	def _per_module():
+		for command in commands:
+			command = command + ["\x00"]
+			for md in modules:
+				if md.get_command_callback(command) is not None: break
+
+	def _trie(trie):
+		for command in commands: trie.resolve(command)
+
+	compile_time, trie = _timed(CommandTrie, modules, repeat=10)
+	module_time, _ = _timed(_per_module)
+	trie_time, _ = _timed(_trie, trie)
+	return "\n".join([f"Command resolution benchmark with {len(modules)} modules and {count} commands:",
+		f" - compiling the command tree: {_ms(compile_time)}",
+		f" - asking every module: {_ms(module_time)} ({count / module_time:.0f} commands/s)",
+		f" - command tree: {_ms(trie_time)} ({count / trie_time:.0f} commands/s)"])
+
+def benchmark_events(count=100000):
+	""" Compare the throughput of the interpreter event queue with the multiprocessing queue it replaced, with one producer and one consumer thread """
+	import multiprocessing, threading
+	from core.eventqueue import EventQueue
+
+	def _run(put, get):
+		def _produce():
+			for i in range(count): put(("pos_changed", i))
+		producer = threading.Thread(target=_produce)
+		start = time.perf_counter()
+		producer.start()
+		for _ in range(count): get()
+		producer.join()
+		return time.perf_counter() - start
+
+	mp_queue = multiprocessing.Queue()
+	mp_time = _run(mp_queue.put_nowait, mp_queue.get)
+	mp_queue.close()
+
+	event_queue = EventQueue()
+	queue_time = _run(event_queue.put, event_queue.get)
+	return "\n".join([f"Event queue benchmark with {count} events:",
+		f" - multiprocessing.Queue: {_ms(mp_time)} ({count / mp_time:.0f} events/s)",
+		f" - EventQueue: {_ms(queue_time)} ({count / queue_time:.0f} events/s)"])
+
+class _LockedItem:
+	""" A value of the configuration tree as it was before snapshots, every item has its own lock """
+	def __init__(self, value):
+		import threading
+		self._lock = threading.RLock()
+		self._value = value
+		self._dirty = False
+
+	@property
+	def value(self):
+		with self._lock: return self._value
+
+	def mark_dirty(self):
+		with self._lock: self._dirty = True
+
+class _LockedConfiguration(_LockedItem):
+	""" The configuration tree as it was before snapshots: reads and writes split the key and walk the tree, taking the lock of every level """
+	def __init__(self, value):
+		_LockedItem.__init__(self, {})
+		for key, item in value.items(): self[key] = item
+
+	@property
+	def value(self):
+		with self._lock: return {key: item.value for key, item in self._value.items()}
+
+	def __getitem__(self, key):
+		with self._lock:
+			key = key.split("::", maxsplit=1)
+			if len(key) == 1: return self._value[key[0]].value
+			else: return self._value[key[0]][key[1]]
+
+	def __setitem__(self, key, value):
+		with self._lock:
+			key = key.split("::", maxsplit=1)
+			if len(key) == 1: self._value[key[0]] = _LockedConfiguration(value) if isinstance(value, dict) else _LockedItem(value)
+			else:
+				# the parent was looked up with 'get', which copied its whole value
+				try: self[key[0]]
+				except KeyError: self[key[0]] = {}
+				self._value[key[0]][key[1]] = value
+			self.mark_dirty()
+
+def benchmark_configuration(count=100000, readers=4):
+	"""
+	 Compare reading configuration values from the snapshot with reading them through the locked configuration tree it replaced,
+	 both with and without a thread changing values at the same time, and compare single changes with changes combined in a transaction
+	"""
+	import threading
+	from core.pyconfiguration import Configuration
+	data = {"volume": 50, "player": {"shuffle": True, "library": {"path": "music", "extensions": ["mp3", "wav"]}}}
+	keys = ["volume", "player::shuffle", "player::library::path"]
+
+	def _concurrent(cfg, write):
+		def _read(per_thread):
+			for i in range(per_thread): cfg[keys[i % len(keys)]]
+
+		stop = threading.Event()
+		def _write():
+			i = 0
+			while not stop.is_set():
+				cfg["volume"] = i = i + 1
+				time.sleep(0)
+		threads = [threading.Thread(target=_read, args=(count // readers,)) for _ in range(readers)]
+		writer = threading.Thread(target=_write) if write else None
+		if writer: writer.start()
+		start = time.perf_counter()
+		for t in threads: t.start()
+		for t in threads: t.join()
+		duration = time.perf_counter() - start
+		stop.set()
+		if writer: writer.join()
+		return duration
+
+	def _write_single(cfg):
+		for i in range(count // 10): cfg["player::library::path"] = str(i)
+
+	def _write_batched(cfg):
+		with cfg.transaction():
+			for i in range(count // 10): cfg["player::library::path"] = str(i)
+
+	cfg, locked_cfg = Configuration(data), _LockedConfiguration(data)
+	snapshot_time, locked_time = _concurrent(cfg, False), _concurrent(locked_cfg, False)
+	snapshot_write_time, locked_write_time = _concurrent(cfg, True), _concurrent(locked_cfg, True)
+	locked_single_time, _ = _timed(_write_single, locked_cfg)
+	single_time, _ = _timed(_write_single, cfg)
+	batched_time, _ = _timed(_write_batched, cfg)
+	return "\n".join([f"Configuration benchmark with {count} reads on {readers} threads and {count // 10} writes:",
+		f" - locked reads: {_ms(locked_time)} ({count / locked_time:.0f} reads/s)",
+		f" - snapshot reads: {_ms(snapshot_time)} ({count / snapshot_time:.0f} reads/s)",
+		f" - locked reads while writing: {_ms(locked_write_time)} ({count / locked_write_time:.0f} reads/s)",
+		f" - snapshot reads while writing: {_ms(snapshot_write_time)} ({count / snapshot_write_time:.0f} reads/s)",
+		f" - locked single writes: {_ms(locked_single_time)} ({count // 10 / locked_single_time:.0f} writes/s)",
+		f" - single writes: {_ms(single_time)} ({count // 10 / single_time:.0f} writes/s)",
+		f" - writes in one transaction: {_ms(batched_time)} ({count // 10 / batched_time:.0f} writes/s)"])
+
+def benchmark_serialization(module_count=1000, history_count=100, repeat=20):
+	"""
+	 Compare the json and binary serializers on module data with 'module_count' modules (copies of the installed modules)
+	 and a song history with 'history_count' songs, the same data the launcher and player read and write
+	"""
+	import pymodules
+	from core import serialization
+	packages = [package for package in (pymodules.read_package(md) for md in pymodules.scan_for_modules()) if package]
+	module_data = {"_version": "2", "hash": "0" * 40, "dependency_hash": "0" * 40,
+		"modules": {f"{package['id']}_{i}": dict(package, id=f"{package['id']}_{i}") for i in range(module_count // max(1, len(packages)) + 1) for package in packages}}
+	song_history = {"history": [(os.path.join("music", "library"), f"Artist {i % 10} - Song {i}.mp3") for i in range(history_count)], "index": history_count, "limit": history_count}
+
+	lines = [f"Serialization benchmark with {len(module_data['modules'])} modules and {history_count} songs, average of {repeat} runs:"]
+	for name, data, indent in (("module data", module_data, 5), ("song history", song_history, None)):
+		for serializer in (serialization.JsonSerializer(indent), serialization.binary_serializer):
+			write_time, dumped = _timed(serializer.dumps, data, repeat=repeat)
+			read_time, _ = _timed(serialization.loads, dumped, repeat=repeat)
+			lines.append(f" - {name} as {serializer.name}: write {_us(write_time)}, read {_us(read_time)}, {len(dumped) / 1024:.1f}KiB")
+	return "\n".join(lines)
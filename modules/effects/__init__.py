@@ -7,6 +7,9 @@ module = modules.Module(__package__)
 loop_effect_command = "effect loop {}"
 sounds_path_key = "$sounds_path"
 pause_music_key = "pause_music_for_effects"
+max_suggestions = 10
+_effect_names = None, None, []
+pause_music = False
 
 class SoundEffectPlayer:
 	# sound effects longer than this time (im ms) are stopped when the same command is repeated, instead of replaying
@@ -22,7 +25,7 @@ class SoundEffectPlayer:
 		self._player.event_manager().event_attach(vlc.EventType.MediaPlayerEndReached, self._on_end_reached)
 
 	def _on_end_reached(self, event):
-		if module.configuration.get(pause_music_key): module.interpreter.put_command("player pause false")
+		if pause_music: module.interpreter.put_command("player pause false")
 		if self._last_effect[0] and self._last_effect[1]:
 			module.interpreter.put_command(loop_effect_command.format(self._last_effect[0]))
 
@@ -61,7 +64,7 @@ class SoundEffectPlayer:
 					self._media = vlc.Media(mrl, "input-repeat=-1" if loop else "input-repeat=0")
 
 			self._player.set_media(self._media)
-			if module.configuration.get(pause_music_key): module.interpreter.put_command("player pause true")
+			if pause_music: module.interpreter.put_command("player pause true")
 			self._player.play()
 			return messagetypes.Reply("Playing sound effect: " + self._last_effect[0])
 		else:
@@ -72,7 +75,7 @@ class SoundEffectPlayer:
 		self._player.stop()
 		self._media.release()
 		self._media = None
-		if module.configuration.get(pause_music_key): module.interpreter.put_command("player pause false")
+		if pause_music: module.interpreter.put_command("player pause false")
 		return messagetypes.Empty()
 
 	def on_destroy(self):
@@ -88,10 +91,29 @@ def play_effect(arg, argc):
 def stop_effect(arg, argc):
 	if argc == 0: return effect_player.stop_player()
 
+def get_effect_names():
+	""" Returns a sorted list of all sound effect names, the sound folder is only listed again after it was modified """
+	global _effect_names
+	sound_path = module.configuration.get(sounds_path_key)
+	try: mtime = os.stat(sound_path).st_mtime
+	except (OSError, TypeError): return []
+
+	if _effect_names[:2] != (sound_path, mtime): _effect_names = sound_path, mtime, sorted({os.path.splitext(file)[0] for file in os.listdir(sound_path)})
+	return _effect_names[2]
+
+@module.Autocomplete
+def autocomplete(command, arg):
+	if tuple(command) in (("effect",), ("effect", "loop")): return modules.prefix_match(get_effect_names(), " ".join(arg))[:max_suggestions] or None
+
+def _set_pause_music(key, value):
+	global pause_music
+	pause_music = bool(value)
+
 @module.Initialize
 def initialize():
 	module.configuration.get_or_create(sounds_path_key, "")
-	module.configuration.get_or_create(pause_music_key, False)
+	_set_pause_music(pause_music_key, module.configuration.get_or_create(pause_music_key, False))
+	module.configuration.on_change(pause_music_key, _set_pause_music)
 
 @module.Destroy
 def on_destroy():
@@ -2,21 +2,26 @@ import enum, os, random
 from datetime import datetime
 
 from .mediaplayer import MediaPlayer
-from . import albumwindow, mediacontrols, lyricviewer, songbrowser, song_tracker, songhistory, songqueue
+from . import albumwindow, mediacontrols, librarywatcher, lyricviewer, songbrowser, song_stats, song_tracker, songhistory, songqueue
 
 from ui.qt import pyelement
 from core import messagetypes, modules
 module = modules.Module(__package__)
 
 # MODULE SPECIFIC VARIABLES
-media_player = MediaPlayer()
+# created when the module is initialized, so importing this package doesn't start vlc
+media_player = None
 media_controller = mediacontrols.controller
 song_queue = songqueue.song_queue
 song_history = songhistory.song_history
+library_watcher = None
 invalid_cfg = messagetypes.Reply("Invalid directory configuration, check your options")
 unknown_song = messagetypes.Reply("That song doesn't exist and there is nothing playing")
 no_songs = messagetypes.Reply("No songs found")
 MAX_LIST = 15
+MAX_SUGGESTIONS = 10
+song_commands = {("info", "added"), ("info", "played"), ("lyrics",), ("player",), ("queue",)}
+directory_commands = {("filter",), ("player", "random"), ("browser",), ("browser", "name"), ("browser", "played"), ("browser", "played-month"), ("browser", "recent"), ("browser", "shuffle")}
 default_dir_path = "default_directory"
 player_filter_update_task = "player_filter_update"
 default_color = None
@@ -27,23 +32,30 @@ class Autoplay(enum.Enum):
 	ON = 2
 autoplay = Autoplay.OFF
 autoplay_ignore = False
+autoplay_random = None
 player_autoplay_update_task = "player_autoplay_update"
+# (key, path, priority) of every directory with a positive priority, sorted by priority
+_directory_paths = []
 
 # ===== HELPER OPERATIONS =====
+def _update_directory_paths(key, directories):
+	""" Sort the searchable directories once every time the directory configuration changes, instead of for every song that is searched """
+	global _directory_paths
+	paths = [(name, vl["$path"], vl.get("priority", -1)) for name, vl in (directories or {}).items()]
+	_directory_paths = sorted([pt for pt in paths if pt[2] > 0], key=lambda a: a[2])
+
 def get_song(arg):
 	dir = module.configuration["directory"]
 	if len(arg) > 0:
 		path = dir.get(arg[0])
 		if path is not None:
 			path = path["$path"]
-			return path, media_player.find_song(path, arg[1:])
+			return path, media_player.find_song(path, arg[1:], ranked=True, limit=messagetypes.Select.max_options)
 
-		paths = [(key, vl["$path"], vl["priority"]) for key, vl in dir.items() if vl["priority"] > 0]
-		paths.sort(key=lambda a: a[2])
 		songs = None
-		for pt in paths:
+		for pt in _directory_paths:
 			path = pt
-			songs = media_player.find_song(pt[1], arg)
+			songs = media_player.find_song(pt[1], list(arg), ranked=True, limit=messagetypes.Select.max_options)
 			if len(songs) > 0: break
 		return (path, songs) if songs else (None, None)
 	else:
@@ -54,6 +66,26 @@ def get_song(arg):
 			return path, [song]
 		return None, None
 
+def suggest_songs(arg, limit=MAX_SUGGESTIONS):
+	""" Get the best matching songs for a partially typed song argument, formatted so they can be used as command arguments """
+	dir = module.configuration["directory"]
+	prefix = ""
+	if len(arg) > 1 and arg[0] in dir:
+		prefix = arg[0] + " "
+		paths = [dir[arg.pop(0)]["$path"]]
+	else: paths = [pt[1] for pt in _directory_paths]
+
+	keyword = " ".join(arg)
+	for path in paths:
+		songs = media_player.get_search(path).complete(keyword, limit=limit) if path else None
+		if songs: return [prefix + get_displayname(song).replace(" - ", " ") + "." for song in songs]
+	return None
+
+def suggest_directories(arg, limit=MAX_SUGGESTIONS):
+	""" Get the configured directory names starting with the partially typed first argument """
+	if len(arg) != 1: return None
+	return modules.prefix_match(sorted(module.configuration["directory"].keys()), arg[0])[:limit] or None
+
 def get_addtime(display, song, path):
 	if isinstance(path, tuple): path = path[1]
 	time = datetime.fromtimestamp(os.path.getctime(os.path.join(path, song)))
@@ -120,13 +152,26 @@ def command_autoplay_next(arg, argc):
 			set_autoplay_ignore(False)
 			return messagetypes.Empty()
 
-		global autoplay
-		if autoplay.value > 0 and len(song_queue) > 0:
-			song = song_queue.get_next()
-			media_player.play_song(path=song[0], song=song[1])
-		elif autoplay.value > 1: media_player.random_song()
+		song = get_autoplay_next(peek=False)
+		if song is not None: media_player.play_song(path=song[0], song=song[1])
 		return messagetypes.Empty()
 
+def get_autoplay_next(peek):
+	""" Returns the song autoplay continues with as (path, song), when 'peek' is set the song stays in the queue """
+	global autoplay_random
+	if autoplay_ignore or autoplay == Autoplay.OFF: return None
+	if len(song_queue) > 0:
+		song = song_queue.peek_next() if peek else song_queue.get_next()
+		if song is not None: return song[0], song[1]
+
+	if autoplay == Autoplay.ON:
+		# the random song that was loaded ahead of time must be the one that gets played
+		if autoplay_random is None: autoplay_random = media_player.pick_random_song()
+		song = autoplay_random
+		if not peek: autoplay_random = None
+		return song
+	return None
+
 # - configure random song filter
 def command_filter_clear(arg, argc):
 	if argc == 0:
@@ -272,6 +317,7 @@ def get_audio_link(links):
 		if l["type"].startswith("audio/"): return l["href"]
 	return ""
 
+@module.Blocking
 def command_rss(arg, argc):
 	n = 1
 	if argc == 1:
@@ -300,6 +346,51 @@ def command_browser(arg, argc):
 		except KeyError: return messagetypes.Reply(f"Invalid default sorting set in configuration '{sorting}'")
 	return messagetypes.Reply(f"No default sorting set '{songbrowser.default_sort_key}' and none or invalid one specified")
 
+# - listening statistics over all tracked plays
+heatmap_levels = " .:-=+*#"
+invalid_period = messagetypes.Reply("Invalid period, use 'all', 'month', 'year', 'days <n>' or a year/month like '2020-01'")
+
+def get_stats_range(arg):
+	try: return song_stats.parse_range(arg)
+	except ValueError: return None
+
+def format_ranking(title, items):
+	if not items: return messagetypes.Reply("No plays found in that period")
+	return messagetypes.Reply(title + "\n" + "\n".join("{}. {} ({} plays)".format(i + 1, name, count) for i, (name, count) in enumerate(items)))
+
+def command_stats_artists(arg, argc):
+	period = get_stats_range(arg)
+	if period is None: return invalid_period
+	return format_ranking("Most played artists:", song_stats.top_artists(*period, limit=MAX_LIST))
+
+def command_stats_forgotten(arg, argc):
+	days = 90
+	if argc == 1:
+		try: days = int(arg[0])
+		except ValueError: return messagetypes.Reply("Invalid number of days")
+	elif argc > 1: return None
+
+	songs = song_stats.forgotten_favorites(days=days, limit=MAX_LIST)
+	if not songs: return messagetypes.Reply("No favorites that weren't played in the last {} days".format(days))
+	return messagetypes.Reply("Not played in the last {} days:\n".format(days) + "\n".join("{}. {} ({} plays, last played {dt:%B} {dt.year})".format(i + 1, song, count, dt=datetime.fromtimestamp(last)) for i, (song, count, last) in enumerate(songs)))
+
+def command_stats_heatmap(arg, argc):
+	period = get_stats_range(arg)
+	if period is None: return invalid_period
+
+	heatmap = song_stats.heatmap(*period)
+	top = max(max(day) for day in heatmap)
+	if top == 0: return messagetypes.Reply("No plays found in that period")
+	lines = ["Plays per hour:", "     " + "".join(f"{hour:<6}" for hour in range(0, 24, 6))]
+	for day, hours in enumerate(heatmap):
+		lines.append(song_stats.WEEKDAYS[day][:3] + "  " + "".join(heatmap_levels[-(-count * (len(heatmap_levels) - 1) // top)] for count in hours))
+	return messagetypes.Reply("\n".join(lines))
+
+def command_stats_songs(arg, argc):
+	period = get_stats_range(arg)
+	if period is None: return invalid_period
+	return format_ranking("Most played songs:", song_stats.top_songs(*period, limit=MAX_LIST))
+
 def command_stop(arg, argc):
 	if argc == 0:
 		media_player.stop_player()
@@ -342,7 +433,13 @@ module.commands = {
 		"clear": command_queue_clear,
 		"next": command_queue_next
 	}, "rss": command_rss,
-	"browser": {
+	"stats": {
+		"": command_stats_songs,
+		"artists": command_stats_artists,
+		"forgotten": command_stats_forgotten,
+		"heatmap": command_stats_heatmap,
+		"songs": command_stats_songs
+	}, "browser": {
 		"": command_browser,
 		"none": songbrowser.command_browser_remove,
 		"name": songbrowser.command_browser_name,
@@ -355,7 +452,12 @@ module.commands = {
 
 @module.Initialize
 def initialize():
+	global media_player
+	media_player = MediaPlayer()
 	media_player.update_blacklist(module.configuration.get_or_create("artist_blacklist", []))
+	media_player.update_shuffle_window(module.configuration.get_or_create("shuffle_window", 0))
+	media_player.crossfade = module.configuration.get_or_create("crossfade", 0)
+	media_player.set_next_provider(get_autoplay_next)
 	media_player.attach_event("media_changed", on_media_change)
 	media_player.attach_event("pos_changed", on_pos_change)
 	media_player.attach_event("player_updated", on_player_update)
@@ -383,6 +485,14 @@ def initialize():
 	directory = module.configuration.get_or_create_configuration("directory", {})
 	directory.default_value = {"#color": "", "$path": "", "priority": -1}
 	module.configuration.get_or_create(default_dir_path, "")
+	_update_directory_paths("directory", directory.value)
+	module.configuration.on_change("directory", _update_directory_paths)
+
+	global library_watcher
+	library_watcher = librarywatcher.LibraryWatcher(poll_interval=module.configuration.get_or_create("library_poll_interval", 30))
+	for options in directory.values():
+		if options["$path"]: library_watcher.watch(media_player.get_library(options["$path"]))
+	library_watcher.activate()
 
 	@module.client.events.EventKeyDown("MediaPause")
 	@module.client.events.EventKeyDown("MediaPlay")
@@ -403,6 +513,7 @@ def initialize():
 
 	module.client.add_task(task_id="player_progress_update", func=_set_client_progress)
 	module.client.add_task(task_id="player_title_update", func=_set_client_title)
+	module.client.add_task(task_id="player_count_update", func=_set_client_count)
 	module.client.schedule_task(task_id=player_autoplay_update_task, func=_set_client_autoplay)
 	module.client.schedule_task(task_id=player_filter_update_task, func=_set_client_filter, path=module.configuration[default_dir_path])
 	module.media_player = media_player
@@ -412,9 +523,18 @@ def initialize():
 	songbrowser.initialize()
 	command_filter_clear(None, 0)
 
+@module.Autocomplete
+def autocomplete(command, arg):
+	command = tuple(command)
+	if command in directory_commands: return suggest_directories(arg)
+	if command in song_commands:
+		suggestions = (suggest_directories(arg) or []) + (suggest_songs(list(arg)) or [])
+		return suggestions[:MAX_SUGGESTIONS] or None
+
 @module.Destroy
 def on_destroy():
-	media_player.on_destroy()
+	if library_watcher is not None: library_watcher.stop()
+	if media_player is not None: media_player.on_destroy()
 
 def on_media_change(event, player):
 	color = None
@@ -435,9 +555,8 @@ def on_player_update(event, player):
 	default_directory = module.configuration["directory"].get(module.configuration[default_dir_path])
 
 	if default_directory is not None and md.path == default_directory["$path"]:
-		song_tracker.add(md.display_name)
-		try: module.client["player"]["songbrowser"].add_count(md.display_name)
-		except KeyError: pass
+		song_tracker.add(md.display_name, path=md.path)
+		module.client.schedule_task(task_id="player_count_update", song=md.display_name)
 	song_history.add([md.path, md.song])
 
 def on_end_reached(event, player):
@@ -455,6 +574,10 @@ def _set_client_title(media, color):
 	bar.progress, bar.color = 0, color if color is not None else default_color
 	songbrowser.title_update(media, color)
 
+def _set_client_count(song):
+	try: module.client["player"]["songbrowser"].add_count(song)
+	except KeyError: pass
+
 def _set_client_autoplay():
 	global autoplay, autoplay_ignore
 	module.client["player"]["autoplay"].text = f"Autoplay: {autoplay.name.lower()}" + (" - [Skip next]" if autoplay_ignore else "")
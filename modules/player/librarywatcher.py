@@ -0,0 +1,149 @@
+import ctypes, os, select, struct, sys, time
+
+from ui.qt import pyworker
+from .songlibrary import LibraryDelta
+
+# inotify constants, see 'man inotify'
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+watch_mask = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+event_header = struct.Struct("iIII")
+
+def _load_inotify():
+	if not sys.platform.startswith("linux"): return None
+	try:
+		import ctypes.util
+		libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+		libc.inotify_init1, libc.inotify_add_watch
+		return libc
+	except Exception as e:
+		print("INFO", "Inotify not available, library changes are polled instead:", e)
+		return None
+
+class LibraryWatcher(pyworker.PyWorker):
+	"""
+	 Keeps song libraries up to date in the background
+	 Changes are received from inotify when supported by the platform,
+	 all libraries are also checked periodically by comparing the directory modification time
+	 Libraries are only marked as watched while inotify reports their changes, other libraries still need to be refreshed when they are used
+	"""
+	def __init__(self, poll_interval=30):
+		pyworker.PyWorker.__init__(self, "library_watcher", False)
+		self._lock = pyworker.PyLock()
+		self._run = True
+		self._poll_interval = max(1, poll_interval)
+		self._libraries = []
+		self._watches = {}
+		self._unwatchable = set()
+		self._inotify = _load_inotify()
+		self._fd = -1
+
+	def watch(self, library):
+		""" Start watching given library, has no effect if the library is already being watched """
+		with self._lock:
+			if library not in self._libraries: self._libraries.append(library)
+
+	def stop(self):
+		with self._lock: self._run = False
+
+	def _is_running(self):
+		with self._lock: return self._run
+
+	def _get_libraries(self):
+		with self._lock: return list(self._libraries)
+
+	# === INOTIFY ===
+	def _add_inotify_watch(self, library):
+		""" Returns True if changes to the library are received from inotify, False if it needs to be polled """
+		if library in self._watches.values(): return True
+		if self._fd < 0 or library in self._unwatchable: return False
+
+		wd = self._inotify.inotify_add_watch(self._fd, os.fsencode(library.path), watch_mask)
+		if wd < 0:
+			print("INFO", f"Cannot watch '{library.path}' using inotify (errno {ctypes.get_errno()}), polling instead")
+			self._unwatchable.add(library)
+			return False
+		self._watches[wd] = library
+		library.refresh()
+		library.watched = True
+		return True
+
+	def _read_inotify(self):
+		# take the modification times before reading the events, a change made after this is rescanned by the next refresh
+		mtimes = {}
+		for library in set(self._watches.values()):
+			try: mtimes[library] = os.stat(library.path).st_mtime
+			except FileNotFoundError: mtimes[library] = None
+		try: data = os.read(self._fd, 64 * 1024)
+		except BlockingIOError: return
+
+		deltas, moved = {}, {}
+		offset = 0
+		while offset < len(data):
+			wd, mask, cookie, length = event_header.unpack_from(data, offset)
+			offset += event_header.size
+			name = os.fsdecode(data[offset:offset+length].rstrip(b"\0"))
+			offset += length
+
+			library = self._watches.get(wd)
+			if library is None or mask & IN_ISDIR: continue
+			if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+				print("INFO", f"Watched directory '{library.path}' was removed, polling it instead")
+				del self._watches[wd]
+				self._unwatchable.add(library)
+				library.watched = False
+				continue
+
+			added, removed, renamed = deltas.setdefault(library, ([], [], []))
+			if mask & IN_CREATE: added.append(name)
+			elif mask & IN_DELETE: removed.append(name)
+			elif mask & IN_MOVED_FROM: moved[cookie] = name; removed.append(name)
+			elif mask & IN_MOVED_TO:
+				old = moved.pop(cookie, None)
+				if old is not None:
+					removed.remove(old)
+					renamed.append((old, name))
+				else: added.append(name)
+
+		for library, (added, removed, renamed) in deltas.items():
+			delta = library.apply_delta(LibraryDelta(added=added, removed=removed, renamed=renamed), mtime=mtimes.get(library))
+			print("VERBOSE", f"Library '{library.path}' received changes:", delta)
+
+	# === WORKER ===
+	def run(self):
+		print("INFO", "Library watcher started")
+		# update all libraries once before waiting for changes, so the first command doesn't have to
+		for library in self._get_libraries(): library.refresh()
+
+		if self._inotify is not None:
+			self._fd = self._inotify.inotify_init1(IN_NONBLOCK)
+			if self._fd < 0: print("WARNING", "Failed to initialize inotify, libraries will be polled instead")
+
+		next_poll = time.monotonic() + self._poll_interval
+		try:
+			while self._is_running():
+				libraries = self._get_libraries()
+				for library in libraries: self._add_inotify_watch(library)
+				if self._fd >= 0:
+					ready, _, _ = select.select([self._fd], [], [], 1)
+					if ready: self._read_inotify()
+				else: self.sleep(1)
+
+				# inotify doesn't report changes made by other machines on network shares, so all libraries are polled
+				if time.monotonic() >= next_poll:
+					next_poll = time.monotonic() + self._poll_interval
+					for library in libraries: library.refresh()
+				for library in libraries: library.save_cache()
+		finally:
+			if self._fd >= 0: os.close(self._fd)
+			self._fd = -1
+			for library in self._watches.values(): library.watched = False
+			self._watches.clear()
+		print("INFO", "Library watcher stopped")
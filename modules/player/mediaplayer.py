@@ -1,10 +1,21 @@
-import os, random
+import functools, os, threading, time
 import vlc as VLCPlayer
+from collections import OrderedDict
+
+from .songlibrary import SongLibrary
+from .songsearch import SongSearch
+from .songsampler import SongSampler
 
 
 def get_displayname(filepath):
 	return os.path.splitext(filepath)[0]
 
+def warm_file(file, chunk_size=1 << 20):
+	""" Read through the whole file so it is in the page cache of the OS, which makes starting it from a network share instant """
+	buffer = bytearray(chunk_size)
+	with open(file, "rb", buffering=0) as f:
+		while f.readinto(buffer): pass
+
 class DynamicClass:
 	def __init__(self, **kwargs):
 		for it in kwargs.items(): self.__setattr__(*it)
@@ -23,11 +34,48 @@ class MediaPlayerEventUpdate(DynamicClass):
 		self.data = data
 		DynamicClass.__init__(self, **kwargs)
 
+class MediaPlayerEventPosition(DynamicClass):
+	""" Position update from the player clock, uses the same layout as the vlc position event so handlers work with both """
+	def __init__(self, position, **kwargs):
+		self.u = DynamicClass(new_position=position)
+		DynamicClass.__init__(self, **kwargs)
+
+class PlaybackClock:
+	""" Keeps track of the position in the current song using the monotonic clock, so the position doesn't depend on player events """
+	def __init__(self):
+		self._start = None
+		self._offset = 0
+
+	@property
+	def time(self):
+		""" The current position in the song in milliseconds """
+		if self._start is None: return self._offset
+		return self._offset + (time.monotonic() - self._start) * 1000
+
+	@property
+	def running(self): return self._start is not None
+
+	def start(self, offset=0):
+		""" (Re)start the clock from given position in milliseconds """
+		self._offset = max(0, offset)
+		self._start = time.monotonic()
+
+	def pause(self):
+		self._offset = self.time
+		self._start = None
+
+	def resume(self):
+		if self._start is None: self._start = time.monotonic()
+
 class MediaPlayer:
 	""" Helper class for playing music using the vlc python bindings
-	 	When a new song is started when the last song is almost done,
-	 	the player will start the new song without stopping the previous for smooth transitioning  """
-	end_pos = 0.85
+	 	Two players are used, so a new song can be started while the previous song fades out
+	 	The position in the current song is tracked with a monotonic clock, when the song is about to end
+	 	the next song is requested from the 'next provider' ahead of time and is faded in over 'crossfade' seconds """
+	played_pos = 0.85
+	max_samplers = 8
+	tick_interval = 0.1
+	prefetch_time = 10
 
 	def __init__(self):
 		print("VERBOSE", "Initializing new MediaPlayer instance...")
@@ -38,18 +86,33 @@ class MediaPlayer:
 		self._player2.audio_output_set("mmdevice")
 
 		self._muted = self._paused = False
-		self._player_one = True
+		self._player_one = False
 		self._media = self._media_data = None
-		self._updated = False
+		self._counted = self._transition_checked = self._prefetch_checked = False
 		self._filter = self._blacklist = self._last_random = None
 		self._last_position = 0
+		self._libraries = {}
+		self._searches = {}
+		self._samplers = OrderedDict()
+		self._shuffle_window = 0
+
+		self._lock = threading.RLock()
+		self._clock = PlaybackClock()
+		self._length = 0
+		self._crossfade = 0
+		self._volume = 100
+		self._fade = None
+		self._next_provider = self._preloaded = None
+		self._ticker = None
+		self._run = True
+		# set by vlc event callbacks, these must not block so the ticker handles these
+		self._started_player = self._end_reached = None
 
 		self._events = {
 			"end_reached": (VLCPlayer.EventType.MediaPlayerEndReached, self.on_song_end, []),
 			"media_changed": (VLCPlayer.EventType.MediaPlayerMediaChanged, self.on_media_change, []),
 			"paused": (VLCPlayer.EventType.MediaPlayerPaused, self.on_pause, []),
 			"playing": (VLCPlayer.EventType.MediaPlayerPlaying, self.on_play, []),
-			"pos_changed": (VLCPlayer.EventType.MediaPlayerPositionChanged, self.on_pos_change, []),
 			"stopped": (VLCPlayer.EventType.MediaPlayerStopped, self.on_stop, [])
 		}
 
@@ -59,28 +122,46 @@ class MediaPlayer:
 			self._player1.event_manager().event_attach(event_value[0], event_value[1], event_key, self._player1, True)
 			self._player2.event_manager().event_attach(event_value[0], event_value[1], event_key, self._player2, False)
 
-		# register custom event handlers
-		self._events["player_updated"] = (MediaPlayerEventUpdate, self.on_update, [])
+		# custom events are not raised by vlc, the ticker calls their handlers
+		self._events["player_updated"] = (MediaPlayerEventUpdate, None, [])
+		self._events["pos_changed"] = (MediaPlayerEventPosition, None, [])
 
 	# === PLAYER PROPERTIES ===
 	@property
+	def current_player(self):
+		""" Returns the player that is assigned the current song """
+		return self._player1 if self._player_one else self._player2
+	@property
 	def active_player(self):
 		""" Get the player that is currenty playing music (this player is currently using the assigned media)
 			Returns this player or None if there is nothing playing """
-		play1 = self._player1.is_playing()
-		play2 = self._player2.is_playing()
-		if play1: return self._player2 if play2 and self._updated else self._player1
-		elif play2:	return self._player1 if play1 and self._updated else self._player2
-		else: return None
+		player = self.current_player
+		return player if player.is_playing() else None
 	@property
 	def next_player(self):
 		""" Returns the player that should be used to play the next song """
-		return self._player1 if self._player_one else self._player2
+		return self._player2 if self._player_one else self._player1
 	@property
 	def current_media(self):
 		""" Returns information about the current song playing, or None if nothing playing """
 		return self._media_data
 
+	@property
+	def crossfade(self): return self._crossfade
+	@crossfade.setter
+	def crossfade(self, seconds):
+		""" Set the amount of seconds the next song fades in while the previous one fades out, 0 starts the next song right when the previous ends """
+		self._crossfade = max(0, float(seconds))
+
+	def set_next_provider(self, cb):
+		"""
+		 Set the callback that decides which song plays after the current one, it is called with a 'peek' argument
+		 and must return a (path, song) tuple or None if nothing should be played after the current song
+		 When 'peek' is set, the song is only loaded ahead of time and should not be taken from any queue yet
+		"""
+		if cb is not None and not callable(cb): raise TypeError("Next provider must be callable")
+		self._next_provider = cb
+
 	@property
 	def filter_path(self): return self._filter[0] if self._filter is not None else ""
 	@property
@@ -98,7 +179,45 @@ class MediaPlayer:
 		if blacklist is not None and not isinstance(blacklist, list): raise TypeError("Blacklist must be a list!")
 		self._blacklist = blacklist
 
+	@property
+	def shuffle_window(self): return self._shuffle_window
+	def update_shuffle_window(self, window):
+		""" Set the amount of random songs that must be picked before the same song can be picked again, 0 allows repeating immediately """
+		self._shuffle_window = max(0, int(window))
+		for sampler in self._samplers.values(): sampler.window = self._shuffle_window
+
 	# === PLAYER UTILITIES ===
+	def get_library(self, path):
+		""" Get the song library for given path, the library is created (and loaded from cache) when it is first requested """
+		path = os.path.normpath(path)
+		library = self._libraries.get(path)
+		if library is None: self._libraries[path] = library = SongLibrary(path)
+		return library
+
+	def get_search(self, path):
+		""" Get the ranked search index for given path, it is built when first requested and stays updated with the library """
+		library = self.get_library(path)
+		if not library.watched: library.refresh()
+		search = self._searches.get(library.path)
+		if search is None: self._searches[library.path] = search = SongSearch(library)
+		return search
+
+	def get_sampler(self, path, keyword=""):
+		""" Get the random song sampler for given path and keyword that also takes the current blacklist into account
+			Only the most recently used samplers are kept, older samplers are discarded """
+		if not path: return None
+		library = self.get_library(path)
+		if not library.watched: library.refresh()
+
+		key = library.path, keyword.lower(), tuple(sorted(item.lower() for item in self._blacklist)) if self._blacklist else ()
+		sampler = self._samplers.get(key)
+		if sampler is None:
+			print("VERBOSE", f"Creating random song sampler for '{path}', keyword={keyword}")
+			self._samplers[key] = sampler = SongSampler(library, keyword, self._blacklist, window=self._shuffle_window)
+			if len(self._samplers) > self.max_samplers: self._samplers.popitem(last=False)[1].close()
+		else: self._samplers.move_to_end(key)
+		return sampler
+
 	def list_songs(self, path, keyword="", exact_search=False):
 		"""	List all items found in specified directory
 			Items that match the full keyword get returned first, if no matches found returns items containing the keyword
@@ -106,31 +225,18 @@ class MediaPlayer:
 				keyword: [optional], returns all items matching this keyword or all items if no argument passed
 				exact_search: [optional], set true to only look for songs with an exact match """
 		print("VERBOSE", f"looking for songs in '{path}' with keyword(s) '{keyword}'")
-		res1 = []
-		res2 = []
-		keyword = keyword.lower()
-
-		if os.path.isdir(path):
-			with os.scandir(path) as dir:
-				for entry in dir:
-					if entry.is_file():
-						file = entry.name
-						song = get_displayname(file.replace(" - ", " ").lower())
-						if exact_search and song == keyword: return [file]
-						elif " " + keyword + " " in " " + song + " ": res1.append(file)
-						elif keyword == "" or keyword in song: res2.append(file)
-
-		if len(res1) > 0:
-			print("VERBOSE", f"Found {len(res1)} exact match(es)")
-			return res1
-		else:
-			print("VERBOSE", f"Found {len(res2)} match(es) containing required keyword(s)")
-			return res2
+		if not path: return []
+
+		library = self.get_library(path)
+		if not library.watched: library.refresh()
+		return library.search(keyword, exact_search=exact_search)
 
-	def find_song(self, path, keyword=None):
+	def find_song(self, path, keyword=None, ranked=False, limit=None):
 		""" Find songs in given path that contain given keyword, where keyword should be a string list separated by spaces
 			- when the keyword ends with a '.' only an exact match (if it exists) is returned
 			- when the keyword ends with a number, this number will be used for picking one from the found selection (if in range)
+			- when 'ranked' is set, songs are ordered from best to worst match and keywords with typos or partial words also find songs,
+			  at most 'limit' songs are returned in this case
 			-> Returns a list of songs found where each item is a tuple: (displayname, song) """
 		exact = False
 		index = -1
@@ -144,8 +250,9 @@ class MediaPlayer:
 					keyword.pop(-1)
 				except ValueError: pass
 
-		keyword = " ".join(keyword)
-		ls = self.list_songs(path, keyword, exact_search=exact)
+		keyword = " ".join(keyword) if keyword else ""
+		if ranked and path and keyword and not exact: ls = [song for _, song in self.get_search(path).search(keyword, limit=limit, exact_first=True)]
+		else: ls = self.list_songs(path, keyword, exact_search=exact)
 		if 0 <= index < len(ls): return [(get_displayname(ls[index]), ls[index])]
 		else: return [(get_displayname(s), s) for s in ls]
 
@@ -164,37 +271,175 @@ class MediaPlayer:
 		return self._play(url=url, display_meta=displayname)
 
 	def _play(self, path='', song='', url=None, display_meta=''):
-		if self._paused: self.stop_player()
-
-		if song:
-			self._media_data = MediaPlayerData(path, song)
-			url = os.path.join(path, song)
-		elif url: self._media_data = MediaPlayerData('', display_meta)
-
-		if self._media is not None: self._media.release()
-		self._media = self._vlc.media_new(url)
-		player = self.next_player
-		player.set_media(self._media)
-		player.play()
-
-		self.mute_player(self._muted)
-		self._paused = False
-		self._updated = True
-		return self._media_data
-
+		with self._lock:
+			if self._paused: self.stop_player()
+
+			media = None
+			if song:
+				self._media_data = MediaPlayerData(path, song)
+				url = os.path.join(path, song)
+				if self._preloaded is not None and self._preloaded[:2] == (path, song):
+					media = self._preloaded[2]
+					self._preloaded = None
+			elif url: self._media_data = MediaPlayerData('', display_meta)
+
+			if media is None: media = self._vlc.media_new(url)
+			else: print("VERBOSE", f"Using prefetched media for '{song}'")
+			if self._media is not None: self._media.release()
+			self._media = media
+
+			previous = self.active_player
+			if self._fade is not None: self._fade[1].stop()
+			self._player_one = not self._player_one
+			player = self.current_player
+			player.set_media(self._media)
+
+			if previous is not None and self._crossfade > 0:
+				fade_clock = PlaybackClock()
+				fade_clock.start()
+				self._fade = (fade_clock, previous)
+				player.audio_set_volume(0)
+			else:
+				self._fade = None
+				if previous is not None: previous.stop()
+				player.audio_set_volume(self._volume)
+			player.play()
+
+			self._length = max(0, self._media.get_duration())
+			self._clock.start()
+			self._counted = self._transition_checked = self._prefetch_checked = False
+			self.mute_player(self._muted)
+			self._paused = False
+			self._start_ticker()
+			return self._media_data
+
+	def prefetch(self, path, song):
+		"""
+		 Prepare a song that is about to be played in the background: the file is read ahead and its media is created and parsed,
+		 the next time this song is played the prepared media is used so playback starts without delay
+		 Only one song is prefetched at a time, prefetching another song discards the previous one
+		"""
+		with self._lock:
+			if self._preloaded is not None:
+				if self._preloaded[:2] == (path, song): return
+				if self._preloaded[2] is not None: self._preloaded[2].release()
+			# the media is added once it is ready, until then playing this song just creates new media
+			self._preloaded = (path, song, None)
+		threading.Thread(target=self._run_prefetch, args=(path, song), name="media_player_prefetch", daemon=True).start()
+
+	def _run_prefetch(self, path, song):
+		url = os.path.join(path, song)
+		try: warm_file(url)
+		except OSError as e: return print("WARNING", f"Cannot prefetch '{url}':", e)
+
+		media = self._vlc.media_new(url)
+		media.parse_with_options(VLCPlayer.MediaParseFlag.local, 0)
+		with self._lock:
+			if self._preloaded == (path, song, None):
+				self._preloaded = (path, song, media)
+				print("VERBOSE", f"Prefetched next song '{song}'")
+			else: media.release()
+
+	def _prefetch_next(self):
+		""" Prefetch the song the next provider will return """
+		try: item = self._next_provider(peek=True)
+		except Exception as e:
+			print("ERROR", "Getting the next song:", e)
+			item = None
+		if item is not None: self.prefetch(*item)
+
+	def _play_next(self):
+		""" Start the song returned by the next provider, the prefetched media is used when it is the same song """
+		try: item = self._next_provider(peek=False)
+		except Exception as e:
+			print("ERROR", "Getting the next song:", e)
+			item = None
+		if item is not None and os.path.isfile(os.path.join(*item)): self._play(path=item[0], song=item[1])
+
+	# === PLAYER CLOCK ===
+	def _start_ticker(self):
+		if self._ticker is None or not self._ticker.is_alive():
+			self._ticker = threading.Thread(target=self._run_ticker, name="media_player_clock", daemon=True)
+			self._ticker.start()
+
+	def _run_ticker(self):
+		while self._run:
+			try:
+				with self._lock: actions = self._tick()
+				# handlers and the next provider can take a while, they are called without holding the lock
+				for action in actions: action()
+			except Exception as e: print("ERROR", "Updating media player:", e)
+			time.sleep(self.tick_interval)
+
+	def _tick(self):
+		""" Update the state of the player, returns a list of functions to call once the lock is released """
+		actions = []
+		started, self._started_player = self._started_player, None
+		# the song starts a little later than requested, keep the clock in sync with the actual position
+		if started is not None and started is self.current_player and not self._paused: self._clock.start(max(0, started.get_time()))
+		ended, self._end_reached = self._end_reached, None
+		if ended is not None and ended[0] is self.current_player:
+			self._paused = False
+			self._clock.pause()
+			# the ticker starts the next song before this one ends, the end of a song only moves on when it didn't
+			actions.append(functools.partial(self.call_attached_handlers, "end_reached", ended[1]))
+
+		self._update_fade()
+		if self._media_data is None or self._paused or not self._clock.running: return actions
+
+		if self._length <= 0: self._length = max(0, self.current_player.get_length())
+		if self._length <= 0: return actions
+
+		position = self._clock.time
+		self._last_position = min(1, position / self._length)
+		actions.append(functools.partial(self.call_attached_handlers, "pos_changed", MediaPlayerEventPosition(self._last_position)))
+		if not self._counted and self._last_position >= self.played_pos: actions.append(self._count_played())
+
+		if self._next_provider is None or self._transition_checked: return actions
+		remaining = (self._length - position) / 1000
+		if not self._prefetch_checked and remaining <= self.prefetch_time + self._crossfade:
+			self._prefetch_checked = True
+			actions.append(self._prefetch_next)
+
+		if remaining <= max(self._crossfade, self.tick_interval):
+			self._transition_checked = True
+			if not self._counted: actions.append(self._count_played())
+			actions.append(self._play_next)
+		return actions
+
+	def _update_fade(self):
+		if self._fade is None: return
+		fade_clock, previous = self._fade
+		progress = min(1, fade_clock.time / 1000 / self._crossfade) if self._crossfade > 0 else 1
+		self.current_player.audio_set_volume(round(self._volume * progress))
+		if progress >= 1:
+			previous.stop()
+			self._fade = None
+		else: previous.audio_set_volume(round(self._volume * (1 - progress)))
+
+	def _count_played(self):
+		""" Mark the current song as played, returns the function that calls the handlers for it """
+		self._counted = True
+		return functools.partial(self.call_attached_handlers, "player_updated", MediaPlayerEventUpdate(self._media_data))
 
 	def reset(self):
-		""" Stops the player and attempts to restart the last played song from the last known position
-		 	In case of a transition this plays the song that was set last and aborts playing any other songs active
+		""" Stops the player and restarts the current song from the last known position on the first player, any crossfade is aborted
 		 	It does not however reset the update flag and won't trigger the 'player_updated' again (if it was already called) """
-		if self._media:
+		with self._lock:
+			if self._media is None: return
+			self._fade = None
 			self._player1.stop()
 			self._player2.stop()
 			self._player_one = True
 			self._player1.set_media(self._media)
+			self._player1.audio_set_volume(self._volume)
 			self._player1.play()
 			self._player1.set_position(self._last_position)
-
+			self._clock.start(self._last_position * self._length)
+			self._paused = False
+			self._transition_checked = self._prefetch_checked = False
+			self.mute_player(self._muted)
+			self._start_ticker()
 
 	def set_position(self, pos):
 		""" Update the position the player is currently at, has no effect if the player is stopped/finished
@@ -203,8 +448,11 @@ class MediaPlayer:
 			print("VERBOSE", "Trying to update player position to {}".format(pos))
 			pl = self.active_player
 			if pl is not None:
-				pl.set_position(pos)
-				pl.play()
+				with self._lock:
+					pl.set_position(pos)
+					pl.play()
+					self._clock.start(pos * self._length)
+					self._transition_checked = self._prefetch_checked = False
 				return True
 			else: return False
 		else:
@@ -228,43 +476,48 @@ class MediaPlayer:
 			else: raise ValueError("Unsupported type")
 		else: self._paused = not self._paused and self._media_data is not None
 
-		self._player1.set_pause(self._paused)
-		self._player2.set_pause(self._paused)
+		with self._lock:
+			self._player1.set_pause(self._paused)
+			self._player2.set_pause(self._paused)
+			# a crossfade in progress is paused together with the song
+			fade_clock = self._fade[0] if self._fade is not None else None
+			if self._paused:
+				self._clock.pause()
+				if fade_clock is not None: fade_clock.pause()
+			else:
+				self._clock.resume()
+				if fade_clock is not None: fade_clock.resume()
 
 	def stop_player(self):
 		""" Stop playback """
-		self._paused = False
-		self._player1.stop()
-		self._player2.stop()
-		self._media_data = None
+		with self._lock:
+			self._paused = False
+			self._fade = None
+			self._player1.stop()
+			self._player2.stop()
+			self._clock.pause()
+			self._media_data = None
 
 # ===== OTHER FUNCTIONS =====
-	def random_song(self, path="", keyword=""):
-		""" Choose a random song from a directory, uses values set in player filter when no arguments are given """
+	def pick_random_song(self, path="", keyword=""):
+		""" Choose a random song from a directory without playing it, uses values set in player filter when no arguments are given
+			Returns a (path, song) tuple or None if no song matches """
 		if path == "": path = self.filter_path
 		if keyword == "": keyword = self.filter_keyword
-		print("VERBOSE", f"Play random song from '{path}', keyword={keyword}")
-		songlist = self.list_songs(path, keyword)
-		if len(songlist) > 0:
-			song = None
-			tries = 0
-			while song is None and tries < 3:
-				tries += 1
-				s = random.choice(songlist)
-				match = False
-				if self._blacklist is not None:
-					for item in self._blacklist:
-						if item.lower() == s.split(" - ", maxsplit=1)[0].lower():
-							match = True
-							print("INFO", "Found blacklist item '{}', tried {} times now".format(item, tries))
-							break
-				if not match: song = s
-
-			if song is not None:
-				self._last_random = (path, song)
-				self.play_song(path, song)
-				return "Playing: {}".format(get_displayname(song))
-			else: return "No song found that doesn't match something in blacklist, try reducing the number of blacklisted items"
+		sampler = self.get_sampler(path, keyword)
+		song = sampler.pick() if sampler is not None else None
+		if song is None: return None
+		self._last_random = (path, song)
+		return path, song
+
+	def random_song(self, path="", keyword=""):
+		""" Choose a random song from a directory, uses values set in player filter when no arguments are given
+			Songs from artists in the blacklist are never picked """
+		print("VERBOSE", f"Play random song from '{path or self.filter_path}', keyword={keyword or self.filter_keyword}")
+		item = self.pick_random_song(path, keyword)
+		if item is not None:
+			self.play_song(*item)
+			return "Playing: {}".format(get_displayname(item[1]))
 		return "No songs with that filter"
 
 	def play_last_random(self):
@@ -300,9 +553,9 @@ class MediaPlayer:
 				except Exception as e: print("ERROR", f"Calling event handler '{name}':", e)
 
 	def on_song_end(self, event, name, player, player_one):
-		if not self._updated:
-			self._paused = False
-			self.call_attached_handlers(name, event)
+		if self._player_one == player_one:
+			# the handlers are called by the ticker, unless it already started the next song
+			self._end_reached = (player, event)
 
 	def on_media_change(self, event, name, player, player_one):
 		if self._player_one == player_one:
@@ -318,24 +571,15 @@ class MediaPlayer:
 
 	def on_play(self, event, name, player, player_one):
 		if self._player_one == player_one:
+			# vlc doesn't allow blocking in its callbacks, the ticker syncs the clock with this player
+			self._started_player = player
 			self.call_attached_handlers(name, event)
 
-	def on_pos_change(self, event, name, player, player_one):
-		if (self._player_one == self._updated) == player_one:
-			pos = event.u.new_position
-			self._last_position = pos
-			if self._updated and pos > MediaPlayer.end_pos:
-				self._player_one = not self._player_one
-				self._updated = False
-				self.call_attached_handlers("player_updated", MediaPlayerEventUpdate(self._media_data))
-			self.call_attached_handlers(name, event)
-
-	def on_update(self, event, name, player, player_one):
-		self.call_attached_handlers(name, event)
-
 # ====== DESTROY PLAYER INSTANCE =====
 	def on_destroy(self):
 		print("VERBOSE", "Looks like we're done here, release all player stuffs")
+		self._run = False
+		if self._ticker is not None: self._ticker.join()
 		self._player1.release()
 		self._player2.release()
 		self._vlc.release()
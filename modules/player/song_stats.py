@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+import calendar
+
+from . import song_tracker
+
+WEEKDAYS = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+_artist = "CASE WHEN instr(song, ' - ') > 0 THEN substr(song, 1, instr(song, ' - ') - 1) ELSE '' END"
+
+def _month_start(year, month): return datetime(year, month, 1)
+def _month_end(year, month): return _month_start(year, month) + timedelta(days=calendar.monthrange(year, month)[1])
+
+def _parse_date(text, end=False):
+	""" Parse a year ('2020') or month ('2020-01'), returns the start of that period or the end of it when 'end' is set """
+	year, _, month = text.partition("-")
+	year = int(year)
+	if month:
+		month = int(month)
+		if not 1 <= month <= 12: raise ValueError(f"Invalid month: {text}")
+		return _month_end(year, month) if end else _month_start(year, month)
+	return datetime(year + 1, 1, 1) if end else datetime(year, 1, 1)
+
+def parse_range(arg):
+	"""
+	 Get the (start, end) timestamps for the date range described by given arguments, either value is None when unbounded
+	 Supported ranges: 'all' or nothing, 'month', 'year', 'days <n>', a single year or month ('2020', '2020-01') or two of these
+	 Raises ValueError if the arguments don't describe a date range
+	"""
+	now = datetime.today()
+	if not arg or arg == ["all"]: return None, None
+	if arg == ["month"]: return _month_start(now.year, now.month).timestamp(), None
+	if arg == ["year"]: return datetime(now.year, 1, 1).timestamp(), None
+	if len(arg) == 2 and arg[0] == "days": return (now - timedelta(days=int(arg[1]))).timestamp(), None
+	if len(arg) == 1: return _parse_date(arg[0]).timestamp(), _parse_date(arg[0], end=True).timestamp()
+	if len(arg) == 2: return _parse_date(arg[0]).timestamp(), _parse_date(arg[1], end=True).timestamp()
+	raise ValueError(f"Invalid date range: {' '.join(arg)}")
+
+def _where(start, end, path, *conditions):
+	conditions, args = list(conditions), []
+	if start is not None: conditions.append("time >= ?"); args.append(start)
+	if end is not None: conditions.append("time < ?"); args.append(end)
+	if path is not None: conditions.append("path = ?"); args.append(path)
+	return (" WHERE " + " AND ".join(conditions) if conditions else ""), args
+
+def _source(start, end, path, *conditions):
+	# totals without a date range are read from the aggregated counters instead of going through every play
+	table = "alltime" if start is None and end is None else "plays"
+	where, args = _where(start, end, path, *conditions)
+	return table + where, args
+
+def top_songs(start=None, end=None, limit=10, path=None):
+	""" Returns a list of (song, count) tuples for the most played songs between start and end """
+	source, args = _source(start, end, path)
+	return song_tracker.query(f"SELECT song, SUM(count) AS plays FROM {source} GROUP BY song HAVING plays > 0 ORDER BY plays DESC, song LIMIT ?", args + [limit])
+
+def top_artists(start=None, end=None, limit=10, path=None):
+	""" Returns a list of (artist, count) tuples for the artists with the most played songs between start and end """
+	source, args = _source(start, end, path, f"{_artist} != ''")
+	return song_tracker.query(f"SELECT {_artist} AS artist, SUM(count) AS plays FROM {source} GROUP BY artist HAVING plays > 0 ORDER BY plays DESC, artist LIMIT ?", args + [limit])
+
+def heatmap(start=None, end=None, path=None):
+	"""
+	 Returns the amount of plays for every hour of every day of the week, as a list of 7 lists (starting on Sunday) with 24 values
+	 Plays imported from old month files only have a month and no path, these are not included
+	"""
+	where, args = _where(start, end, path, "path != ''")
+	res = [[0] * 24 for _ in range(7)]
+	query = f"SELECT CAST(strftime('%w', time, 'unixepoch', 'localtime') AS INTEGER) AS day, CAST(strftime('%H', time, 'unixepoch', 'localtime') AS INTEGER) AS hour, SUM(count) FROM plays{where} GROUP BY day, hour"
+	for day, hour, count in song_tracker.query(query, args): res[day][hour] = count
+	return res
+
+def forgotten_favorites(days=90, limit=10, path=None):
+	""" Returns a list of (song, count, last_played) tuples for the most played songs overall that weren't played in the last 'days' days """
+	since = (datetime.today() - timedelta(days=days)).timestamp()
+	where, args = _where(None, None, path)
+	query = f"SELECT song, SUM(count) AS plays, MAX(time) AS last FROM plays{where} GROUP BY song HAVING plays > 0 AND last < ? ORDER BY plays DESC, song LIMIT ?"
+	return song_tracker.query(query, args + [since, limit])
@@ -1,63 +1,135 @@
 from datetime import datetime
 from collections import Counter
-import calendar, os
+import calendar, os, sqlite3, threading
+
+tracker_folder = "statistics"
+tracker_file = os.path.join(tracker_folder, "tracker.db")
 
 tracker = None
-tracker_file = ""
-is_dirty = False
+alltime_tracker = None
 listeners = []
+_db = None
+_month = ""
+_lock = threading.RLock()
+
+_tables = """
+CREATE TABLE IF NOT EXISTS plays (id INTEGER PRIMARY KEY, time REAL NOT NULL, path TEXT NOT NULL, song TEXT NOT NULL, count INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS monthly (month TEXT NOT NULL, path TEXT NOT NULL, song TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (month, path, song)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS alltime (path TEXT NOT NULL, song TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (path, song)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS plays_time ON plays (time);
+CREATE INDEX IF NOT EXISTS plays_song ON plays (song, time);
+CREATE TABLE IF NOT EXISTS migrated (file TEXT PRIMARY KEY, mtime REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS migrated_songs (file TEXT NOT NULL, song TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (file, song)) WITHOUT ROWID;
+"""
+
+def get_month(time=None):
+	""" Get the key used for the monthly counters for given datetime, the current month if not specified """
+	if time is None: time = datetime.today()
+	return f"{time.year:04}-{time.month:02}"
 
 def is_loaded():
 	return tracker is not None
 
 def load_tracker():
-	global tracker, tracker_file, is_dirty
-	m = datetime.today()
-	tracker_file = "statistics/" + calendar.month_name[m.month].lower() + str(m.year)
-	tracker = load_file(tracker_file)
-	is_dirty = False
-
-def load_file(file):
-	global tracker_file
-	if not os.path.isdir("statistics"): os.mkdir("statistics")
-	if not file.startswith("statistics/"): tracker_file = "statistics/" + file
+	""" Open the play database and load the counters for this month and all time, new or modified old month files are migrated first """
+	global tracker, alltime_tracker, _db, _month
+	with _lock:
+		if _db is not None: _db.close()
+		if not os.path.isdir(tracker_folder): os.mkdir(tracker_folder)
+		_db = sqlite3.connect(tracker_file, check_same_thread=False)
+		# plays are only ever appended, a write ahead log keeps adding a play from rewriting the database
+		_db.execute("PRAGMA journal_mode=WAL")
+		_db.execute("PRAGMA synchronous=NORMAL")
+		_db.executescript(_tables)
+		migrate_files()
+
+		_month = get_month()
+		tracker = _load_counter("SELECT song, SUM(count) FROM monthly WHERE month=? GROUP BY song", (_month,))
+		alltime_tracker = _load_counter("SELECT song, SUM(count) FROM alltime GROUP BY song")
+
+def _load_counter(query, args=()):
+	return Counter({song: count for song, count in _db.execute(query, args) if count > 0})
+
+def read_month_file(file):
+	""" Read a month file from the old tracker format, every line contains a song and its play count separated by '%' """
 	c = Counter()
-	try:
-		d = open(tracker_file, "r")
+	with open(file, "r") as d:
 		for item in d:
 			item = item.replace("\n", "").split("%", maxsplit=1)
 			if len(item) == 2:
-				try: c[item[0]] = int(item[1])
+				try: c[item[0]] += int(item[1])
 				except ValueError: pass
-		d.close()
-	except FileNotFoundError: open(tracker_file, "w+").close()
 	return c
 
-def save_tracker():
-	global tracker, tracker_file, is_dirty
-	if is_dirty:
-		file = open(tracker_file, "w")
-		for item, count in tracker.items():
-			file.write(item + "%" + str(count) + "\n")
-		file.close()
-	is_dirty = False
-
-def add(song, n=1):
-	global tracker, is_dirty
-	tracker[song] += n
-	is_dirty = True
-	save_tracker()
+def _parse_month_file(name):
+	""" Returns the month key for a file name from the old tracker ('january2020'), or None if it isn't a month file """
+	for index, month in enumerate(calendar.month_name):
+		if index > 0 and name.startswith(month.lower()) and name[len(month):].isdigit():
+			return f"{int(name[len(month):]):04}-{index:02}"
+	return None
+
+def migrate_files(path=""):
+	"""
+	 Import all month files from the old tracker format, the files themselves are left untouched
+	 A file is only read again when its modification time changed since it was imported, in that case only the difference is added
+	 Plays from these files don't have a path, they are stored using the given path key
+	"""
+	with _lock, _db:
+		migrated = {file: mtime for file, mtime in _db.execute("SELECT file, mtime FROM migrated")}
+		for name in sorted(os.listdir(tracker_folder)):
+			month = _parse_month_file(name)
+			if month is None: continue
+			file = os.path.join(tracker_folder, name)
+			mtime = os.stat(file).st_mtime
+			if migrated.get(name) == mtime: continue
+
+			counter = read_month_file(file)
+			if name in migrated:
+				print("INFO", f"Tracker file '{name}' was modified, updating imported plays")
+				counter.subtract({song: count for song, count in _db.execute("SELECT song, count FROM migrated_songs WHERE file=?", (name,))})
+			else: print("INFO", f"Migrating {len(counter)} songs from tracker file '{name}'")
+
+			time = datetime(int(month[:4]), int(month[5:]), 1).timestamp()
+			for song, count in counter.items():
+				if count == 0: continue
+				_add_play(time, month, path, song, count)
+				_db.execute("INSERT INTO migrated_songs (file, song, count) VALUES (?, ?, ?) ON CONFLICT(file, song) DO UPDATE SET count=count+excluded.count", (name, song, count))
+			_db.execute("INSERT OR REPLACE INTO migrated (file, mtime) VALUES (?, ?)", (name, mtime))
+
+def _add_play(time, month, path, song, n):
+	_db.execute("INSERT INTO plays (time, path, song, count) VALUES (?, ?, ?, ?)", (time, path, song, n))
+	_db.execute("INSERT INTO monthly (month, path, song, count) VALUES (?, ?, ?, ?) ON CONFLICT(month, path, song) DO UPDATE SET count=count+excluded.count", (month, path, song, n))
+	_db.execute("INSERT INTO alltime (path, song, count) VALUES (?, ?, ?) ON CONFLICT(path, song) DO UPDATE SET count=count+excluded.count", (path, song, n))
+
+def add(song, n=1, path=""):
+	""" Register that a song from given path was played, this appends the play and updates the counters without reading any history """
+	global tracker, _month
+	now = datetime.today()
+	with _lock:
+		month = get_month(now)
+		if month != _month: tracker, _month = Counter(), month
+
+		with _db: _add_play(now.timestamp(), month, path, song, n)
+		tracker[song] += n
+		alltime_tracker[song] += n
 	for l in listeners: l(song, n)
 
-def get_songlist(alltime=False):
-	if not alltime: return tracker
+def get_songlist(alltime=False, path=None, month=None):
+	"""
+	 Get a counter containing the play count of every song, for this month or all time
+	 When a path is given only plays from that path are counted, a month ('2020-01') can be given to get the counter for a different month
+	"""
+	if path is None and month is None: return alltime_tracker if alltime else tracker
+
+	query, args = ("SELECT song, SUM(count) FROM alltime", []) if alltime else ("SELECT song, SUM(count) FROM monthly WHERE month=?", [month or _month])
+	if path is not None:
+		query += " AND path=?" if not alltime else " WHERE path=?"
+		args.append(path)
+	with _lock: return _load_counter(query + " GROUP BY song", args)
 
-	songlist = Counter()
-	for item in os.listdir("statistics"):
-		if item != "player": songlist.update(load_file(item))
-	return songlist
+def query(query, args=()):
+	""" Run a query on the play database, returns a list containing all result rows """
+	with _lock: return _db.execute(query, args).fetchall()
 
 def get_freq(song, alltime=False):
-	ls = get_songlist(alltime)
-	if song in ls: return ls[song]
-	else: return 0
\ No newline at end of file
+	return get_songlist(alltime)[song]
@@ -10,7 +10,12 @@ module = modules.Module(__package__)
 default_path_key = "default_directory"
 default_sort_key = "songbrowser_sorting"
 
-def get_songlist(path): return [os.path.splitext(entry.name)[0] for entry in os.scandir(path) if entry.is_file()]
+def get_library(path):
+	library = module.media_player.get_library(path)
+	if not library.watched: library.refresh()
+	return library
+
+def get_songlist(path): return [os.path.splitext(song)[0] for song in get_library(path).songs]
 class SongBrowser(pyelement.PyItemlist):
 	""" Can list all items (songs) from a directory in a specified order
 		possible orderings: frequency(counter), creation time, name
@@ -39,13 +44,8 @@ class SongBrowser(pyelement.PyItemlist):
 		if not self._path_valid: self.itemlist = [(0, "Invalid path selected: " + str(self._path))]
 
 	def select_song(self, song):
-		index = -1
-		found = False
-		for s in self.itemlist:
-			if s == song: index = max(0, index + 1); found = True; break
-			else: index += 1
-
-		if found:
+		index = self.index_of(song)
+		if index >= 0:
 			self.set_selection(index=index)
 			self.move_to(index)
 		else: self.clear_selection()
@@ -55,20 +55,15 @@ class SongBrowser(pyelement.PyItemlist):
 		if self._path_valid:
 			self._is_dynamic = True
 			self._songcounter = Counter()
-			for entry in os.scandir(self.path[1]):
-				if entry.is_file():
-					song = os.path.splitext(entry.name)[0]
-					self._songcounter[song] += songcounter[song]
+			for song in get_songlist(self.path[1]): self._songcounter[song] += songcounter[song]
 			self.itemlist = [i[0] for i in self._songcounter.most_common()]
 
 	def create_list_from_recent(self, path):
 		self.path = path
 		if self._path_valid:
 			self._songcounter = Counter()
-			for entry in os.scandir(self.path[1]):
-				if entry.is_file():
-					song = os.path.splitext(entry.name)[0]
-					self._songcounter[song] = entry.stat().st_ctime
+			library = get_library(self.path[1])
+			for song in library.songs: self._songcounter[os.path.splitext(song)[0]] = library.get_ctime(song)
 			self.itemlist = [i[0] for i in self._songcounter.most_common()]
 
 	def create_list_from_name(self, path):
@@ -86,11 +81,26 @@ class SongBrowser(pyelement.PyItemlist):
 		if self._path_valid:
 			if self._is_dynamic:
 				self._songcounter[song] += add
-				self.itemlist = [i[0] for i in self._songcounter.most_common()]
+				self._update_position(song)
 				self.select_song(song)
 			return True
 		else: return False
 
+	def _update_position(self, song):
+		""" Move the song to its new place in the list sorted on play count, only the rows it moves past are updated """
+		index = self.index_of(song)
+		if index < 0:
+			index = len(self)
+			self.insert_item(index, song)
+
+		# songs with the same count keep their order, so the song moves in front of the first song with a lower count
+		count = self._songcounter[song]
+		low, high = 0, index
+		while low < high:
+			middle = (low + high) // 2
+			if self._songcounter[self.item(middle)] >= count: low = middle + 1
+			else: high = middle
+		self.move_item(index, low)
 
 # ===== HELPER OPERATIONS ===== #
 def parse_path(arg, argc):
@@ -115,7 +125,7 @@ def bind_events():
 
 		@browser.events.EventDoubleClickRight
 		def _browser_rightclick():
-			module.interpreter.put_command(f"queue {browser.path[0]} {browser.itemlist[browser.clicked_index].replace(' - ', ' ')}.")
+			module.interpreter.put_command(f"queue {browser.path[0]} {browser.item(browser.clicked_index).replace(' - ', ' ')}.")
 		browser.select_song(module.client.title_song)
 
 def title_update(data, color):
@@ -0,0 +1,231 @@
+import hashlib, json, os, threading
+from collections import namedtuple
+
+library_folder = os.path.join(".cache", "library")
+library_version = 1
+LibraryDelta = namedtuple("LibraryDelta", ["added", "removed", "renamed"], defaults=[(), (), ()])
+
+def normalize(song):
+	""" Get the searchable name for given song file: lowercase without extension and artist separator """
+	return os.path.splitext(song.replace(" - ", " ").lower())[0]
+
+class SongLibrary:
+	"""
+	 Index of all songs in a single directory, kept in memory and saved to the cache folder
+	 The directory is only rescanned when its modification time changes, in that case only the difference is processed
+	 Searching is done using a token index on the normalized song names instead of going through every file
+	"""
+	def __init__(self, path):
+		self._path = path
+		self._lock = threading.RLock()
+		self._mtime = None
+		self._songs = {}
+		self._names = {}
+		self._exact = {}
+		self._tokens = {}
+		self._listeners = []
+		self._cache_dirty = False
+		self.watched = False
+		self._cache_file = os.path.join(library_folder, hashlib.md5(path.encode()).hexdigest())
+		self._load_cache()
+
+	@property
+	def path(self): return self._path
+	@property
+	def cache_file(self): return self._cache_file
+
+	@property
+	def songs(self):
+		""" Returns a sorted list of all songs (filenames) currently in this library """
+		with self._lock: return sorted(self._songs.keys())
+
+	def get_ctime(self, song):
+		""" Returns the creation time of given song or None if the song is not in this library """
+		with self._lock: return self._songs.get(song)
+
+	def add_listener(self, cb):
+		""" Register a callback that is called with this library and a 'LibraryDelta' every time songs are added, removed or renamed """
+		if not callable(cb): raise TypeError("Library listener must be callable")
+		if cb not in self._listeners: self._listeners.append(cb)
+
+	def remove_listener(self, cb):
+		try: self._listeners.remove(cb)
+		except ValueError: pass
+
+	def _call_listeners(self, delta):
+		for cb in self._listeners:
+			try: cb(self, delta)
+			except Exception as e: print("ERROR", "Calling library listener:", e)
+
+	def __contains__(self, song):
+		with self._lock: return song in self._songs
+	def __len__(self):
+		with self._lock: return len(self._songs)
+	def __str__(self): return f"SongLibrary[path={self._path}, song_count={len(self)}]"
+
+	# === INDEXING ===
+	def _add(self, song, ctime):
+		name = normalize(song)
+		self._songs[song] = ctime
+		self._names[song] = name
+		self._exact.setdefault(name, song)
+		for token in set(name.split(" ")):
+			if token: self._tokens.setdefault(token, set()).add(song)
+
+	def _remove(self, song):
+		name = self._names.pop(song)
+		del self._songs[song]
+		if self._exact.get(name) == song: del self._exact[name]
+		for token in set(name.split(" ")):
+			songs = self._tokens.get(token)
+			if songs is not None:
+				songs.discard(song)
+				if not songs: del self._tokens[token]
+
+	def _clear(self):
+		self._songs.clear()
+		self._names.clear()
+		self._exact.clear()
+		self._tokens.clear()
+
+	def refresh(self):
+		"""
+		 Make sure the library matches the directory, this only costs a single 'stat' call when the directory didn't change
+		 Returns True if the library was updated
+		"""
+		with self._lock:
+			try: mtime = os.stat(self._path).st_mtime
+			except (FileNotFoundError, NotADirectoryError):
+				if self._mtime is None and not self._songs: return False
+				print("INFO", f"Library path '{self._path}' no longer exists, clearing library")
+				removed = tuple(self._songs.keys())
+				self._clear()
+				self._mtime = None
+				self._cache_dirty = True
+				self._call_listeners(LibraryDelta(removed=removed))
+				return True
+
+			if mtime == self._mtime: return False
+			print("VERBOSE", f"Directory '{self._path}' was modified, updating library")
+			self._update(mtime)
+			return True
+
+	def _update(self, mtime):
+		added, found = [], set()
+		with os.scandir(self._path) as directory:
+			for entry in directory:
+				if entry.is_file():
+					found.add(entry.name)
+					if entry.name not in self._songs:
+						self._add(entry.name, entry.stat().st_ctime)
+						added.append(entry.name)
+
+		removed = [s for s in self._songs.keys() if s not in found]
+		for song in removed: self._remove(song)
+
+		self._mtime = mtime
+		print("VERBOSE", f"Library '{self._path}' updated: {len(added)} added, {len(removed)} removed")
+		if added or removed:
+			self._cache_dirty = True
+			self.save_cache()
+			self._call_listeners(LibraryDelta(added=tuple(added), removed=tuple(removed)))
+
+	def apply_delta(self, delta, mtime=None):
+		"""
+		 Update the library with changes that are already known, without listing the directory
+		 Renamed songs keep their creation time, added songs that no longer exist are ignored
+		 When the directory modification time after these changes is given, the next 'refresh' won't rescan the directory
+		 Returns the delta that was applied, containing only the changes that had an effect
+		"""
+		with self._lock:
+			added, removed, renamed = [], [], []
+			for song in delta.removed:
+				if song in self._songs:
+					self._remove(song)
+					removed.append(song)
+
+			for old, new in delta.renamed:
+				ctime = self._songs.get(old)
+				if ctime is not None:
+					self._remove(old)
+					if new in self._songs: self._remove(new)
+					self._add(new, ctime)
+					renamed.append((old, new))
+
+			for song in delta.added:
+				if song not in self._songs:
+					try: self._add(song, os.stat(os.path.join(self._path, song)).st_ctime)
+					except FileNotFoundError: continue
+					added.append(song)
+
+			if mtime is not None: self._mtime = mtime
+			delta = LibraryDelta(added=tuple(added), removed=tuple(removed), renamed=tuple(renamed))
+			if added or removed or renamed:
+				self._cache_dirty = True
+				self._call_listeners(delta)
+			return delta
+
+	# === CACHING ===
+	def _load_cache(self):
+		try:
+			with open(self._cache_file, "r") as file: data = json.load(file)
+			if data.get("version") != library_version or data.get("path") != self._path: return print("INFO", f"Ignoring outdated library cache for '{self._path}'")
+
+			with self._lock:
+				for song, ctime in data["songs"].items(): self._add(song, ctime)
+				self._mtime = data["mtime"]
+			print("VERBOSE", f"Loaded {len(self._songs)} songs from library cache for '{self._path}'")
+		except FileNotFoundError: pass
+		except Exception as e:
+			print("ERROR", f"Loading library cache for '{self._path}':", e)
+			self._clear()
+
+	def save_cache(self):
+		""" Write the current library to the cache folder, has no effect if nothing changed since the last save """
+		with self._lock:
+			if not self._cache_dirty: return
+			if not os.path.isdir(library_folder): os.makedirs(library_folder)
+			try:
+				with open(self._cache_file, "w") as file: json.dump({"version": library_version, "path": self._path, "mtime": self._mtime, "songs": self._songs}, file)
+				self._cache_dirty = False
+			except Exception as e: print("ERROR", f"Saving library cache for '{self._path}':", e)
+
+	# === SEARCHING ===
+	def search(self, keyword="", exact_search=False):
+		"""
+		 Find all songs matching the keyword, songs where the keyword matches full words are returned first,
+		 if there are none, the songs containing the keyword anywhere in their name are returned
+		 When 'exact_search' is set and a song with the exact keyword exists, only that song is returned
+		"""
+		keyword = keyword.lower()
+		with self._lock:
+			if exact_search:
+				song = self._exact.get(keyword)
+				if song is not None: return [song]
+
+			if not keyword: return sorted(self._songs.keys())
+			res = self._search_tokens(keyword)
+			if res:
+				print("VERBOSE", f"Found {len(res)} exact match(es)")
+				return res
+
+			res = sorted([song for song, name in self._names.items() if keyword in name])
+			print("VERBOSE", f"Found {len(res)} match(es) containing required keyword(s)")
+			return res
+
+	def _search_tokens(self, keyword):
+		tokens = keyword.split(" ")
+		if "" in tokens: return None
+
+		candidates = []
+		for token in set(tokens):
+			songs = self._tokens.get(token)
+			if not songs: return None
+			candidates.append(songs)
+
+		candidates.sort(key=len)
+		songs = candidates[0].intersection(*candidates[1:])
+		if len(tokens) > 1:
+			keyword = " " + keyword + " "
+			songs = [s for s in songs if keyword in " " + self._names[s] + " "]
+		return sorted(songs)
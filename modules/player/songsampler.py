@@ -0,0 +1,129 @@
+import array, random, threading
+from collections import OrderedDict
+
+from .songlibrary import normalize
+
+def get_artist(song): return song.split(" - ", maxsplit=1)[0].lower()
+
+class SongSampler:
+	"""
+	 Picks random songs from the songs in a library that match a keyword and are not from a blacklisted artist
+	 The selection is made once and kept in sync with the library, so picking a song takes constant time
+	 When a shuffle window is set, songs picked within the last 'window' picks are not picked again
+
+	 Songs get an id and all ids are stored in one array, ordered so that songs that can be picked come first,
+	 followed by the songs that were picked recently: picking a song or releasing one from the window is a single swap
+	 The recently picked ids are kept in pick order, so the oldest one is released and a removed one is dropped in constant time
+	"""
+	def __init__(self, library, keyword="", blacklist=None, window=0):
+		self._library = library
+		self._keyword = keyword.lower()
+		self._blacklist = frozenset(artist.lower() for artist in blacklist) if blacklist else frozenset()
+		self._window = max(0, window)
+		self._lock = threading.RLock()
+
+		self._songs = []
+		self._ids = {}
+		self._free_ids = []
+		self._order = array.array("L")
+		self._positions = array.array("L")
+		self._available = 0
+		self._recent = OrderedDict()
+
+		with self._lock:
+			songs = library.search(self._keyword) if self._keyword else library.songs
+			# the library returns songs matching full words when there are any, new songs should be matched the same way
+			self._match_words = bool(self._keyword and songs) and self._matches_words(songs[0])
+			for song in songs:
+				if not self._is_blacklisted(song): self._add(song)
+		library.add_listener(self._on_library_update)
+
+	@property
+	def window(self): return self._window
+	@window.setter
+	def window(self, window):
+		with self._lock:
+			self._window = max(0, window)
+			while len(self._recent) > self._window: self._release(self._recent.popitem(last=False)[0])
+
+	def __len__(self): return len(self._ids)
+
+	def close(self):
+		""" Stop updating this sampler, should be called when the sampler is no longer used """
+		self._library.remove_listener(self._on_library_update)
+
+	# === SELECTION ===
+	def _matches_words(self, song): return " " + self._keyword + " " in " " + normalize(song) + " "
+	def _is_blacklisted(self, song): return get_artist(song) in self._blacklist
+
+	def _matches(self, song):
+		if self._is_blacklisted(song): return False
+		if not self._keyword: return True
+		return self._matches_words(song) if self._match_words else self._keyword in normalize(song)
+
+	def _swap(self, a, b):
+		id_a, id_b = self._order[a], self._order[b]
+		self._order[a], self._order[b] = id_b, id_a
+		self._positions[id_a], self._positions[id_b] = b, a
+
+	def _add(self, song):
+		if song in self._ids: return
+		if self._free_ids:
+			sid = self._free_ids.pop()
+			self._songs[sid] = song
+		else:
+			sid = len(self._songs)
+			self._songs.append(song)
+			self._positions.append(0)
+
+		self._ids[song] = sid
+		self._order.append(sid)
+		self._positions[sid] = len(self._order) - 1
+		self._swap(len(self._order) - 1, self._available)
+		self._available += 1
+
+	def _remove(self, song):
+		sid = self._ids.pop(song, None)
+		if sid is None: return
+
+		position = self._positions[sid]
+		if position < self._available:
+			self._available -= 1
+			self._swap(position, self._available)
+			position = self._available
+		else: del self._recent[sid]
+
+		self._swap(position, len(self._order) - 1)
+		self._order.pop()
+		self._songs[sid] = None
+		self._free_ids.append(sid)
+
+	def _release(self, sid):
+		""" Make a song that was picked recently available again """
+		self._swap(self._positions[sid], self._available)
+		self._available += 1
+
+	def _on_library_update(self, library, delta):
+		with self._lock:
+			for song in delta.removed: self._remove(song)
+			for old, new in delta.renamed:
+				self._remove(old)
+				if self._matches(new): self._add(new)
+			for song in delta.added:
+				if self._matches(song): self._add(song)
+
+	def pick(self):
+		""" Returns a random song from the selection, or None if the selection is empty """
+		with self._lock:
+			if self._available == 0:
+				if not self._recent: return None
+				# every song was picked recently, the one picked longest ago can be picked again
+				self._release(self._recent.popitem(last=False)[0])
+
+			sid = self._order[random.randrange(self._available)]
+			if self._window > 0:
+				self._available -= 1
+				self._swap(self._positions[sid], self._available)
+				self._recent[sid] = None
+				if len(self._recent) > self._window: self._release(self._recent.popitem(last=False)[0])
+			return self._songs[sid]
@@ -0,0 +1,180 @@
+import bisect, heapq, os, threading
+
+# scores given to a song for each keyword, depending on how it matches a word in the song name
+SCORE_EXACT = 3.0
+SCORE_PREFIX = 2.0
+SCORE_FUZZY = 1.0
+SCORE_COVERAGE = 0.1
+FUZZY_THRESHOLD = 0.5
+
+def tokenize(text):
+	""" Split text into lowercase search tokens, the artist separator ' - ' is ignored """
+	return [token for token in text.lower().replace(" - ", " ").split(" ") if token]
+
+def trigrams(token):
+	""" Get all trigrams for given token, padded with spaces so short tokens and word boundaries are included """
+	padded = f" {token} "
+	return {padded[i:i+3] for i in range(len(padded) - 2)}
+
+def split_display_name(song):
+	""" Get (artist, title) from the song filename, artist is empty when the song has no artist """
+	display = os.path.splitext(song)[0]
+	artist, _, title = display.partition(" - ") if " - " in display else ("", "", display)
+	return artist, title
+
+class SongSearch:
+	"""
+	 Ranked search over all songs in a library, stays updated with the library by listening to its changes
+	 Each keyword is matched against the words in the artist and title of every song:
+		- words that are equal to the keyword score best, followed by words starting with the keyword
+		- when no word equals or starts with the keyword, words with similar trigrams are used so typos still give results
+	 Words are kept in a sorted array, a prefix lookup is a binary search for the range of words starting with the keyword
+	"""
+	def __init__(self, library):
+		self._library = library
+		self._lock = threading.RLock()
+		self._ids = {}
+		self._songs = []
+		self._song_tokens = []
+		self._free_ids = []
+		self._postings = {}
+		self._tokens = []
+		self._trigrams = {}
+		self._trigram_count = {}
+
+		with self._lock:
+			for song in library.songs: self._add(song, bulk=True)
+			self._tokens = sorted(self._postings.keys())
+		library.add_listener(self._on_library_update)
+
+	@property
+	def library(self): return self._library
+
+	def __len__(self): return len(self._ids)
+
+	def close(self):
+		""" Stop updating this search index, should be called when the index is no longer used """
+		self._library.remove_listener(self._on_library_update)
+
+	# === INDEXING ===
+	def _add_token(self, token, sid, bulk):
+		songs = self._postings.get(token)
+		if songs is None:
+			self._postings[token] = songs = set()
+			grams = trigrams(token)
+			self._trigram_count[token] = len(grams)
+			for gram in grams: self._trigrams.setdefault(gram, set()).add(token)
+			if not bulk: bisect.insort(self._tokens, token)
+		songs.add(sid)
+
+	def _remove_token(self, token, sid):
+		songs = self._postings[token]
+		songs.discard(sid)
+		if not songs:
+			del self._postings[token]
+			del self._trigram_count[token]
+			for gram in trigrams(token):
+				tokens = self._trigrams[gram]
+				tokens.discard(token)
+				if not tokens: del self._trigrams[gram]
+			del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+	def _add(self, song, bulk=False):
+		if song in self._ids: return
+		artist, title = split_display_name(song)
+		tokens = frozenset(tokenize(artist) + tokenize(title))
+
+		if self._free_ids:
+			sid = self._free_ids.pop()
+			self._songs[sid], self._song_tokens[sid] = song, tokens
+		else:
+			sid = len(self._songs)
+			self._songs.append(song)
+			self._song_tokens.append(tokens)
+
+		self._ids[song] = sid
+		for token in tokens: self._add_token(token, sid, bulk)
+
+	def _remove(self, song):
+		sid = self._ids.pop(song, None)
+		if sid is None: return
+		for token in self._song_tokens[sid]: self._remove_token(token, sid)
+		self._songs[sid] = self._song_tokens[sid] = None
+		self._free_ids.append(sid)
+
+	def _on_library_update(self, library, delta):
+		with self._lock:
+			for song in delta.removed: self._remove(song)
+			for old, new in delta.renamed:
+				self._remove(old)
+				self._add(new)
+			for song in delta.added: self._add(song)
+
+	# === SEARCHING ===
+	def _match_term(self, term):
+		""" Returns a dictionary containing all indexed words that match given term, mapped to the score for that match """
+		matches = {}
+		if term in self._postings: matches[term] = SCORE_EXACT
+
+		index = bisect.bisect_left(self._tokens, term)
+		while index < len(self._tokens):
+			token = self._tokens[index]
+			if not token.startswith(term): break
+			if token != term: matches[token] = SCORE_PREFIX + len(term) / len(token) / 2
+			index += 1
+		if matches: return matches
+
+		grams = trigrams(term)
+		shared = {}
+		for gram in grams:
+			for token in self._trigrams.get(gram, ()): shared[token] = shared.get(token, 0) + 1
+
+		for token, count in shared.items():
+			similarity = 2 * count / (len(grams) + self._trigram_count[token])
+			if similarity >= FUZZY_THRESHOLD: matches[token] = SCORE_FUZZY + similarity
+		return matches
+
+	def search(self, query, limit=None, exact_first=False):
+		"""
+		 Find all songs that match every keyword in the query, ordered from best to worst match
+		 When 'exact_first' is set and there are songs containing every keyword as a full word, only those songs are returned
+		 When no song matches, songs containing the query anywhere in their name are returned with a score of 0 (like the library search)
+		 Returns a list of (score, song) tuples, containing at most 'limit' items if specified
+		"""
+		terms = set(tokenize(query))
+		if not terms: return []
+
+		ranked = self._rank(terms, limit, exact_first)
+		if ranked: return ranked
+		# searched without holding the lock, the library calls our listener while holding its own lock
+		songs = self._library.search(query)
+		return [(0.0, song) for song in (songs[:limit] if limit is not None else songs)]
+
+	def _rank(self, terms, limit, exact_first):
+		with self._lock:
+			scores = None
+			# longer terms usually match fewer songs, starting with these keeps the candidate set small
+			for term in sorted(terms, key=len, reverse=True):
+				term_scores = {}
+				for token, score in self._match_term(term).items():
+					for sid in self._postings[token]:
+						if scores is not None and sid not in scores: continue
+						if term_scores.get(sid, 0) < score: term_scores[sid] = score
+
+				if scores is not None:
+					for sid, score in term_scores.items(): term_scores[sid] = score + scores[sid]
+				scores = term_scores
+				if not scores: return []
+
+			if exact_first:
+				exact = {sid: score for sid, score in scores.items() if score >= SCORE_EXACT * len(terms)}
+				if exact: scores = exact
+
+			# songs where the keywords cover more of the name are a more specific match
+			ranked = ((score + SCORE_COVERAGE * len(terms) / len(self._song_tokens[sid]), self._songs[sid]) for sid, score in scores.items())
+			if limit is not None: ranked = heapq.nlargest(limit, ranked, key=lambda item: item[0])
+			return sorted(ranked, key=lambda item: (-item[0], item[1]))
+
+	def complete(self, prefix, limit=10):
+		""" Returns the best matching songs for a partially typed query, meant for suggestions while typing """
+		return [song for _, song in self.search(prefix, limit=limit)]
@@ -1,6 +1,6 @@
 import json, os, requests, time
 
-from core import messagetypes, modules
+from core import messagetypes, modules, serialization
 module = modules.Module(__package__)
 
 CLIENT_ID = "6adynlxibzw3ug8udhyzy6w3yt70pw"
@@ -36,9 +36,11 @@ user_metadata = ".cache/usermeta"
 cache_expire = 1800
 def read_metadata(request=False):
     try:
-        with open(user_metadata, "rb") as file:
-            import base64
-            return json.loads(base64.b85decode(file.read()).decode())
+        with open(user_metadata, "rb") as file: data = file.read()
+        if serialization.binary_serializer.matches(data): return serialization.binary_serializer.loads(data)
+        # metadata written before it was stored in binary format, it is converted when the metadata is written again
+        import base64
+        return json.loads(base64.b85decode(data).decode())
     except FileNotFoundError: return request_metadata() if request else None
     except Exception as e: print("ERROR", "While reading user metadata:", e)
 
@@ -82,10 +84,7 @@ def request_metadata():
 def write_metadata(data):
     if not data: return
 
-    try:
-        with open(user_metadata, "wb") as file:
-            import base64
-            file.write(base64.b85encode(json.dumps(data).encode()))
+    try: serialization.dump_file(user_metadata, data)
     except Exception as e: print("ERROR", "While writing user metadata:", e)
 
 def invalidate_metadata():
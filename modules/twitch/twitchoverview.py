@@ -1,4 +1,4 @@
-import datetime, json, requests, socketserver, threading, time, os
+import asyncio, datetime, json, requests, socketserver, threading, time, os
 from ui.qt import pywindow, pyelement, pyworker, pyimage
 
 from core import modules
@@ -170,41 +170,53 @@ class TwitchSignOutWorker(pyworker.PyWorker):
 
 
 THUMBNAIL_SIZE = 128, 64
-class TwitchRefeshLiveChannelsWorker(pyworker.PyWorker):
+class TwitchRefeshLiveChannelsWorker(pyworker.PyAsyncWorker):
     followed_stream_url = "https://api.twitch.tv/helix/streams?user_id={ids}"
     followed_game_url = "https://api.twitch.tv/helix/games?id={ids}"
     def __init__(self, window, auto_active=True):
-        pyworker.PyWorker.__init__(self, "twitch_refresh_follows", auto_active)
         self._window = window
         self._data = self._error = self._logindata = None
 
-        self.wait = pyworker.PyWaitCondition()
-        self.active = True
+        self._wake = None
         self.repeated = False
         self.wait_time = 15
         self._start_time = 0
+        pyworker.PyAsyncWorker.__init__(self, "twitch_refresh_follows", auto_active, window)
 
     def refresh(self):
         self._start_time = 0
-        self.wait.notify_one()
-
-    def run(self):
-        with self.wait:
-            while self.active:
-                wtime = round(time.time() - self._start_time)
-                if wtime >= (self.wait_time * 60):
-                    print("VERBOSE", "Fetching currently live channels...")
-                    self._window.schedule_task(task_id="twitch_start_refresh")
-                    res = self._fetch_data()
-
-                    print("VERBOSE", "Fetching complete, refreshing data...")
-                    if res: self._window.schedule_task(task_id="twitch_channel_data", data=self._data)
-                    else: self._window.schedule_task(task_id="twitch_channel_data", error=self._error)
-
-                    if not self.repeated: break
-                    self._start_time = time.time()
-                    self.wait.wait(min=self.wait_time)
-                else: self.wait.wait(sec=(self.wait_time * 60) - wtime)
+        self.call_soon(self._notify)
+
+    def set_wait_time(self, wait_time):
+        self.wait_time = wait_time
+        self.call_soon(self._notify)
+
+    def _notify(self):
+        if self._wake is not None: self._wake.set()
+
+    async def _wait(self, secs):
+        try: await asyncio.wait_for(self._wake.wait(), secs)
+        except asyncio.TimeoutError: pass
+        self._wake.clear()
+
+    async def run(self):
+        self._wake = asyncio.Event()
+        while True:
+            wtime = round(time.time() - self._start_time)
+            if wtime >= (self.wait_time * 60):
+                print("VERBOSE", "Fetching currently live channels...")
+                self._window.schedule_task(task_id="twitch_start_refresh")
+                # requests only has blocking calls, only the fetch itself is moved off the loop
+                res = await asyncio.get_running_loop().run_in_executor(None, self._fetch_data)
+
+                print("VERBOSE", "Fetching complete, refreshing data...")
+                if res: self._window.schedule_task(task_id="twitch_channel_data", data=self._data)
+                else: self._window.schedule_task(task_id="twitch_channel_data", error=self._error)
+
+                if not self.repeated: break
+                self._start_time = time.time()
+                await self._wait(self.wait_time * 60)
+            else: await self._wait((self.wait_time * 60) - wtime)
 
     def complete(self):
         print("VERBOSE", "Auto refresh worker completed")
@@ -369,6 +381,10 @@ class TwichOverview(pywindow.PyWindow):
         self.schedule_task(func=self._refresh_status, task_id="refresh_status")
         self.add_task(task_id="twitch_channel_data", func=self._fill_channel_data)
         self.add_task(task_id="twitch_start_refresh", func=self._on_refresh_active)
+        self.events.EventWindowDestroy(self._on_close)
+
+    def _on_close(self):
+        if self._refresh_task is not None: self._refresh_task.cancel()
 
     def create_widgets(self):
         pywindow.PyWindow.create_widgets(self)
@@ -409,8 +425,7 @@ class TwichOverview(pywindow.PyWindow):
         else:
             print("VERBOSE", "Disabling auto refresh worker")
             if self._refresh_task is not None:
-                with self._refresh_task.wait: self._refresh_task.active = False
-                self._refresh_task.wait.notify_one()
+                self._refresh_task.cancel()
                 self._refresh_task = None
 
     def _delay_repeated_refresh(self):
@@ -421,9 +436,8 @@ class TwichOverview(pywindow.PyWindow):
 
         if frame.delay != self._refresh_task.wait_time:
             print("VERBOSE", "Updating refresh delay from", self._refresh_task.wait_time, "to", frame.delay)
-            with self._refresh_task.wait: self._refresh_task.wait_time = frame.delay
+            self._refresh_task.set_wait_time(frame.delay)
             frame[AutoRefreshFrame.input_id].value = self._refresh_task.wait_time
-            self._refresh_task.wait.notify_one()
 
     def _on_refresh_active(self):
         self._set_refresh_status(False)
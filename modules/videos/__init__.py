@@ -159,6 +159,10 @@ module.commands = {
     }
 }
 
+@module.Autocomplete
+def autocomplete(command, arg):
+    if command and command[0] == "tvshow" and len(arg) == 1: return modules.prefix_match(sorted(module.configuration["shows"].keys()), arg[0]) or None
+
 @module.Initialize
 def init():
     module.configuration.get_or_create("#progressbar_color", "#00ffff")
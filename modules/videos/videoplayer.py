@@ -134,7 +134,7 @@ class VideoPlayerWindow(pywindow.PyWindow):
         progress.minimum, progress.value, progress.maximum = 0, 0, 10000
         progress.color = module.configuration.get("#progressbar_color")
         @progress.events.EventInteract
-        def _on_click(position): module.interpreter.put_command(f"video position {position}")
+        def _on_click(position): module.interpreter.put_command(f"video position {position}", key="video_position")
 
         btn = self.add_element("backward_btn", element_class=pyelement.PyButton, row=2, column=1)
         btn.text, btn.accept_input = "<<", False
@@ -67,6 +67,7 @@ def convert(url, filename=None):
 		print("INFO", "Passed argument was not a valid url:", e)
 		return -1
 
+@module.Blocking
 def process_path(narg, nargc, **data):
 	if nargc == 1:
 		argn = " ".join(narg)
@@ -74,6 +75,7 @@ def process_path(narg, nargc, **data):
 		if path is not None: return process_song(**data, path=path)
 		else: return messagetypes.Reply(f"Unknown path '{argn}'")
 
+@module.Blocking
 def process_song(arg, argc, url=None, path=None):
 	if path is None: return messagetypes.Question("Where should it be saved to?", process_path, arg=arg, argc=argc, text=player.configuration["default_directory"], url=url)
 	arg = " ".join(arg)
@@ -1,4 +1,4 @@
-import builtins, datetime, enum, inspect, traceback
+import atexit, builtins, datetime, enum, queue, time, traceback
 import os, sys, threading
 
 
@@ -16,12 +16,13 @@ class PyLogLevel(enum.Enum):
 	@staticmethod
 	def from_arg(level):
 		""" Get appropriate enum level safely, providing the 'NDEFINE' value when level cannot be found """
-		if isinstance(level, PyLogLevel): return level
-		try: level = level.upper()
-		except: pass
+		return PyLogLevel.lookup(level) or PyLogLevel.NDEFINE
 
-		try: return PyLogLevel[level]
-		except: return PyLogLevel.NDEFINE
+	@staticmethod
+	def lookup(level):
+		""" Get the level for given level or level name, returns None if it isn't a level; this is checked for every message so it is a single dictionary lookup """
+		try: return _levels.get(level)
+		except TypeError: return None
 
 	def is_match(self, level):
 		""" Returns True if the passed level is equal or greater importance and should be displayed in the log """
@@ -29,9 +30,19 @@ class PyLogLevel(enum.Enum):
 
 	def __str__(self): return self.name
 
+_levels = {}
+for _level in PyLogLevel:
+	_levels.update({_level: _level, _level.name: _level, _level.name.lower(): _level})
+
 log_folder = ".log"
 file_format = log_folder + os.path.sep + "pylog_{}{}.log"
 class PyLog:
+	"""
+	 Replaces 'print' so every message gets the time, thread, caller and level added to it and is written to the log file
+	 The calling thread only checks the level and adds the message to a queue, a background thread formats and writes the messages in batches
+	"""
+	batch_size = 256
+
 	def __init__(self, log_to_file=True):
 		self._level = PyLogLevel.INFO
 		if not os.path.isdir(log_folder): os.mkdir(log_folder)
@@ -49,6 +60,11 @@ class PyLog:
 			self._filename = None
 			self._file = None
 
+		self._queue = queue.SimpleQueue()
+		self._writer = threading.Thread(target=self._run, name="LogWriter", daemon=True)
+		self._writer.start()
+		atexit.register(self.on_destroy)
+
 		self._prev_print = builtins.print
 		builtins.print = self.print_log
 		print("MESSAGE", "Pyplayer log", str(date_str))
@@ -65,40 +81,87 @@ class PyLog:
 	def filename(self): return self._filename
 
 	@staticmethod
-	def _get_class_from_stack(stack):
-		return stack[0].f_locals["self"].__class__.__name__
-
-	@staticmethod
-	def _get_traceback_string(level):
-		try:
-			stack = inspect.stack()[2]
-			try: return "{}.{}.{}] ".format(PyLog._get_class_from_stack(stack), stack.function, PyLogLevel.from_arg(str(level)))
-			except KeyError: return "{}.{}.{}] ".format("/".join(stack.filename.split("/")[-3:]), stack.function, PyLogLevel.from_arg(level))
-		except Exception as e: return "<{}>.{}] ".format(e, level)
+	def _get_caller(frame):
+		""" Returns the class (or file when not called from a method) and function that logged the message, only looks at the calling frame itself """
+		code = frame.f_code
+		if code.co_argcount > 0 and code.co_varnames[0] == "self":
+			try: return frame.f_locals["self"].__class__.__name__, code.co_name
+			except KeyError: pass
+		return "/".join(code.co_filename.replace(os.path.sep, "/").split("/")[-3:]), code.co_name
 
 	def print_log(self, *objects, sep=" ", end="\n", file=None, flush=True):
-		level = objects[0] if len(objects) > 0 else PyLogLevel.NDEFINE
-		l = PyLogLevel.from_arg(level)
-		if l != PyLogLevel.NDEFINE: objects = objects[1:]
+		level = PyLogLevel.lookup(objects[0]) if len(objects) > 0 else None
+		if level is not None: objects = objects[1:]
+		else: level = PyLogLevel.NDEFINE
+		if self._level.value > level.value: return False
 
-		if self._level.is_match(level):
-			return self._prev_print(datetime.datetime.today().strftime("[%H:%M:%S] ") + f"[{threading.current_thread().name}|" + PyLog._get_traceback_string(level),
-									*[('\n' + ''.join(traceback.format_exception(type(o), o, o.__traceback__)) + '\n') if isinstance(o, Exception) else o for o in objects],
-									sep=sep, end=end, file=file, flush=flush)
-		return False
+		try: caller = PyLog._get_caller(sys._getframe(1))
+		except Exception as e: caller = f"<{e}>", ""
+		# exceptions are formatted by the writer, anything else is converted now so later changes to the object don't change the message
+		objects = [o if isinstance(o, (str, Exception)) else str(o) for o in objects]
+		self._put((time.time(), threading.current_thread().name, caller, level, objects, sep, end, file))
+
+	def _put(self, record):
+		if self._writer is not None: self._queue.put(record)
+		else: self._write_batch([record])
+
+	@staticmethod
+	def _format(record):
+		if isinstance(record, str): return record
+		timestamp, thread, (cls, function), level, objects, sep, end, _ = record
+		objects = [('\n' + ''.join(traceback.format_exception(type(o), o, o.__traceback__)) + '\n') if isinstance(o, Exception) else o for o in objects]
+		return sep.join([time.strftime("[%H:%M:%S] ", time.localtime(timestamp)) + f"[{thread}|{cls}.{function}.{level}] ", *objects]) + end
+
+	def _write_batch(self, records):
+		""" Write all given records, messages for the same output are combined into a single write and every output is flushed once """
+		outputs = {}
+		for record in records:
+			try: text = self._format(record)
+			except Exception as e: text = f"<Failed to format log message: {e}>\n"
+			output = record[-1] if isinstance(record, tuple) and record[-1] is not None else self._file if self._file is not None else sys.__stdout__
+			outputs.setdefault(output, []).append(text)
+
+		for output, texts in outputs.items():
+			try:
+				if output.closed: output = sys.__stdout__
+				output.write("".join(texts))
+				output.flush()
+			except Exception: pass
+
+	def _run(self):
+		while True:
+			records = [self._queue.get()]
+			while len(records) < self.batch_size:
+				try: records.append(self._queue.get_nowait())
+				except queue.Empty: break
+
+			stop = None in records
+			# events are added by 'wait', they are set once everything before them is written
+			done = [r for r in records if isinstance(r, threading.Event)]
+			self._write_batch([r for r in records if r is not None and not isinstance(r, threading.Event)])
+			for event in done: event.set()
+			if stop: return
+
+	def wait(self, timeout=5):
+		""" Wait until all messages logged before this call are written, returns False if this took longer than 'timeout' seconds """
+		if self._writer is None: return True
+		event = threading.Event()
+		self._queue.put(event)
+		return event.wait(timeout)
 
 	def write(self, str):
-		if self._file is not None:
-			self._file.write(str)
-			self.flush()
-		else: sys.__stdout__.write(str)
+		# text written to stdout directly, it is kept in order with the messages that are still waiting
+		self._put(str)
 
 	def flush(self):
-		if self._file is not None:
-			if not self._file.closed: self._file.flush()
-		else: sys.__stdout__.flush()
+		# every batch is flushed by the writer, use 'wait' to make sure everything is written
+		pass
 
 	def on_destroy(self):
+		writer, self._writer = getattr(self, "_writer", None), None
+		if writer is not None:
+			self._queue.put(None)
+			writer.join(5)
 		if self._file is not None:
 			self._file.close()
 
@@ -113,4 +176,4 @@ def open_logfile(file=None):
 	else: file = f"{log_folder}{os.path.sep}{file}.log"
 	if not file or not os.path.isfile(file): raise FileNotFoundError(f"'{file}' is not a file")
 	import webbrowser
-	return webbrowser.open(file)
\ No newline at end of file
+	return webbrowser.open(file)
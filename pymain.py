@@ -1,10 +1,74 @@
-import json, sys
+import os, subprocess, sys, threading, time
 
+from core import pyconfiguration
+from core.tracing import startup_trace
 import pymodules
-from ui.qt import pyelement, pywindow, pylauncher
+from ui.qt import pyelement, pywindow, pylauncher, pyworker
 
 resolution = 225, 325
 process_command = pylauncher.process_command
+# git is started without a console window on Windows, same as 'process_command'
+no_window = {"creationflags": subprocess.CREATE_NO_WINDOW} if sys.platform == "win32" else {}
+
+class UpdateWorker(pyworker.PyWorker):
+    """
+     Updates the program using 'git pull' without blocking the splash window, every line git writes is shown in its status bar
+     The update is aborted when it takes longer than 'time_budget' seconds, git is not allowed to ask for credentials
+    """
+    time_budget = 60
+
+    def __init__(self, window):
+        self._window = window
+        self._deadline = 0
+        self._previous = self._current = None
+        pyworker.PyWorker.__init__(self, "update_program")
+
+    def _git(self, *args):
+        """ Run a git command and return its exit code, or None when it was stopped because the time budget ran out """
+        env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+        pc = subprocess.Popen(["git", *args], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, env=env, text=True, **no_window)
+        # the exit code of a killed process differs per platform (on Windows it is 1), so the timer marks that it stopped the process
+        killed = threading.Event()
+        def _kill():
+            killed.set()
+            pc.kill()
+        timer = threading.Timer(max(0, self._deadline - time.monotonic()), _kill)
+        timer.start()
+        try:
+            for line in pc.stdout:
+                line = line.strip()
+                if line: self._window.schedule_task(task_id="update_status", text=line)
+            pc.wait()
+        finally: timer.cancel()
+        return pc.returncode if not killed.is_set() else None
+
+    def _head(self):
+        try: return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=max(0, self._deadline - time.monotonic()), **no_window).stdout.strip() or None
+        except (subprocess.TimeoutExpired, OSError): return None
+
+    @startup_trace.traced("check for updates")
+    def run(self):
+        self._deadline = time.monotonic() + self.time_budget
+        self._previous = self._head()
+        res = self._git("pull")
+        if res:
+            print("INFO", "Failed to update, there must be local changes, trying to merge them")
+            # same as 'git stash && git pull && git stash pop', without a shell that would keep git running when stopped
+            res = self._git("stash")
+            if res == 0: res = self._git("pull")
+            if res == 0: res = self._git("stash", "pop")
+
+        if res is None: print("WARNING", f"Update took longer than {self.time_budget} seconds, ignoring update...")
+        elif res: print("WARNING", "Failed to update, ignoring update...")
+        if res != 0: self._window.schedule_task(task_id="update_status", text="Failed to update, continuing...")
+        self._current = self._head()
+
+    def complete(self):
+        self._window.schedule_task(task_id="update_complete", previous=self._previous, current=self._current)
+
+    def error(self, error):
+        print("WARNING", "Checking for updates failed:", error)
+
 
 class PySplashWindow(pywindow.RootPyWindow):
     def __init__(self):
@@ -13,13 +77,18 @@ class PySplashWindow(pywindow.RootPyWindow):
         self.icon = "assets/icon.png"
         self.layout.row(1, weight=1)
 
-        self._dependency_check = False
         self._actions = {}
         self._force_configure = False
+        self._update_worker = None
+        self._client_notice = None
 
         self.make_borderless()
         self.center_window(*resolution, fit_to_size=True)
-        self.schedule_task(sec=1, func=self._load_modules if "no_update" in sys.argv else self._update_program)
+        startup_trace.mark("splash window created")
+        self.add_task(task_id="update_status", func=self._update_status)
+        self.add_task(task_id="update_complete", func=self._update_complete)
+        # every step is started as soon as the previous one finished, only waiting for the window to update
+        self.schedule_task(func=self._load_modules if "no_update" in sys.argv else self._update_program)
 
     def create_widgets(self):
         pywindow.RootPyWindow.create_widgets(self)
@@ -34,103 +103,94 @@ class PySplashWindow(pywindow.RootPyWindow):
         status_bar.set_alignment("center")
         status_bar.text, status_bar.wrapping = "Initializing...", True
 
-    # STEP 1: Check for updates
+    # STEP 1: Check for updates, this continues on a worker while the program is loading
     def _update_program(self):
         print("INFO", "Checking for updates")
         self["status_bar"].text = "Checking for updates..."
-        pc = process_command("git pull", stdout=self._git_status)
-        if pc.returncode:
-            print("INFO", "Failed to update, there must be local changes, trying to merge them")
-            pc = process_command("git stash && git pull && git stash pop", stdout=self._git_status, shell=True)
-
-        if pc.returncode:
-            print("WARNING", "Failed to update, ignoring update...")
-            self["status_bar"].text = "Failed to update, continuing in 5 seconds..."
-            return self.schedule_task(sec=5, func=self._load_modules)
-        process_command("git rev-parse HEAD", stdout=self._git_hash)
+        self._update_worker = UpdateWorker(self)
+        self.schedule_task(func=self._load_modules)
 
     # STEP 1a: Display git update status
-    def _git_status(self, out):
-        out = out.split("\n")
-        if len(out) > 1:
-            for o in out:
-                if o.startswith("Updating"): self["status_bar"].text = o; break
-        elif len(out) == 1: self["status_bar"].text = out[0]
+    def _update_status(self, text):
+        self["status_bar"].text = text
 
     # STEP 1b: Checking git hash
-    def _git_hash(self, out):
-        hsh = pymodules.module_cfg.get("hash")
-        out = out.rstrip("\m")
-        print("VERBOSE", "Comparing current hash", out, "with previous hash", hsh)
-        if hsh != out:
-            print("INFO", "Git hash updated, checking depencies")
-            pymodules.module_cfg["hash"] = out
+    def _update_complete(self, previous, current):
+        print("VERBOSE", "Comparing current hash", current, "with previous hash", previous)
+        if current is None: return
+        if current != pymodules.module_cfg.get("hash"):
+            pymodules.module_cfg["hash"] = current
             pymodules.module_cfg.save()
-            self._dependency_check = True
-        self.schedule_task(sec=1, func=self._load_modules)
+
+        if current != previous:
+            print("INFO", "PyPlayer was updated while loading, restart required")
+            # the update can finish before the client is created, the notice is shown once it is
+            self._client_notice = "PyPlayer was updated, enter 'restart' to use the new version"
+            self._show_client_notice()
+
+    def _show_client_notice(self):
+        client = self.find_window("client")
+        if self._client_notice is not None and client is not None:
+            client.on_notification(self._client_notice)
+            self._client_notice = None
 
     # STEP 2: Check modules
+    @startup_trace.traced("check modules")
     def _load_modules(self):
         self["status_bar"].text = "Loading modules..."
         if self._force_configure or pymodules.check_for_new_modules():
             print("INFO", "Module list has changed, opening module configuration")
             self.add_window(window=pymodules.PyModuleConfigurationWindow(self, self._configure_modules_complete))
             self.hidden = True
-        else: self.schedule_task(sec=1, func=self._load_dependencies)
+        else: self.schedule_task(func=self._load_dependencies)
 
     def _configure_modules_complete(self):
         print("INFO", "Module data updated")
         self.hidden = False
-        self.schedule_task(sec=1, func=self._load_dependencies if not self._force_configure else self._do_restart)
+        self.schedule_task(func=self._load_dependencies if not self._force_configure else self._do_restart)
 
     # STEP 3: Check module dependencies
+    @startup_trace.traced("check dependencies")
     def _load_dependencies(self):
         self.close_window("module_select")
-        if True:#self._dependency_check:
+        modules = [mod_id for mod_id, mod_data in pymodules.module_cfg["modules"].items() if mod_data.get("enabled")]
+        fingerprint = pymodules.dependency_fingerprint(modules)
+        if fingerprint != pymodules.module_cfg.get("dependency_hash"):
             self["status_bar"].text = "Checking dependencies..."
-            module_data = pymodules.module_cfg["modules"]
-            dependencies = set()
-            for mod_id, mod_data in [(i,d) for i,d in module_data.items() if d.get("enabled")]:
-                with open(pymodules.configuration_file(mod_id), "r") as file:
-                    data = json.load(file)
-
-                deps = data.get("dependencies")
-                if deps and deps != mod_data["dependencies"]:
-                    pymodules.module_cfg[f"modules::{mod_id}::dependencies"] = deps
-                    dependencies.update(deps)
-
-            if len(dependencies) > 0:
-                print("INFO", "Found dependencies:", dependencies)
-                self["status_bar"].text = f"Verifying {len(dependencies)} dependencies..."
-                pymodules.module_cfg.save()
-                pip_install = "{} -m pip install {}"
-                if sys.platform == "linux": pip_install += "--user"
-
-                for d in dependencies:
-                    print("VERBOSE", f"Installing dependency '{d}'")
-                    s = d.split("|", maxsplit=1)
-                    if len(s) > 1:
-                        if sys.platform != s[0]:
-                            print("INFO", f"Ignoring '{d}' on platform '{s[0]}' since it's only for '{sys.platform}'")
-                            continue
-                        d = s[1]
-
-                    self["status_bar"].text = f"Installing '{d}'"
-                    process_command(pip_install.format(sys.executable, d))
-
+            missing = pymodules.find_missing_dependencies(modules)
+            if missing:
+                print("INFO", "Missing dependencies:", missing)
+                self["status_bar"].text = f"Installing {len(missing)} dependencies..."
+                pip_install = [sys.executable, "-m", "pip", "install", *missing]
+                if sys.platform == "linux": pip_install.append("--user")
+
+                installed = process_command(pip_install).returncode == 0
+                if not installed: print("ERROR", "Failed to install dependencies, modules that need them will not be available")
+            else:
+                print("VERBOSE", "All dependencies are installed")
+                installed = False
+
+            # also stored when installing failed, so pip isn't run on every launch; it is tried again once the enabled modules or their dependencies change
+            pymodules.module_cfg["dependency_hash"] = fingerprint
+            pymodules.module_cfg.save()
+            if installed:
                 self["status_bar"].text = "Dependency check complete, restarting..."
                 return self._do_restart()
 
         self["status_bar"].text = "Loading PyPlayer..."
-        self.schedule_task(sec=1, func=self._load_program)
+        self.schedule_task(func=self._load_program)
 
     # STEP 4: Load main program
     def _load_program(self):
-        import pyplayerqt
-        self._actions[pyplayerqt.PyPlayerCloseReason.RESTART] = self._do_restart
-        self._actions[pyplayerqt.PyPlayerCloseReason.MODULE_CONFIGURE] = self._do_module_configure
-        self.title = "PyPlayer"
-        self.add_window("client", window_class=pyplayerqt.PyPlayer)
+        with startup_trace.span("load program"):
+            with startup_trace.span("import pyplayerqt", "import"): import pyplayerqt
+            self._actions[pyplayerqt.PyPlayerCloseReason.RESTART] = self._do_restart
+            self._actions[pyplayerqt.PyPlayerCloseReason.MODULE_CONFIGURE] = self._do_module_configure
+            self.title = "PyPlayer"
+            self.add_window("client", window_class=pyplayerqt.PyPlayer)
+            self._show_client_notice()
+        print("INFO", f"PyPlayer loaded in {startup_trace.elapsed():.2f}s")
+        startup_trace.save()
 
     def on_close(self, client):
         print("INFO", "PyPlayer closed with reason:", client.flags)
@@ -141,6 +201,10 @@ class PySplashWindow(pywindow.RootPyWindow):
 
     def _do_restart(self):
         print("INFO", "Restarting PyPlayer")
+        # the new process replaces this one without running exit handlers, write configuration changes that are still waiting first
+        pyconfiguration.flush_all()
+        import pylogging
+        if pylogging.logger is not None: pylogging.logger.wait()
         import os
         os.execl(sys.executable, sys.executable, *sys.argv)
 
@@ -149,7 +213,7 @@ class PySplashWindow(pywindow.RootPyWindow):
         self.hidden = False
         self["status_bar"].text = "Opening module configuration..."
         self._force_configure = True
-        self.schedule_task(sec=1, func=self._load_modules)
+        self.schedule_task(func=self._load_modules)
 
 if __name__ == "__main__":
     import pylogging
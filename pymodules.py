@@ -1,13 +1,64 @@
-import os, json, sys
+import hashlib, os, json, re, sys
+from importlib import metadata
 
 from ui.qt import pywindow, pyelement
-from core import pyconfiguration
+from core import pyconfiguration, serialization
 
 module_dir = "modules"
-module_cfg = pyconfiguration.ConfigurationFile("module_data")
+# state of the launcher that is read on every start and changed through the module configuration window, so it doesn't need to be readable
+module_cfg = pyconfiguration.ConfigurationFile("module_data", serializer=serialization.binary_serializer)
 
 def configuration_file(module): return os.path.join(f"modules/{module}", "package.json")
 
+def read_package(module):
+    """ Returns the contents of the package.json file of given module, or None if it cannot be read """
+    try:
+        with open(configuration_file(module)) as file: return json.load(file)
+    except Exception as e:
+        print("WARNING", f"Cannot read package.json for module '{module}':", e)
+        return None
+
+def parse_dependency(dependency):
+    """
+     Get the (requirement, name, version) for a dependency from package.json, version is None if any version is fine
+     Returns None for dependencies that don't apply on this platform, these are written as 'platform|requirement'
+     Extras ('name[extra]') and environment markers ('; python_version < "3.9"') are passed to pip but not used for the name and version
+    """
+    platform, _, requirement = dependency.rpartition("|")
+    if platform and platform != sys.platform: return None
+    specifier = requirement.split(";", maxsplit=1)[0].strip()
+    name = re.split(r"[\[<>=!~ ]", specifier, maxsplit=1)[0]
+    # only exact versions are checked, other version specifiers are left for pip to resolve
+    version = re.fullmatch(r"\s*(?:\[[^\]]*\])?\s*==\s*([^\s,*]+)\s*", specifier[len(name):])
+    return requirement, name, version.group(1) if version else None
+
+def is_installed(name, version=None):
+    """ Returns True if a distribution with given name (and version, if specified) is installed for this interpreter """
+    try: installed = metadata.version(name)
+    except metadata.PackageNotFoundError: return False
+    return version is None or installed == version
+
+def dependency_fingerprint(modules):
+    """ Hash of the package.json files of given modules, when this didn't change since the last check the dependencies don't need to be checked again """
+    fingerprint = hashlib.sha1(f"{sys.executable}|{sys.platform}".encode())
+    for module in sorted(modules):
+        fingerprint.update(module.encode())
+        try:
+            with open(configuration_file(module), "rb") as file: fingerprint.update(file.read())
+        except OSError: pass
+    return fingerprint.hexdigest()
+
+def find_missing_dependencies(modules):
+    """ Returns a sorted list of the requirements of given modules that aren't installed, for platform specific dependencies only those for this platform are included """
+    missing = set()
+    for module in modules:
+        package = read_package(module)
+        if not package: continue
+        for dependency in package.get("dependencies") or []:
+            dependency = parse_dependency(dependency)
+            if dependency is not None and not is_installed(*dependency[1:]): missing.add(dependency[0])
+    return sorted(missing)
+
 def scan_for_modules():
     """ Returns a list of names for all modules found in the module folder """
     return [md.name for md in os.scandir(module_dir) if md.is_dir()]
@@ -0,0 +1,17 @@
+import os, shutil, tempfile, unittest
+
+class WorkingDirectoryTestCase(unittest.TestCase):
+	""" Runs every test in a new temporary working directory, since configuration files and library caches are written relative to it """
+	def setUp(self):
+		cwd = os.getcwd()
+		self.folder = tempfile.mkdtemp(prefix="pyplayer_test_")
+		os.chdir(self.folder)
+		self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+		self.addCleanup(os.chdir, cwd)
+
+	def create_files(self, directory, files):
+		""" Create a directory in the working directory containing the given (empty) files, returns the full path to this directory """
+		path = os.path.join(self.folder, directory)
+		os.makedirs(path, exist_ok=True)
+		for file in files: open(os.path.join(path, file), "w").close()
+		return path
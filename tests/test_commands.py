@@ -0,0 +1,90 @@
+import unittest
+
+from core.modules import CommandTrie, Module, prefix_match
+
+def _command(name):
+	def _cb(arg, argc): return name
+	_cb.__name__ = name
+	return _cb
+
+def _module(key, commands):
+	module = Module(f"tests.commands.{key}")
+	module.commands = commands
+	return module
+
+class TestCommandTrie(unittest.TestCase):
+	def setUp(self):
+		self.modules = [
+			_module("first", {"player": {"play": _command("first_play"), "": _command("first_player")}, "stop": _command("first_stop")}),
+			_module("second", {"player": {"play": _command("second_play"), "next": _command("second_next")}, "volume": {"set": _command("second_volume_set")}}),
+			_module("third", {"volume": _command("third_volume"), "player": _command("third_player")})
+		]
+		self.trie = CommandTrie(self.modules)
+
+	def _resolve(self, command):
+		res = self.trie.find(command)
+		return (res[0], res[1].callback.__name__, res[1].args) if res is not None else None
+
+	def test_resolve(self):
+		self.assertEqual(self._resolve(["player", "play", "song"]), (0, "first_play", ["song"]))
+		self.assertEqual(self._resolve(["stop"]), (0, "first_stop", []))
+		self.assertEqual(self._resolve(["volume", "set", "50"]), (1, "second_volume_set", ["50"]))
+
+	def test_default_command(self):
+		self.assertEqual(self._resolve(["player", "shuffle"]), (0, "first_player", ["shuffle"]))
+		self.assertEqual(self._resolve(["player"]), (0, "first_player", []))
+
+	def test_priority(self):
+		# the first module has a default for 'player', so 'player next' never reaches the second module
+		self.assertEqual(self._resolve(["player", "next"]), (0, "first_player", ["next"]))
+		# the second module doesn't handle 'volume 50', so the third module gets it
+		self.assertEqual(self._resolve(["volume", "50"]), (2, "third_volume", ["50"]))
+
+	def test_unknown(self):
+		self.assertIsNone(self._resolve(["unknown", "command"]))
+		self.assertIsNone(self._resolve([]))
+		self.assertIsNone(CommandTrie().find(["player"]))
+
+	def test_same_as_modules(self):
+		commands = [["player", "play"], ["player", "next", "x"], ["player"], ["stop", "now"], ["volume"], ["volume", "set"], ["volume", "up", "1"], ["nothing"]]
+		for command in commands:
+			expected = None
+			for index, module in enumerate(self.modules):
+				# modules expect the command to end with an extra (ignored) keyword
+				res = module.get_command_callback(command + ["\x00"])
+				if res is not None:
+					expected = index, res.callback.__name__, res.args
+					break
+			self.assertEqual(self._resolve(command), expected, command)
+
+class TestAutocomplete(unittest.TestCase):
+	def setUp(self):
+		self.module = _module("autocomplete", {"player": {"play": _command("play"), "pause": _command("pause"), "volume": _command("volume")}, "playlist": _command("playlist")})
+		self.module.Autocomplete(lambda command, arg: ["loud", "quiet"] if command == ["player", "volume"] else None)
+
+	def test_prefix_match(self):
+		keys = ["pause", "play", "player", "playlist", "stop"]
+		self.assertEqual(prefix_match(keys, "pla"), ["play", "player", "playlist"])
+		self.assertEqual(prefix_match(keys, "stop"), ["stop"])
+		self.assertEqual(prefix_match(keys, "x"), [])
+
+	def test_find_modules(self):
+		modules = [_module("find_a", {"player": _command("a")}), _module("find_b", {"stop": _command("b")}), _module("find_c", {"playlist": _command("c")})]
+		trie = CommandTrie(modules)
+		self.assertEqual(trie.find_modules("pla"), [0, 2])
+		self.assertEqual(trie.find_modules("stop"), [1])
+		self.assertEqual(trie.find_modules("x"), [])
+
+	def test_keywords(self):
+		self.assertEqual(self.module.get_closest_match(["pl"]), ("", ["player", "playlist"], ""))
+		self.assertEqual(self.module.get_closest_match(["player", "pa"]), ("player pause", None, ""))
+		self.assertEqual(self.module.get_closest_match(["player", "p"]), ("player", ["pause", "play"], ""))
+		self.assertIsNone(self.module.get_closest_match(["stop"]))
+
+	def test_arguments(self):
+		self.assertEqual(self.module.get_closest_match(["player", "volume", "lo"]), ("player volume", ["loud", "quiet"], ""))
+		# without suggestions from the module the remaining arguments are kept
+		self.assertEqual(self.module.get_closest_match(["player", "play", "song"]), ("player play", None, "song"))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,212 @@
+import json, os, threading, unittest
+
+from tests import WorkingDirectoryTestCase
+from core.pyconfiguration import Configuration, ConfigurationFile, ConfigurationItem
+
+class TestConfiguration(unittest.TestCase):
+	def setUp(self):
+		self.cfg = Configuration({"volume": 50, "player": {"shuffle": True, "library": {"path": "music"}}})
+
+	def test_read(self):
+		self.assertEqual(self.cfg["volume"], 50)
+		self.assertEqual(self.cfg["player::library::path"], "music")
+		self.assertEqual(self.cfg["player"], {"shuffle": True, "library": {"path": "music"}})
+		self.assertIn("player::shuffle", self.cfg)
+		self.assertNotIn("player::repeat", self.cfg)
+		self.assertEqual(self.cfg.get("missing", 1), 1)
+		with self.assertRaises(KeyError): self.cfg["missing"]
+
+	def test_write(self):
+		self.cfg["player::library::path"] = "songs"
+		self.cfg["player::repeat"] = False
+		self.cfg["new::nested::key"] = 1
+		self.assertEqual(self.cfg["player::library::path"], "songs")
+		self.assertEqual(self.cfg["player::repeat"], False)
+		self.assertEqual(self.cfg["new"], {"nested": {"key": 1}})
+
+		del self.cfg["player::library"]
+		self.assertNotIn("player::library::path", self.cfg)
+		self.assertEqual(self.cfg.value, {"volume": 50, "player": {"shuffle": True, "repeat": False}, "new": {"nested": {"key": 1}}})
+
+	def test_values_are_copies(self):
+		player = self.cfg["player"]
+		player["shuffle"] = False
+		self.assertTrue(self.cfg["player::shuffle"])
+		value = self.cfg.value
+		value["player"]["library"]["path"] = "changed"
+		self.assertEqual(self.cfg["player::library::path"], "music")
+
+	def test_defaults(self):
+		self.assertEqual(self.cfg.get_or_create("volume", 10), 50)
+		self.assertEqual(self.cfg.get_or_create("speed", 1.5), 1.5)
+		self.cfg.set_defaults({"volume": 0, "player::repeat": True})
+		self.assertEqual(self.cfg["volume"], 50)
+		self.assertTrue(self.cfg["player::repeat"])
+
+	def test_dirty(self):
+		self.assertTrue(self.cfg.dirty)
+		self.cfg._clear_dirty()
+		self.assertFalse(self.cfg.dirty)
+		self.cfg["player::library::path"] = "songs"
+		self.assertTrue(self.cfg.dirty)
+		self.assertTrue(self.cfg.get_or_create_configuration("player").dirty)
+
+	def test_read_only(self):
+		item = ConfigurationItem(1, read_only=True)
+		with self.assertRaises(ValueError): item.value = 2
+		self.assertEqual(item.value, 1)
+
+		cfg = Configuration(read_only=True)
+		with self.assertRaises(ValueError): cfg["key"] = 2
+		with self.assertRaises(ValueError): del cfg["key"]
+
+	def test_cannot_replace_configuration_with_value(self):
+		with self.assertRaises(ValueError): self.cfg["player"] = 1
+
+	def test_transaction(self):
+		self.cfg["volume"]
+		read = []
+		def _read(): read.append((self.cfg["volume"], self.cfg["player::shuffle"]))
+
+		with self.cfg.transaction():
+			self.cfg["volume"] = 100
+			self.cfg["player::shuffle"] = False
+			# changes are visible to the thread making them right away
+			self.assertEqual(self.cfg["volume"], 100)
+			# other threads keep reading the values from before the transaction, without waiting for it
+			thread = threading.Thread(target=_read)
+			thread.start()
+			thread.join(5)
+			self.assertFalse(thread.is_alive())
+		self.assertEqual(read, [(50, True)])
+
+		_read()
+		self.assertEqual(read[-1], (100, False))
+
+	def test_nested_transaction(self):
+		with self.cfg.transaction():
+			with self.cfg.transaction(): self.cfg["volume"] = 1
+			self.cfg["volume"] = 2
+		self.assertEqual(self.cfg["volume"], 2)
+
+	def test_concurrent_reads_are_consistent(self):
+		# both values are always changed in one transaction, readers must never see one changed without the other
+		stop, errors = threading.Event(), []
+		def _write():
+			i = 0
+			while not stop.is_set():
+				i += 1
+				with self.cfg.transaction():
+					self.cfg["volume"] = i
+					self.cfg["player::library::path"] = str(i)
+
+		def _read():
+			for _ in range(2000):
+				value = self.cfg.value
+				if str(value["volume"]) != value["player"]["library"]["path"] and value["volume"] != 50: errors.append(value)
+
+		writer = threading.Thread(target=_write)
+		readers = [threading.Thread(target=_read) for _ in range(4)]
+		writer.start()
+		for reader in readers: reader.start()
+		for reader in readers: reader.join()
+		stop.set()
+		writer.join()
+		self.assertEqual(errors, [])
+
+class TestConfigurationListeners(unittest.TestCase):
+	def setUp(self):
+		self.cfg = Configuration({"volume": 50, "player": {"shuffle": True, "library": {"path": "music"}}})
+		self.calls = []
+
+	def _listen(self, cfg, key):
+		cfg.on_change(key, lambda key, value: self.calls.append((key, value)))
+
+	def test_key(self):
+		self._listen(self.cfg, "volume")
+		self.cfg["volume"] = 10
+		self.cfg["player::shuffle"] = False
+		self.assertEqual(self.calls, [("volume", 10)])
+
+	def test_nested(self):
+		self._listen(self.cfg, "player")
+		self._listen(self.cfg, "player::library::path")
+		self.cfg["player::library::path"] = "songs"
+		self.assertCountEqual(self.calls, [("player", {"shuffle": True, "library": {"path": "songs"}}), ("player::library::path", "songs")])
+
+		self.calls.clear()
+		self.cfg["player"] = {"library": {"path": "other"}}
+		self.assertCountEqual(self.calls, [("player", {"library": {"path": "other"}}), ("player::library::path", "other")])
+
+	def test_nested_configuration(self):
+		player = self.cfg.get_or_create_configuration("player")
+		self._listen(player, "shuffle")
+		self.cfg["player::shuffle"] = False
+		self.assertEqual(self.calls, [("shuffle", False)])
+
+	def test_all_and_removed(self):
+		self._listen(self.cfg, "")
+		self._listen(self.cfg, "volume")
+		del self.cfg["volume"]
+		self.assertCountEqual(self.calls, [("", {"player": {"shuffle": True, "library": {"path": "music"}}}), ("volume", None)])
+
+	def test_transaction_calls_once(self):
+		self._listen(self.cfg, "volume")
+		with self.cfg.transaction():
+			for i in range(5): self.cfg["volume"] = i
+			self.assertEqual(self.calls, [])
+		self.assertEqual(self.calls, [("volume", 4)])
+
+	def test_remove(self):
+		cb = lambda key, value: self.calls.append(key)
+		self.cfg.on_change("volume", cb)
+		self.cfg.remove_on_change("volume", cb)
+		self.cfg["volume"] = 1
+		self.assertEqual(self.calls, [])
+		with self.assertRaises(TypeError): self.cfg.on_change("volume", None)
+
+	def test_failing_listener(self):
+		def _fail(key, value): raise RuntimeError("listener failed")
+		self.cfg.on_change("volume", _fail)
+		self._listen(self.cfg, "volume")
+		self.cfg["volume"] = 1
+		self.assertEqual(self.calls, [("volume", 1)])
+
+class TestConfigurationFile(WorkingDirectoryTestCase):
+	def setUp(self):
+		super().setUp()
+		os.mkdir(".cfg")
+
+	def _read(self, file):
+		with open(os.path.join(".cfg", file)) as f: return json.load(f)
+
+	def test_flush(self):
+		cfg = ConfigurationFile("test")
+		cfg["player::volume"] = 50
+		self.assertFalse(os.path.exists(os.path.join(".cfg", "test.cfg")))
+		cfg.flush()
+		self.assertEqual(self._read("test.cfg"), {"player": {"volume": 50}, "_version": ConfigurationFile.cfg_version})
+		self.assertEqual(ConfigurationFile("test")["player::volume"], 50)
+
+	def test_reload(self):
+		cfg = ConfigurationFile("test")
+		cfg["player"] = {"volume": 50, "shuffle": True}
+		cfg.flush()
+		calls = []
+		cfg.on_change("player", lambda key, value: calls.append(value))
+
+		data = self._read("test.cfg")
+		data["player"]["volume"] = 10
+		with open(os.path.join(".cfg", "test.cfg"), "w") as file: json.dump(data, file)
+		cfg.reload()
+		self.assertEqual(cfg["player::volume"], 10)
+		self.assertEqual(calls, [{"volume": 10, "shuffle": True}])
+		# values from the file don't need to be written again
+		self.assertFalse(cfg.dirty)
+
+		calls.clear()
+		cfg.reload()
+		self.assertEqual(calls, [])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,33 @@
+import sys, unittest
+
+import pymodules
+
+class TestDependencies(unittest.TestCase):
+	def test_name(self):
+		self.assertEqual(pymodules.parse_dependency("psutil"), ("psutil", "psutil", None))
+		self.assertEqual(pymodules.parse_dependency("python-vlc>=3.0"), ("python-vlc>=3.0", "python-vlc", None))
+
+	def test_exact_version(self):
+		self.assertEqual(pymodules.parse_dependency("python-vlc==3.0.11115"), ("python-vlc==3.0.11115", "python-vlc", "3.0.11115"))
+		# only exact versions are checked, anything else is left to pip
+		self.assertEqual(pymodules.parse_dependency("pkg==1.*")[2], None)
+		self.assertEqual(pymodules.parse_dependency("pkg==1.0,!=1.1")[2], None)
+
+	def test_extras(self):
+		self.assertEqual(pymodules.parse_dependency("requests[socks]"), ("requests[socks]", "requests", None))
+		self.assertEqual(pymodules.parse_dependency("requests[socks,security]==2.31.0"), ("requests[socks,security]==2.31.0", "requests", "2.31.0"))
+
+	def test_markers(self):
+		requirement = "pkg==1.0; python_version < '3.9'"
+		self.assertEqual(pymodules.parse_dependency(requirement), (requirement, "pkg", "1.0"))
+		self.assertEqual(pymodules.parse_dependency("pkg ; sys_platform == 'win32'")[1:], ("pkg", None))
+
+	def test_platform(self):
+		self.assertEqual(pymodules.parse_dependency(f"{sys.platform}|winrt"), ("winrt", "winrt", None))
+		self.assertIsNone(pymodules.parse_dependency("not_a_platform|winrt"))
+
+	def test_is_installed(self):
+		self.assertFalse(pymodules.is_installed("pyplayer-package-that-does-not-exist"))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,58 @@
+import threading, unittest
+
+from core.eventqueue import EventQueue
+
+class TestEventQueue(unittest.TestCase):
+	def setUp(self):
+		self.queue = EventQueue()
+
+	def test_order(self):
+		for i in range(5): self.queue.put(i)
+		self.assertEqual([self.queue.get() for _ in range(5)], [0, 1, 2, 3, 4])
+
+	def test_priority(self):
+		self.queue.put("event", priority=1)
+		self.queue.put("destroy", priority=2)
+		self.queue.put("command", priority=0)
+		self.queue.put("event2", priority=1)
+		self.assertEqual([self.queue.get() for _ in range(4)], ["command", "event", "event2", "destroy"])
+
+	def test_key_replaces_waiting_item(self):
+		self.queue.put("first")
+		self.queue.put("position 1", key="position")
+		self.queue.put("second")
+		self.queue.put("position 2", key="position")
+		self.assertEqual(len(self.queue), 3)
+		# the replaced item keeps its place in the queue
+		self.assertEqual([self.queue.get() for _ in range(3)], ["first", "position 2", "second"])
+
+		# once taken, an item with the same key is added again
+		self.queue.put("position 3", key="position")
+		self.assertEqual(self.queue.get(), "position 3")
+
+	def test_timeout(self):
+		with self.assertRaises(TimeoutError): self.queue.get(timeout=0.01)
+
+	def test_close(self):
+		self.queue.put("waiting")
+		self.queue.close()
+		self.assertTrue(self.queue.closed)
+		self.assertFalse(self.queue.put("ignored"))
+		self.assertEqual(self.queue.get(), "waiting")
+		self.assertEqual(len(self.queue), 0)
+
+	def test_threads(self):
+		count, producers = 1000, 4
+		def _produce(offset):
+			for i in range(count): self.queue.put((offset, i))
+
+		threads = [threading.Thread(target=_produce, args=(p,)) for p in range(producers)]
+		for thread in threads: thread.start()
+		received = [self.queue.get(timeout=5) for _ in range(count * producers)]
+		for thread in threads: thread.join()
+
+		# every item arrives once, items from the same thread stay in order
+		for p in range(producers): self.assertEqual([i for offset, i in received if offset == p], list(range(count)))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,72 @@
+import marshal, os, unittest
+
+from tests import WorkingDirectoryTestCase
+from core import serialization
+from core.pyconfiguration import ConfigurationFile
+
+data = {"modules": {"player": {"enabled": True, "priority": 1}}, "history": [("music", "song.mp3")], "count": 3, "ratio": 0.5, "none": None}
+
+class TestSerializers(unittest.TestCase):
+	def test_abstract(self):
+		with self.assertRaises(TypeError): serialization.Serializer()
+
+	def test_json(self):
+		dumped = serialization.json_serializer.dumps(data)
+		self.assertIs(serialization.get_serializer(dumped), serialization.json_serializer)
+		# json has no tuples
+		self.assertEqual(serialization.loads(dumped), dict(data, history=[["music", "song.mp3"]]))
+
+	def test_binary(self):
+		dumped = serialization.binary_serializer.dumps(data)
+		self.assertTrue(dumped.startswith(serialization.BinarySerializer.header))
+		self.assertIs(serialization.get_serializer(dumped), serialization.binary_serializer)
+		self.assertEqual(serialization.loads(dumped), data)
+
+	def test_binary_version(self):
+		dumped = bytearray(serialization.binary_serializer.dumps(data))
+		dumped[len(serialization.BinarySerializer.header)] = marshal.version + 1
+		with self.assertRaises(ValueError): serialization.loads(bytes(dumped))
+
+	def test_invalid(self):
+		with self.assertRaises(ValueError): serialization.loads(b"not json")
+		with self.assertRaises(ValueError): serialization.loads(serialization.binary_serializer.dumps(data)[:-3])
+		with self.assertRaises(ValueError): serialization.loads(serialization.BinarySerializer.header)
+
+class TestSerializationFiles(WorkingDirectoryTestCase):
+	def setUp(self):
+		super().setUp()
+		os.mkdir(".cfg")
+
+	def test_files(self):
+		for serializer in serialization.serializers.values():
+			serialization.dump_file("data", data, serializer)
+			self.assertEqual(serialization.read_file("data"), serialization.loads(serializer.dumps(data)))
+			self.assertFalse(os.path.exists("data.tmp"))
+		with self.assertRaises(FileNotFoundError): serialization.read_file("missing")
+
+	def test_configuration_format_change(self):
+		cfg = ConfigurationFile("test")
+		cfg["player::volume"] = 50
+		cfg.flush()
+
+		# a json file is still read by a binary configuration, it is converted when it is written
+		cfg = ConfigurationFile("test", serializer=serialization.binary_serializer)
+		self.assertEqual(cfg["player::volume"], 50)
+		cfg["player::volume"] = 10
+		cfg.flush()
+		with open(os.path.join(".cfg", "test.cfg"), "rb") as file: self.assertIs(serialization.get_serializer(file.read()), serialization.binary_serializer)
+		self.assertEqual(ConfigurationFile("test")["player::volume"], 10)
+
+	def test_configuration_backup(self):
+		cfg = ConfigurationFile("test", serializer=serialization.binary_serializer)
+		cfg["player::volume"] = 50
+		cfg.flush()
+
+		# the binary file can't be read (like after a Python upgrade changed the marshal format), the json backup is used instead
+		with open(os.path.join(".cfg", "test.cfg"), "r+b") as file:
+			file.seek(len(serialization.BinarySerializer.header))
+			file.write(bytes([marshal.version + 1]))
+		self.assertEqual(ConfigurationFile("test", serializer=serialization.binary_serializer)["player::volume"], 50)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,81 @@
+import os, unittest
+
+from tests import WorkingDirectoryTestCase
+from modules.player.songlibrary import LibraryDelta, SongLibrary
+from modules.player.songsampler import SongSampler
+
+songs = ["Queen - Bohemian Rhapsody.mp3", "Queen - Under Pressure.mp3", "ABBA - Dancing Queen.mp3", "ABBA - Waterloo.mp3", "Daft Punk - One More Time.mp3"]
+
+class TestSongSampler(WorkingDirectoryTestCase):
+	def setUp(self):
+		super().setUp()
+		self.library = SongLibrary(self.create_files("music", songs))
+		self.library.refresh()
+		self._samplers = []
+
+	def tearDown(self):
+		for sampler in self._samplers: sampler.close()
+
+	def _sampler(self, *args, **kwargs):
+		sampler = SongSampler(self.library, *args, **kwargs)
+		self._samplers.append(sampler)
+		return sampler
+
+	def _add_song(self, song):
+		open(os.path.join("music", song), "w").close()
+		self.library.apply_delta(LibraryDelta(added=[song]))
+
+	def test_picks_from_library(self):
+		sampler = self._sampler()
+		self.assertEqual(len(sampler), len(songs))
+		for _ in range(20): self.assertIn(sampler.pick(), songs)
+
+	def test_empty(self):
+		self.assertIsNone(self._sampler("unknown").pick())
+
+	def test_keyword(self):
+		sampler = self._sampler("queen")
+		# 'queen' matches full words, so songs added later must match a full word as well
+		self._add_song("Queensryche - Silent Lucidity.mp3")
+		self._add_song("Freddie Mercury - Queen Of The Night.mp3")
+		picked = {sampler.pick() for _ in range(200)}
+		self.assertEqual(picked, {"Queen - Bohemian Rhapsody.mp3", "Queen - Under Pressure.mp3", "ABBA - Dancing Queen.mp3", "Freddie Mercury - Queen Of The Night.mp3"})
+
+	def test_blacklist(self):
+		sampler = self._sampler(blacklist=["abba"])
+		self._add_song("ABBA - Mamma Mia.mp3")
+		self.assertEqual(len(sampler), 3)
+		for _ in range(50): self.assertFalse(sampler.pick().startswith("ABBA"))
+
+	def test_window_doesnt_repeat(self):
+		sampler = self._sampler(window=len(songs) - 1)
+		picked = [sampler.pick() for _ in range(len(songs) * 4)]
+		for i in range(len(picked) - len(songs) + 1):
+			self.assertEqual(len(set(picked[i:i + len(songs)])), len(songs))
+
+	def test_window_larger_than_selection(self):
+		sampler = self._sampler("queen", window=10)
+		picked = [sampler.pick() for _ in range(9)]
+		self.assertEqual(len(set(picked[:3])), 3)
+		# once every song was picked, the songs are picked again in the same order
+		self.assertEqual(picked[3:6], picked[:3])
+
+	def test_follows_library(self):
+		sampler = self._sampler(window=2)
+		for _ in range(3): sampler.pick()
+		self.library.apply_delta(LibraryDelta(removed=["Queen - Under Pressure.mp3", "ABBA - Waterloo.mp3"]))
+		os.rename(os.path.join("music", "Daft Punk - One More Time.mp3"), os.path.join("music", "Daft Punk - Aerodynamic.mp3"))
+		self.library.apply_delta(LibraryDelta(renamed=[("Daft Punk - One More Time.mp3", "Daft Punk - Aerodynamic.mp3")]))
+
+		expected = {"Queen - Bohemian Rhapsody.mp3", "ABBA - Dancing Queen.mp3", "Daft Punk - Aerodynamic.mp3"}
+		self.assertEqual(len(sampler), len(expected))
+		self.assertEqual({sampler.pick() for _ in range(50)}, expected)
+
+	def test_change_window(self):
+		sampler = self._sampler(window=4)
+		for _ in range(4): sampler.pick()
+		sampler.window = 0
+		self.assertEqual({sampler.pick() for _ in range(200)}, set(songs))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,60 @@
+import os, unittest
+
+from tests import WorkingDirectoryTestCase
+from modules.player.songlibrary import LibraryDelta, SongLibrary
+from modules.player.songsearch import SongSearch, tokenize
+
+songs = ["Queen - Bohemian Rhapsody.mp3", "ABBA - Dancing Queen.mp3", "Queen - Under Pressure.mp3", "Daft Punk - Around The World.mp3", "Queensryche - Silent Lucidity.mp3"]
+
+class TestSongSearch(WorkingDirectoryTestCase):
+	def setUp(self):
+		super().setUp()
+		self.library = SongLibrary(self.create_files("music", songs))
+		self.library.refresh()
+		self.search = SongSearch(self.library)
+
+	def tearDown(self):
+		self.search.close()
+
+	def _songs(self, query, **kwargs): return [song for _, song in self.search.search(query, **kwargs)]
+
+	def test_tokenize(self):
+		self.assertEqual(tokenize("Queen - Bohemian  Rhapsody"), ["queen", "bohemian", "rhapsody"])
+
+	def test_all_keywords_must_match(self):
+		self.assertEqual(self._songs("queen pressure"), ["Queen - Under Pressure.mp3"])
+		self.assertEqual(self._songs("queen world"), [])
+
+	def test_exact_word_ranks_before_prefix(self):
+		self.assertEqual(self._songs("queen")[-1], "Queensryche - Silent Lucidity.mp3")
+		self.assertEqual(self._songs("danc"), ["ABBA - Dancing Queen.mp3"])
+		self.assertGreater(self.search.search("queen dancing")[0][0], self.search.search("queen danc")[0][0])
+
+	def test_exact_first(self):
+		self.assertEqual(self._songs("dancing", exact_first=True), ["ABBA - Dancing Queen.mp3"])
+
+	def test_typo(self):
+		self.assertEqual(self._songs("rhapsdy"), ["Queen - Bohemian Rhapsody.mp3"])
+
+	def test_substring_fallback(self):
+		self.assertEqual(self.search.search("hap"), [(0.0, "Queen - Bohemian Rhapsody.mp3")])
+
+	def test_limit(self):
+		self.assertEqual(len(self.search.search("queen", limit=2)), 2)
+
+	def test_follows_library(self):
+		self.library.apply_delta(LibraryDelta(removed=["Queen - Under Pressure.mp3"]))
+		self.assertEqual(self._songs("pressure"), [])
+
+		open(os.path.join("music", "Queen - Radio Ga Ga.mp3"), "w").close()
+		self.library.apply_delta(LibraryDelta(added=["Queen - Radio Ga Ga.mp3"]))
+		self.assertEqual(self._songs("radio"), ["Queen - Radio Ga Ga.mp3"])
+
+		os.rename(os.path.join("music", "Queen - Radio Ga Ga.mp3"), os.path.join("music", "Queen - Innuendo.mp3"))
+		self.library.apply_delta(LibraryDelta(renamed=[("Queen - Radio Ga Ga.mp3", "Queen - Innuendo.mp3")]))
+		self.assertEqual(self._songs("radio"), [])
+		self.assertEqual(self._songs("innuendo"), ["Queen - Innuendo.mp3"])
+		self.assertEqual(len(self.search), len(songs))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1141,6 +1141,97 @@ class PyProgessbar(PyElement):
         PyElement._on_mouse_press(self, event)
 
 
+class PyItemModel(QtCore.QAbstractListModel):
+    """
+     List model containing strings, unlike 'QStringListModel' single rows can be inserted, moved or removed without resetting the view
+     Rows are handed to the view in batches when it scrolls down, so very large lists don't need to be loaded at once
+     Keeps track of the row of every item so looking up an item doesn't go through the whole list, items are expected to be unique
+    """
+    batch_size = 500
+
+    def __init__(self):
+        QtCore.QAbstractListModel.__init__(self)
+        self._items, self._rows = [], {}
+        self._loaded = 0
+
+    @property
+    def items(self): return self._items
+    @items.setter
+    def items(self, items):
+        self.beginResetModel()
+        self._items = list(items)
+        self._rows = {}
+        for row in range(len(self._items) - 1, -1, -1): self._rows[self._items[row]] = row
+        self._loaded = min(len(self._items), self.batch_size)
+        self.endResetModel()
+
+    def __len__(self): return len(self._items)
+
+    def index_of(self, item):
+        """ Returns the row of given item, or -1 if it isn't in this list """
+        return self._rows.get(item, -1)
+
+    def _update_rows(self, start, end):
+        for row in range(start, min(end, len(self._items))): self._rows[self._items[row]] = row
+
+    def load_to(self, row):
+        """ Make sure the view knows about all rows up to given row """
+        row = min(row + 1, len(self._items))
+        if row > self._loaded:
+            self.beginInsertRows(QtCore.QModelIndex(), self._loaded, row - 1)
+            self._loaded = row
+            self.endInsertRows()
+
+    def insert(self, row, item):
+        row = max(0, min(row, len(self._items)))
+        if row < self._loaded or self._loaded == len(self._items):
+            self.beginInsertRows(QtCore.QModelIndex(), row, row)
+            self._items.insert(row, item)
+            self._loaded += 1
+            self._update_rows(row, len(self._items))
+            self.endInsertRows()
+        else:
+            self._items.insert(row, item)
+            self._update_rows(row, len(self._items))
+
+    def remove(self, row):
+        item = self._items[row]
+        if row < self._loaded:
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            del self._items[row]
+            self._loaded -= 1
+            self._remove_row(item, row)
+            self.endRemoveRows()
+        else:
+            del self._items[row]
+            self._remove_row(item, row)
+        return item
+
+    def _remove_row(self, item, row):
+        if self._rows.get(item) == row: del self._rows[item]
+        self._update_rows(row, len(self._items))
+
+    def move(self, source, destination):
+        """ Move the item at row 'source' so it ends up at row 'destination', only the rows in between are updated """
+        if source == destination: return
+        if source < self._loaded and destination < self._loaded:
+            # Qt expects the row the item is moved in front of, before the item is removed
+            self.beginMoveRows(QtCore.QModelIndex(), source, source, QtCore.QModelIndex(), destination + 1 if destination > source else destination)
+            self._items.insert(destination, self._items.pop(source))
+            self._update_rows(min(source, destination), max(source, destination) + 1)
+            self.endMoveRows()
+        else: self.insert(destination, self.remove(source))
+
+    # QAbstractListModel overrides
+    def rowCount(self, parent=QtCore.QModelIndex()): return 0 if parent.isValid() else self._loaded
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if index.isValid() and 0 <= index.row() < self._loaded and role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole): return str(self._items[index.row()])
+        return None
+
+    def canFetchMore(self, parent): return not parent.isValid() and self._loaded < len(self._items)
+    def fetchMore(self, parent):
+        if not parent.isValid(): self.load_to(self._loaded + self.batch_size - 1)
+
 class PyItemlist(PyElement):
     """
      Show a list of items the user can select
@@ -1161,16 +1252,37 @@ class PyItemlist(PyElement):
             QListView {{ 
              selection-background-color: #101010; selection-color: {self.qt_element.palette().highlight().color().name()}
             }} """)
-        self._items = QtCore.QStringListModel()
+        self._items = PyItemModel()
+        self.qt_element.setModel(self._items)
 
     @property
-    def itemlist(self): return self._items.stringList()
+    def itemlist(self): return list(self._items.items)
     @itemlist.setter
-    def itemlist(self, items):
-        self._items.setStringList(items)
-        self.qt_element.setModel(self._items)
+    def itemlist(self, items): self._items.items = items
     value = itemlist
 
+    def __len__(self): return len(self._items)
+
+    def item(self, index):
+        """ Returns the item at given index, without copying the whole list """
+        return self._items.items[index]
+
+    def index_of(self, item):
+        """ Returns the index of given item, or -1 if it isn't in the list """
+        return self._items.index_of(item)
+
+    def insert_item(self, index, item):
+        """ Insert a single item at given index without updating the other items in the view """
+        self._items.insert(index, item)
+
+    def remove_item(self, index):
+        """ Remove the item at given index, returns the removed item """
+        return self._items.remove(index)
+
+    def move_item(self, source, destination):
+        """ Move the item at index 'source' to index 'destination', the selection moves along with the item """
+        self._items.move(source, destination)
+
     @property
     def auto_select(self): return self.qt_element.selectionMode() == QtWidgets.QListView.SingleSelection
     @auto_select.setter
@@ -1185,7 +1297,9 @@ class PyItemlist(PyElement):
     def selected_index(self, index):
         """ Set the current selection to given index, clears the selection if the given index is less than 0 """
         self.clear_selection()
-        if index >= 0: self.qt_element.setSelection(self.qt_element.visualRect(self._items.index(index)), QtCore.QItemSelectionModel.Select)
+        if index >= 0:
+            self._items.load_to(index)
+            self.qt_element.setSelection(self.qt_element.visualRect(self._items.index(index)), QtCore.QItemSelectionModel.Select)
 
     def clear_selection(self):
         """ Removes any selected item """
@@ -1205,14 +1319,12 @@ class PyItemlist(PyElement):
     def selected_item(self):
         """ Returns the string of the currently selected item, or None if nothing was selected """
         index = self.selected_index
-        try: return self.itemlist[index]
+        try: return self.item(index)
         except IndexError: return None
     @selected_item.setter
     def selected_item(self, item):
         """ Set the selection to given string, clears the selection if the given string wasn't found """
-        items = self.itemlist
-        try: self.selected_index = items.index(item)
-        except ValueError: self.selected_index = -1
+        self.selected_index = self.index_of(item)
 
     @property
     def clicked_index(self):
@@ -1223,6 +1335,7 @@ class PyItemlist(PyElement):
 
     def move_to(self, index):
         """ Make sure given index is visible """
+        self._items.load_to(index)
         self.qt_element.scrollTo(self._items.index(index))
 
     # QListView.currentChanged override
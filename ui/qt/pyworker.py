@@ -1,4 +1,7 @@
 from PyQt5 import QtCore
+import asyncio
+
+from core.asyncloop import shared_loop
 
 class _Task(QtCore.QThread):
     def __init__(self, task):
@@ -68,6 +71,87 @@ class PyWorker:
         """ Executed only on error, either during 'start' or 'run' """
         pass
 
+class PyAsyncWorker:
+    """
+     Worker that runs as a coroutine on the shared asyncio loop instead of on its own thread, uses the same hooks as PyWorker but 'run' must be a coroutine
+     When a window is given, 'complete' and 'error' are called on the main thread through 'schedule_task', in that case the worker must be created on the main thread
+     Running workers are cancelled when the loop stops, 'run' receives an 'asyncio.CancelledError' and neither 'complete' nor 'error' is called
+    """
+    def __init__(self, worker_id, auto_activate=True, window=None):
+        self._id = worker_id
+        self._window = window
+        self._future = None
+        if window is not None: window.add_task(self._task_id, PyAsyncWorker._finish)
+        if auto_activate: self.activate()
+
+    def activate(self):
+        try: self.start()
+        except Exception as e:
+            print("ERROR", f"Failed to start worker '{self._id}':", e)
+            return self._on_finish(e)
+        self._future = shared_loop.submit(self._execute())
+
+    def cancel(self):
+        """ Stop the worker if it is running, this can be called from any thread """
+        if self._future is not None: self._future.cancel()
+
+    @property
+    def worker_id(self): return self._id
+    @property
+    def running(self): return self._future is not None and not self._future.done()
+    @property
+    def _task_id(self): return f"pyworker_{self._id}"
+
+    def call_soon(self, callback, *args):
+        """ Call a function on the loop this worker runs on, use this to interact with the worker from other threads """
+        shared_loop.call_soon(callback, *args)
+
+    async def sleep(self, secs):
+        await asyncio.sleep(secs)
+
+    async def _execute(self):
+        try: await self.run()
+        except asyncio.CancelledError:
+            print("VERBOSE", f"Worker '{self._id}' was cancelled")
+            raise
+        except Exception as e:
+            print("ERROR", f"During execution of worker '{self._id}':", e)
+            return self._on_finish(e)
+        self._on_finish(None)
+
+    def _on_finish(self, error):
+        if self._window is not None: self._window.schedule_task(task_id=self._task_id, worker=self, error=error)
+        else: PyAsyncWorker._finish(self, error)
+
+    @staticmethod
+    def _finish(worker, error=None):
+        if error is None:
+            try: return worker.complete()
+            except Exception as e:
+                print("ERROR", f"On completion of worker '{worker.worker_id}':", e)
+                error = e
+
+        try: worker.error(error)
+        except Exception as e:
+            e.__suppress_context__ = True
+            print("ERROR", "During handling of previous error:", e)
+
+    def start(self):
+        """ Executed before the worker is started, on the thread that activates the worker """
+        pass
+
+    async def run(self):
+        """ Main execution of the worker, runs on the asyncio loop so it must not block: wait on coroutines instead """
+        pass
+
+    def complete(self):
+        """ Executed after the worker completed, only on success """
+        pass
+
+    def error(self, error):
+        """ Executed only on error, either during 'start', 'run' or 'complete' """
+        pass
+
 class PyLock:
     """ Basic syncronization object, similar to threading.Lock but intended to be used with PyWorkers"""
     def __init__(self):